@@ -4,4 +4,79 @@ from dotenv import load_dotenv
 load_dotenv()
 
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/sistema_asistencia")
-JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "GgjdjE56742dhwwhf")
\ No newline at end of file
+JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "GgjdjE56742dhwwhf")
+
+# Pool de modelos de inferencia compartido por todas las transmisiones
+POOL_MODELOS_TAMANO = int(os.getenv("POOL_MODELOS_TAMANO", "2"))
+POOL_MODELOS_CALENTAR = os.getenv("POOL_MODELOS_CALENTAR", "true").lower() == "true"
+
+# Planificador central de inferencia por micro-lotes entre aulas
+INFERENCIA_CENTRALIZADA = os.getenv("INFERENCIA_CENTRALIZADA", "true").lower() == "true"
+INFERENCIA_LOTE_MAX = int(os.getenv("INFERENCIA_LOTE_MAX", "8"))
+INFERENCIA_LATENCIA_MAX_MS = float(os.getenv("INFERENCIA_LATENCIA_MAX_MS", "15"))
+
+# Ejecutar la cadena de vídeo de cada aula en un proceso independiente (fuera del GIL de Flask)
+EJECUCION_EN_PROCESOS = os.getenv("EJECUCION_EN_PROCESOS", "false").lower() == "true"
+
+# Vista previa MJPEG de las aulas (calidad JPEG y ancho en píxeles; 0 mantiene la resolución)
+MJPEG_CALIDAD = int(os.getenv("MJPEG_CALIDAD", "80"))
+MJPEG_ANCHO = int(os.getenv("MJPEG_ANCHO", "0"))
+
+# Escritor diferido de asistencias (cola de eventos y volcado con bulk_write)
+ESCRITOR_COLA_MAX = int(os.getenv("ESCRITOR_COLA_MAX", "10000"))
+ESCRITOR_INTERVALO_S = float(os.getenv("ESCRITOR_INTERVALO_S", "2"))
+ESCRITOR_LOTE_MAX = int(os.getenv("ESCRITOR_LOTE_MAX", "500"))
+
+# Índice de horarios en memoria: segundos tras los que se vuelve a leer de MongoDB
+INDICE_HORARIOS_TTL_S = float(os.getenv("INDICE_HORARIOS_TTL_S", "300"))
+
+# Eventos en vivo (Server-Sent Events) del panel de transmisión
+SSE_HEARTBEAT_S = float(os.getenv("SSE_HEARTBEAT_S", "15"))
+SSE_COLA_MAX = int(os.getenv("SSE_COLA_MAX", "500"))
+
+# Caché de documentos de usuario autenticado
+CACHE_USUARIOS_TTL_S = float(os.getenv("CACHE_USUARIOS_TTL_S", "60"))
+CACHE_USUARIOS_MAX = int(os.getenv("CACHE_USUARIOS_MAX", "1024"))
+
+# Registro de Raspberry Pi en memoria y latidos de ultima_conexion agrupados.
+# Las altas, reasignaciones y revocaciones hechas en MongoDB tardan hasta RASPBERRY_CACHE_TTL_S en aplicarse
+RASPBERRY_CACHE_TTL_S = float(os.getenv("RASPBERRY_CACHE_TTL_S", "30"))
+RASPBERRY_LATIDO_MIN_S = float(os.getenv("RASPBERRY_LATIDO_MIN_S", "60"))
+RASPBERRY_LATIDO_INTERVALO_S = float(os.getenv("RASPBERRY_LATIDO_INTERVALO_S", "30"))
+
+# Índice de la galería de embeddings para la identificación ("exacto" o "ivf")
+GALERIA_BACKEND = os.getenv("GALERIA_BACKEND", "exacto")
+GALERIA_IVF_LISTAS = int(os.getenv("GALERIA_IVF_LISTAS", "0"))
+GALERIA_IVF_SONDEOS = int(os.getenv("GALERIA_IVF_SONDEOS", "8"))
+GALERIA_IVF_MIN = int(os.getenv("GALERIA_IVF_MIN", "5000"))
+# Precisión en memoria de la galería ("float32", "float16" o "int8") y candidatos de la
+# pasada previa por centroides de cada estudiante (0 la desactiva).
+# float16/int8 reducen la memoria a la mitad/cuarta parte, pero cada búsqueda convierte las
+# filas a float32: float16 es unas 2-2,5 veces más lento. Con galerías del tamaño de una
+# clase (cientos de KB) conviene float32; float16/int8 solo compensan con galerías muy grandes.
+GALERIA_PRECISION = os.getenv("GALERIA_PRECISION", "float32")
+GALERIA_CENTROIDES = int(os.getenv("GALERIA_CENTROIDES", "0"))
+
+# Tipo de dato con el que se guardan los embeddings binarios en MongoDB ("float32" o "float16")
+EMBEDDINGS_DTYPE = os.getenv("EMBEDDINGS_DTYPE", "float32")
+
+# Generación de embeddings en segundo plano para las fotos subidas
+EMBEDDINGS_LOTE = int(os.getenv("EMBEDDINGS_LOTE", "16"))
+EMBEDDINGS_DET_SIZE = int(os.getenv("EMBEDDINGS_DET_SIZE", "960"))
+EMBEDDINGS_POOL_TAMANO = int(os.getenv("EMBEDDINGS_POOL_TAMANO", "1"))
+# Hilos de lectura y decodificación en la importación en bloque de fotos
+IMPORTACION_HILOS = int(os.getenv("IMPORTACION_HILOS", "4"))
+
+# Directorio donde persistir las galerías compiladas por clase (.npy con memory-map); vacío lo desactiva
+GALERIAS_DIR = os.getenv("GALERIAS_DIR", "")
+
+# Miniaturas de las fotos de estudiantes y caché HTTP de /imagenes/<file_id>
+MINIATURA_LADO = int(os.getenv("MINIATURA_LADO", "256"))
+MINIATURA_CALIDAD = int(os.getenv("MINIATURA_CALIDAD", "80"))
+IMAGENES_CACHE_MAX_AGE_S = int(os.getenv("IMAGENES_CACHE_MAX_AGE_S", "86400"))
+# Ventana de las URLs firmadas de las imágenes: la URL no cambia dentro de la ventana y
+# sigue siendo válida hasta el final de la siguiente
+IMAGENES_URL_VENTANA_S = int(os.getenv("IMAGENES_URL_VENTANA_S", "43200"))
+
+# Validez mínima (segundos) del token del flujo de eventos de una clase (EventSource no envía cabeceras)
+EVENTOS_TOKEN_VENTANA_S = int(os.getenv("EVENTOS_TOKEN_VENTANA_S", "60"))
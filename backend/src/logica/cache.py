@@ -0,0 +1,59 @@
+import threading
+import time
+from collections import OrderedDict
+
+_AUSENTE = object()
+
+class CacheTTL:
+    def __init__(self, tamano_max=1024, ttl_s=60.0):
+        """
+        Caché en memoria con caducidad por tiempo y expulsión LRU, segura entre hilos.
+
+        :param tamano_max: Número máximo de entradas; al superarlo se expulsa la menos usada.
+        :param ttl_s: Segundos que una entrada es válida desde que se guardó.
+        """
+        self.tamano_max = tamano_max
+        self.ttl_s = ttl_s
+        self._entradas = OrderedDict()   # clave -> (caduca_en, valor)
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave, cargar=None):
+        """
+        Devuelve el valor de `clave` si está vigente. Si no lo está y se indica `cargar`,
+        lo obtiene con cargar(clave), lo guarda y lo devuelve. Los valores None no se guardan.
+        """
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._entradas.get(clave, _AUSENTE)
+            if entrada is not _AUSENTE and entrada[0] > ahora:
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+                return entrada[1]
+            self.fallos += 1
+        if cargar is None:
+            return None
+        valor = cargar(clave)
+        if valor is not None:
+            self.guardar(clave, valor)
+        return valor
+
+    def guardar(self, clave, valor):
+        with self._lock:
+            self._entradas[clave] = (time.monotonic() + self.ttl_s, valor)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.tamano_max:
+                self._entradas.popitem(last=False)
+
+    def invalidar(self, clave):
+        with self._lock:
+            self._entradas.pop(clave, None)
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def metricas(self):
+        with self._lock:
+            return {"entradas": len(self._entradas), "aciertos": self.aciertos, "fallos": self.fallos}
@@ -0,0 +1,100 @@
+import argparse
+import struct
+import numpy as np
+from bson.binary import Binary
+from pymongo import UpdateOne
+from src.config.settings import EMBEDDINGS_DTYPE
+from src.logica.database import estudiantes_collection, get_estudiantes
+from src.logica.logger import logger
+
+# Cabecera de 8 bytes: magic, versión, tipo de dato, relleno, dimensión (little-endian)
+MAGIC = b"EMB"
+VERSION = 1
+_CABECERA = struct.Struct("<3sBBxH")
+_DTYPES = {0: np.dtype("<f4"), 1: np.dtype("<f2")}
+_CODIGOS = {np.dtype(dtype).name: codigo for codigo, dtype in _DTYPES.items()}
+
+def codificar_embedding(embedding, dtype=EMBEDDINGS_DTYPE):
+    """
+    Empaqueta un embedding como BSON Binary con cabecera de versión, tipo y dimensión.
+
+    :param embedding: Vector (lista o array de numpy) de floats.
+    :param dtype: "float32" o "float16".
+    :return: bson.Binary listo para guardar en MongoDB.
+    """
+    if dtype not in _CODIGOS:
+        raise ValueError(f"Tipo de embedding no soportado: {dtype}. Opciones: {', '.join(_CODIGOS)}")
+    codigo = _CODIGOS[dtype]
+    vector = np.ascontiguousarray(embedding, dtype=_DTYPES[codigo]).reshape(-1)
+    return Binary(_CABECERA.pack(MAGIC, VERSION, codigo, len(vector)) + vector.tobytes())
+
+def decodificar_embedding(valor):
+    """
+    Devuelve el embedding como array de numpy. Los binarios se leen con np.frombuffer
+    sin copiar los datos (el array es de solo lectura); las listas de floats del formato
+    anterior se convierten a float32.
+
+    :param valor: bson.Binary/bytes con cabecera, o lista de floats.
+    :return: Array de numpy de una dimensión.
+    """
+    if not isinstance(valor, (bytes, bytearray, memoryview)):
+        return np.asarray(valor, dtype=np.float32)
+    magic, version, codigo, dimension = _CABECERA.unpack_from(valor)
+    if magic != MAGIC or version != VERSION or codigo not in _DTYPES:
+        raise ValueError(f"Embedding binario no reconocido (magic={magic!r}, versión={version}, tipo={codigo})")
+    return np.frombuffer(valor, dtype=_DTYPES[codigo], count=dimension, offset=_CABECERA.size)
+
+def decodificar_embeddings(valores):
+    """Decodifica la lista `embeddings` de un documento de estudiante."""
+    return [decodificar_embedding(valor) for valor in valores or []]
+
+def es_binario(valor):
+    return isinstance(valor, (bytes, bytearray))
+
+def migrar_embeddings(dtype=EMBEDDINGS_DTYPE, lote=500, simular=False):
+    """
+    Convierte a formato binario los embeddings guardados como listas de floats.
+    Es idempotente: los documentos ya migrados no vuelven a seleccionarse.
+
+    :param dtype: Tipo de dato con el que se empaquetan.
+    :param lote: Documentos por bulk_write.
+    :param simular: Si es True solo cuenta los documentos a migrar.
+    :return: Número de documentos migrados (o que se migrarían).
+    """
+    # Documentos con algún embedding guardado todavía como array de floats
+    filtro = {"embeddings": {"$elemMatch": {"$type": "array"}}}
+    if simular:
+        return estudiantes_collection.count_documents(filtro)
+
+    migrados = 0
+    operaciones = []
+    for estudiante in get_estudiantes(filtro, "embeddings"):
+        embeddings = [
+            valor if es_binario(valor) else codificar_embedding(valor, dtype)
+            for valor in estudiante["embeddings"]
+        ]
+        operaciones.append(UpdateOne({"id_estudiante": estudiante["id_estudiante"]}, {"$set": {"embeddings": embeddings}}))
+        if len(operaciones) >= lote:
+            migrados += estudiantes_collection.bulk_write(operaciones, ordered=False).modified_count
+            operaciones = []
+            logger.info(f"[EMBEDDINGS] {migrados} estudiantes migrados...")
+    if operaciones:
+        migrados += estudiantes_collection.bulk_write(operaciones, ordered=False).modified_count
+    return migrados
+
+"""
+    Migración de embeddings:
+    Convierte los embeddings de la colección `estudiantes` guardados como listas de floats
+    al formato binario empaquetado.
+"""
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migra los embeddings de los estudiantes a formato binario.")
+    parser.add_argument("--dtype", choices=list(_CODIGOS), default=EMBEDDINGS_DTYPE)
+    parser.add_argument("--lote", type=int, default=500, help="Documentos por bulk_write")
+    parser.add_argument("--simular", action="store_true", help="Solo contar los documentos pendientes de migrar")
+    args = parser.parse_args()
+
+    if args.simular:
+        logger.info(f"[EMBEDDINGS] {migrar_embeddings(simular=True)} estudiantes con embeddings en formato de lista")
+    else:
+        logger.info(f"[EMBEDDINGS] Migración completada: {migrar_embeddings(args.dtype, args.lote)} estudiantes actualizados ({args.dtype})")
@@ -1,4 +1,3 @@
-from datetime import datetime
 from src.servidor.api import mongo  
 from gridfs import GridFS
 
@@ -13,6 +12,20 @@ usuarios_collection = db["usuarios"]
 estudiantes_collection = db["estudiantes"]
 clases_collection = db["clases"]
 asistencias_collection = db["asistencias"]
+resumen_asistencias_collection = db["resumen_asistencias"]
+trabajos_embeddings_collection = db["trabajos_embeddings"]
+
+# Proyecciones con nombre de la colección estudiantes. Los embeddings solo se leen
+# cuando los pide el reconocimiento facial (o una operación que los modifica)
+PROYECCIONES_ESTUDIANTE = {
+    "resumen": {"embeddings": 0, "embeddings_imagenes": 0},
+    "nombres": {"_id": 0, "id_estudiante": 1, "nombre": 1, "apellido": 1},
+    "id": {"_id": 0, "id_estudiante": 1},
+    "clases": {"_id": 0, "id_estudiante": 1, "ids_clases": 1},
+    "fotos": {"_id": 0, "id_estudiante": 1, "imagenes_ids": 1, "ids_clases": 1},
+    "embeddings": {"_id": 0, "id_estudiante": 1, "embeddings": 1},
+    "fotos_embeddings": {"_id": 0, "id_estudiante": 1, "imagenes_ids": 1, "ids_clases": 1, "embeddings": 1, "embeddings_imagenes": 1},
+}
 
 # Configuración de GridFS para almacenar imágenes
 fs = GridFS(db, collection="imagenes_estudiantes")
@@ -22,16 +35,6 @@ def get_asignatura_by_id(id_asignatura):
     """Obtiene una asignatura por su id_asignatura."""
     return asignaturas_collection.find_one({"id_asignatura": id_asignatura})
 
-def update_raspberry_last_connection(id_raspberry_pi: str) -> None:
-    """
-    Actualiza la última conexión de una Raspberry Pi.
-    """
-    raspberry_collection.update_one(
-        {"id_raspberry_pi": id_raspberry_pi},
-        {"$set": {"ultima_conexion": datetime.utcnow().isoformat()}},
-        upsert=True
-    )
-
 def get_raspberry_by_id(id_raspberry_pi: str) -> dict:
     """
     Obtiene la configuración de una Raspberry Pi por su ID.
@@ -56,11 +59,40 @@ def get_clase_by_id(id_clase: str) -> dict:
     """
     return clases_collection.find_one({"id_clase": id_clase})
 
-def get_estudiantes_by_clase(id_clase: str) -> list:
+def _proyeccion_estudiante(proyeccion: str) -> dict:
+    if proyeccion not in PROYECCIONES_ESTUDIANTE:
+        raise ValueError(f"Proyección de estudiante desconocida: {proyeccion}. Opciones: {', '.join(PROYECCIONES_ESTUDIANTE)}")
+    return PROYECCIONES_ESTUDIANTE[proyeccion]
+
+def get_estudiante_by_id(id_estudiante: str, proyeccion: str = "resumen") -> dict:
+    """
+    Obtiene un estudiante por su ID con la proyección indicada (ver PROYECCIONES_ESTUDIANTE).
+    """
+    return estudiantes_collection.find_one({"id_estudiante": id_estudiante}, _proyeccion_estudiante(proyeccion))
+
+def get_estudiantes(filtro: dict = None, proyeccion: str = "resumen"):
+    """
+    Obtiene un cursor de estudiantes que cumplen el filtro, con la proyección indicada.
+    """
+    return estudiantes_collection.find(filtro or {}, _proyeccion_estudiante(proyeccion))
+
+def get_estudiantes_by_ids(ids_estudiantes, proyeccion: str = "resumen") -> list:
+    """
+    Obtiene varios estudiantes por su ID en una sola consulta.
+    """
+    return list(get_estudiantes({"id_estudiante": {"$in": list(set(ids_estudiantes))}}, proyeccion))
+
+def get_estudiantes_by_clase(id_clase: str, proyeccion: str = "resumen") -> list:
     """
     Obtiene los estudiantes inscritos en una clase.
     """
-    return list(estudiantes_collection.find({"ids_clases": id_clase}))
+    return list(get_estudiantes({"ids_clases": id_clase}, proyeccion))
+
+def existe_estudiante(id_estudiante: str) -> bool:
+    """
+    Indica si existe un estudiante con ese ID.
+    """
+    return get_estudiante_by_id(id_estudiante, "id") is not None
 
 def create_asistencia(id_clase: str, fecha: str, id_aula: str, registros: list) -> dict:
     """
@@ -95,4 +127,34 @@ def get_user_by_id(id_usuario: str) -> dict:
     """
     Obtiene un usuario por su ID.
     """
-    return usuarios_collection.find_one({"id_usuario": id_usuario})
\ No newline at end of file
+    return usuarios_collection.find_one({"id_usuario": id_usuario})
+
+def get_nombres_estudiantes(ids_estudiantes) -> dict:
+    """
+    Obtiene el nombre completo de varios estudiantes en una sola consulta.
+    Devuelve {id_estudiante: "nombre apellido"}.
+    """
+    estudiantes = get_estudiantes_by_ids(ids_estudiantes, "nombres")
+    return {e["id_estudiante"]: f"{e['nombre']} {e['apellido']}" for e in estudiantes}
+
+def get_nombres_asignaturas(ids_asignaturas) -> dict:
+    """
+    Obtiene el nombre de varias asignaturas en una sola consulta.
+    Devuelve {id_asignatura: nombre}.
+    """
+    cursor = asignaturas_collection.find(
+        {"id_asignatura": {"$in": list(set(ids_asignaturas))}},
+        {"_id": 0, "id_asignatura": 1, "nombre": 1}
+    )
+    return {a["id_asignatura"]: a["nombre"] for a in cursor}
+
+def get_nombres_aulas(ids_aulas) -> dict:
+    """
+    Obtiene el nombre de varias aulas en una sola consulta.
+    Devuelve {id_aula: nombre}.
+    """
+    cursor = aulas_collection.find(
+        {"id_aula": {"$in": list(set(ids_aulas))}},
+        {"_id": 0, "id_aula": 1, "nombre": 1}
+    )
+    return {a["id_aula"]: a["nombre"] for a in cursor}
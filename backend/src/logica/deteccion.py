@@ -1,12 +1,13 @@
 import cv2
 import numpy as np
-import torch
-from insightface.app import FaceAnalysis
 from ultralytics.trackers.byte_tracker import BYTETracker
 from argparse import Namespace
 import time
 import os
 from src.logica.embeddings_generator import EmbeddingsGenerator
+from src.logica.pool_modelos import obtener_pool
+from src.logica.inferencia import detectar_rostros, extraer_embeddings
+from src.logica.galeria import crear_indice, apilar_embeddings
 from src.logica.logger import logger
 
 args = Namespace(
@@ -25,17 +26,23 @@ class Detections:
         self.cls = cls
 
 class FaceTracker:
-    def __init__(self, frame_rate=30, embeddings_dict=None, detect_every_n=1, similarity_threshold=0.5, verbose=False, resolucion=(1024 , 768   )):
-        logger.info("Cargando modelo Buffalo para detección...")
-        self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
-        self.detector = FaceAnalysis(name="buffalo_sc", providers=['CUDAExecutionProvider'] if self.device == 'cuda' else ['CPUExecutionProvider'])
-        self.detector.prepare(ctx_id=0, det_size=resolucion)
-        logger.info(f"Modelo cargado exitosamente en {self.device}.")
+    def __init__(self, frame_rate=30, embeddings_dict=None, detect_every_n=1, similarity_threshold=0.5, verbose=False, resolucion=(1024 , 768   ), pool=None, planificador=None, reverificar_cada_s=5.0, min_detect_every_n=None, max_detect_every_n=None, galeria=None):
+        # El modelo se toma prestado de un pool compartido; el tracker solo guarda su propio estado
+        self.pool = pool if pool is not None else obtener_pool(det_size=resolucion)
+        self.device = self.pool.device
+        # Si hay planificador, la inferencia se agrupa en lotes con la de otras aulas
+        self.planificador = planificador
 
         self.tracker = BYTETracker(args, frame_rate=frame_rate)       
         logger.info("Tracker BYTETracker inicializado.")
 
         self.detect_interval = detect_every_n
+        # Intervalo de detección adaptativo según la latencia de procesado (si se indican límites)
+        self.frame_rate = frame_rate
+        self.min_detect_interval = min_detect_every_n or detect_every_n
+        self.max_detect_interval = max_detect_every_n or detect_every_n
+        self.latency_ema = None
+        self.last_interval_adjust = time.monotonic()
         self.frame_count = 0
         self.fps_start_time = time.time()
         self.last_faces = []
@@ -43,27 +50,21 @@ class FaceTracker:
         self.identified_faces = {}
         self.similarity_threshold = similarity_threshold
         self.verbose = verbose
-
-        # Preprocesar embeddings_dict para vectorización
-        if embeddings_dict:
-            embedding_list = []
-            self.all_ids = []
-            for alumno_id, emb_list in embeddings_dict.items():
-                for emb in emb_list:
-                    emb_array = np.array(emb, dtype=np.float32)
-                    if emb_array.ndim == 1 and emb_array.shape[0] == 512: 
-                        embedding_list.append(emb_array)
-                        self.all_ids.append(alumno_id)
-                    else:
-                        logger.warning(f"Embedding inválido para {alumno_id}: forma {emb_array.shape}, esperado (512,)")
-            if embedding_list:
-                self.all_stored_embeddings = np.stack(embedding_list)  
-                self.stored_norms = np.linalg.norm(self.all_stored_embeddings, axis=1)
-            else:
+        # Momento del último reconocimiento de cada track, para la reverificación periódica
+        self.reverificar_cada_s = reverificar_cada_s
+        self.ultima_verificacion = {}
+
+        # Índice de galería (exacto o aproximado) a partir de una galería ya compilada
+        # (embeddings, ids) o de embeddings_dict
+        if galeria is not None:
+            stored_embeddings, all_ids = galeria
+        else:
+            stored_embeddings, all_ids = apilar_embeddings(embeddings_dict)
+            if embeddings_dict and not all_ids:
                 logger.error("No se encontraron embeddings válidos en embeddings_dict.")
-                self.all_stored_embeddings = np.zeros((0, 512), dtype=np.float32)
-                self.all_ids = []
-                self.stored_norms = np.zeros((0,), dtype=np.float32)
+        self.galeria = crear_indice(stored_embeddings, all_ids)
+        if all_ids:
+            logger.info(f"Galería '{self.galeria.nombre}' ({self.galeria.almacen.precision}) con {len(self.galeria)} embeddings de {len(set(all_ids))} estudiantes, {self.galeria.almacen.nbytes / 2**20:.1f} MiB.")
     
     def update_fps(self, frame):
         """Calcula y dibuja los FPS en el frame."""
@@ -84,7 +85,7 @@ class FaceTracker:
         """Identifica rostros solo para tracks nuevos o desconocidos, respetando identidades conocidas."""
         
         # Verificación inicial, limpiar si no hay rostros
-        if not self.embeddings_dict or not faces or len(tracked_objects) == 0:
+        if len(self.galeria) == 0 or not faces or len(tracked_objects) == 0:
             if not faces:
                 logger.info("No se detectaron rostros.")
                 self.identified_faces.clear()
@@ -98,23 +99,29 @@ class FaceTracker:
         track_map = {track[-1]: track[-4] for track in tracked_objects if track[-1] >= 0}
         new_identified = {}
 
-        # Extraer embeddings de rostros detectados
-        current_embeddings = np.array([face.normed_embedding for face in faces])
-        current_norms = np.linalg.norm(current_embeddings, axis=1)[:, np.newaxis]
+        # Extraer embeddings solo de los rostros reconocidos en este frame
+        indices_con_embedding = [i for i, face in enumerate(faces) if face.embedding is not None]
+        if indices_con_embedding:
+            # normed_embedding ya tiene norma unidad, igual que la galería: la similitud coseno es el producto escalar
+            current_embeddings = np.array([faces[i].normed_embedding for i in indices_con_embedding], dtype=np.float32)
+
+            # Mejor candidato de la galería para cada rostro
+            best_similarities, best_indices = self.galeria.buscar(current_embeddings, k=1)
+            matches = zip(best_similarities[:, 0], best_indices[:, 0])
+        else:
+            matches = []
 
-        # Calcular similitudes vectorizadas
-        similarities = np.dot(current_embeddings, self.all_stored_embeddings.T) / (current_norms * self.stored_norms)
-        
         # Identificar rostros
-        for i, face_similarities in enumerate(similarities):
+        for i, (similarity, best_idx) in zip(indices_con_embedding, matches):
+            if best_idx < 0:
+                continue
             if i in track_map:
                 track_id = track_map[i]
                 # Identificar solo si es nuevo o "Desconocido"
                 if track_id not in self.identified_faces or self.identified_faces[track_id][0] == "Desconocido":
-                    best_idx = np.argmax(face_similarities)
-                    best_similarity = round(float(face_similarities[best_idx]), 4)  # Convertir a float nativo
+                    best_similarity = round(float(similarity), 4)  # Convertir a float nativo
                     if best_similarity >= self.similarity_threshold:
-                        best_match_id = self.all_ids[best_idx]
+                        best_match_id = self.galeria.ids[best_idx]
                         new_identified[track_id] = (best_match_id, best_similarity)                        
                     else:
                         new_identified[track_id] = ("Desconocido", best_similarity)                        
@@ -122,12 +129,11 @@ class FaceTracker:
                     # Actualizar similitudes solo si el track_id ya existe
                     if track_id in self.identified_faces:
                         previous_identity, previous_similarity = self.identified_faces[track_id]
-                        best_idx = np.argmax(face_similarities)
-                        best_similarity = round(float(face_similarities[best_idx]), 4)
+                        best_similarity = round(float(similarity), 4)
 
                         # Solo actualizar si la nueva similitud es mayor
                         if best_similarity > previous_similarity:                        
-                            best_match_id = self.all_ids[best_idx]
+                            best_match_id = self.galeria.ids[best_idx]
                             self.identified_faces[track_id] = (best_match_id, best_similarity)
                            
         # Actualizar solo tracks nuevos o "Desconocido"
@@ -138,9 +144,62 @@ class FaceTracker:
         # Limpiar tracks inactivos
         active_track_ids = set(track_map.values())
         self.identified_faces = {tid: info for tid, info in self.identified_faces.items() if tid in active_track_ids}
+        self.ultima_verificacion = {tid: t for tid, t in self.ultima_verificacion.items() if tid in active_track_ids}
 
         return self.identified_faces
 
+    def select_faces_to_recognize(self, faces, tracked_objects):
+        """
+        Devuelve los índices de los rostros cuyo track necesita embedding: tracks nuevos,
+        "Desconocido" o cuya última verificación supera `reverificar_cada_s`.
+        """
+        ahora = time.monotonic()
+        indices = []
+        for track in tracked_objects:
+            track_id, idx = track[-4], int(track[-1])
+            if idx < 0 or idx >= len(faces) or faces[idx].embedding is not None:
+                continue
+            identidad = self.identified_faces.get(track_id)
+            ultima = self.ultima_verificacion.get(track_id)
+            if (identidad is None or identidad[0] == "Desconocido"
+                    or ultima is None or ahora - ultima >= self.reverificar_cada_s):
+                indices.append(idx)
+                self.ultima_verificacion[track_id] = ahora
+        return indices
+
+    def recognize_faces(self, frame, faces):
+        """Calcula en lote los embeddings de los rostros indicados."""
+        if not faces:
+            return
+        if self.planificador is not None:
+            self.planificador.reconocer(frame, faces)
+        else:
+            with self.pool.prestar() as modelo:
+                extraer_embeddings(modelo, [(frame, face) for face in faces])
+
+    def update_detect_interval(self, frame_latency, alpha=0.1, cooldown_s=1.0):
+        """
+        Ajusta detect_interval con la latencia media por frame (media móvil exponencial):
+        sube si se supera el tiempo de un frame y baja si sobra más de la mitad.
+        """
+        if self.latency_ema is None:
+            self.latency_ema = frame_latency
+        else:
+            self.latency_ema = (1 - alpha) * self.latency_ema + alpha * frame_latency
+
+        now = time.monotonic()
+        if now - self.last_interval_adjust < cooldown_s:
+            return self.detect_interval
+
+        budget = 1.0 / self.frame_rate
+        if self.latency_ema > budget and self.detect_interval < self.max_detect_interval:
+            self.detect_interval += 1
+            self.last_interval_adjust = now
+        elif self.latency_ema < 0.5 * budget and self.detect_interval > self.min_detect_interval:
+            self.detect_interval -= 1
+            self.last_interval_adjust = now
+        return self.detect_interval
+
     def draw_tracking_info(self, frame, face_assignments, identified):
         """Dibuja los resultados de rostros identificados o desconocidos en el frame, con diseño mejorado."""
         h_frame, w_frame = frame.shape[:2]
@@ -171,12 +230,18 @@ class FaceTracker:
         """Procesa un frame de video, detectando y rastreando rostros."""
         self.frame_count += 1
 
-        # Asegurarse de que el frame sea escribible
-        frame_resized = frame.copy()
+        # Se dibuja sobre el propio frame; solo se copia si el buffer es de solo lectura
+        frame_resized = frame if frame.flags.writeable else frame.copy()
 
         # Limitar el procesamiento a cada N frames (detect_interval)
-        if self.frame_count % self.detect_interval == 0:
-            faces = self.detector.get(frame_resized)
+        # El detector se ejecuta sobre todo el frame; el reconocimiento se hace después, por track
+        detection_frame = self.frame_count % self.detect_interval == 0
+        if detection_frame:
+            if self.planificador is not None:
+                faces = self.planificador.detectar(frame_resized)
+            else:
+                with self.pool.prestar() as detector:
+                    faces = detectar_rostros(detector, frame_resized)
         else:
             faces = self.last_faces
                     
@@ -213,6 +278,11 @@ class FaceTracker:
                 face = faces[int(idx)]
                 face_assignments[track_id] = face.bbox.astype(int)
         
+        # Calcular embeddings solo para tracks nuevos, desconocidos o pendientes de reverificar
+        if detection_frame and faces and len(self.galeria):
+            pending = self.select_faces_to_recognize(faces, tracked_objects)
+            self.recognize_faces(frame_resized, [faces[i] for i in pending])
+
         # Identificar rostros
         identified = self.identify_faces(faces, tracked_objects)
 
@@ -0,0 +1,107 @@
+import threading
+import cv2
+from src.config.settings import MJPEG_CALIDAD, MJPEG_ANCHO
+from src.logica.logger import logger
+
+class DifusorMJPEG:
+    def __init__(self, calidad=MJPEG_CALIDAD, ancho=MJPEG_ANCHO):
+        """
+        Difusor MJPEG de un aula: codifica cada frame nuevo una sola vez y reparte
+        los mismos bytes JPEG a todos los clientes conectados.
+        La codificación se hace en un hilo propio, fuera de cualquier lock compartido
+        con el análisis, y solo mientras haya al menos un suscriptor.
+
+        :param calidad: Calidad JPEG de la vista previa (1-100).
+        :param ancho: Ancho de la vista previa en píxeles; 0 mantiene la resolución original.
+        """
+        self.calidad = int(calidad)
+        self.ancho = int(ancho)
+        self._cond = threading.Condition()
+        self._pendiente = None        # (frame, liberar) publicado y aún sin codificar
+        self._secuencia_frame = 0
+        self._jpeg = None
+        self._secuencia_jpeg = 0
+        self._suscriptores = 0
+        self._activo = True
+        self._hilo = threading.Thread(target=self._codificar, daemon=True)
+        self._hilo.start()
+
+    def publicar(self, frame, liberar=None):
+        """
+        Publica un frame nuevo. `liberar` se invoca cuando el difusor deja de necesitarlo,
+        ya sea tras codificarlo o porque un frame más reciente lo ha sustituido.
+        """
+        with self._cond:
+            if not self._activo:
+                anterior = (frame, liberar)
+            else:
+                anterior = self._pendiente
+                self._pendiente = (frame, liberar)
+                self._secuencia_frame += 1
+                self._cond.notify_all()
+        if anterior is not None and anterior[1] is not None:
+            anterior[1]()
+
+    def _preparar(self, frame):
+        """Reduce el frame a la resolución de vista previa configurada."""
+        alto, ancho = frame.shape[:2]
+        if self.ancho <= 0 or self.ancho >= ancho:
+            return frame
+        nuevo_alto = int(alto * self.ancho / ancho)
+        return cv2.resize(frame, (self.ancho, nuevo_alto), interpolation=cv2.INTER_AREA)
+
+    def _codificar(self):
+        while True:
+            with self._cond:
+                while self._activo and (self._pendiente is None or self._suscriptores == 0):
+                    self._cond.wait()
+                if not self._activo:
+                    return
+                (frame, liberar), self._pendiente = self._pendiente, None
+                secuencia = self._secuencia_frame
+
+            try:
+                ret, buffer = cv2.imencode('.jpg', self._preparar(frame), [cv2.IMWRITE_JPEG_QUALITY, self.calidad])
+            except Exception as e:
+                logger.error(f"Error al codificar frame JPEG: {e}")
+                ret = False
+            finally:
+                if liberar is not None:
+                    liberar()
+            if not ret:
+                continue
+
+            with self._cond:
+                self._jpeg = buffer.tobytes()
+                self._secuencia_jpeg = secuencia
+                self._cond.notify_all()
+
+    def suscribir(self):
+        """Generador multipart para un cliente: entrega cada JPEG nuevo una vez."""
+        with self._cond:
+            self._suscriptores += 1
+            self._cond.notify_all()
+        ultima = 0
+        try:
+            while True:
+                with self._cond:
+                    while self._activo and self._secuencia_jpeg == ultima:
+                        self._cond.wait()
+                    if not self._activo:
+                        return
+                    frame_bytes = self._jpeg
+                    ultima = self._secuencia_jpeg
+                yield (b'--frame\r\n'
+                       b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+        finally:
+            with self._cond:
+                self._suscriptores -= 1
+
+    def cerrar(self):
+        """Detiene el hilo de codificación y termina los streams de los clientes."""
+        with self._cond:
+            self._activo = False
+            pendiente, self._pendiente = self._pendiente, None
+            self._cond.notify_all()
+        if pendiente is not None and pendiente[1] is not None:
+            pendiente[1]()
@@ -0,0 +1,184 @@
+import atexit
+import queue
+import threading
+import time
+from datetime import datetime
+import pytz
+from pymongo import UpdateOne
+from src.config.settings import ESCRITOR_COLA_MAX, ESCRITOR_INTERVALO_S, ESCRITOR_LOTE_MAX
+from src.logica.database import asistencias_collection
+from src.logica.logger import logger
+from src.logica.estado_asistencias import estado_asistencias
+from src.logica.eventos_asistencia import bus_eventos
+from src.logica.resumen_asistencias import operacion_resumen, aplicar_operaciones
+
+class EscritorAsistencias:
+    def __init__(self, cola_max=ESCRITOR_COLA_MAX, intervalo_s=ESCRITOR_INTERVALO_S, lote_max=ESCRITOR_LOTE_MAX):
+        """
+        Escritor diferido de asistencias compartido por todas las aulas.
+        Las transmisiones encolan eventos de detección sin tocar MongoDB; un hilo los agrupa
+        por documento de asistencia y los vuelca con un único bulk_write por documento.
+
+        :param cola_max: Capacidad de la cola de eventos (si se llena, los eventos se rechazan).
+        :param intervalo_s: Tiempo máximo que un evento espera antes de volcarse.
+        :param lote_max: Número de eventos pendientes que fuerza un volcado anticipado.
+        """
+        self.intervalo_s = intervalo_s
+        self.lote_max = lote_max
+        self._cola = queue.Queue(maxsize=cola_max)
+        self._vaciar = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._sin_volcar = 0
+        self._stats = {
+            "encolados": 0,
+            "rechazados": 0,
+            "volcados": 0,
+            "escrituras": 0,
+            "max_profundidad": 0,
+            "ultima_duracion_ms": 0.0
+        }
+        self._hilo = threading.Thread(target=self._bucle, name="escritor-asistencias", daemon=True)
+        self._hilo.start()
+
+    def encolar(self, id_clase, id_estudiante, confianza, tiempo_inicio, tiempo_maximo_deteccion):
+        """
+        Encola una detección sin bloquear. La fecha y si es tardía se fijan en este momento.
+        Devuelve False si la cola está llena y el evento se ha rechazado.
+        """
+        now_utc = datetime.utcnow().replace(tzinfo=pytz.UTC)
+        now = now_utc.astimezone(pytz.timezone("Europe/Madrid"))
+        evento = {
+            "id_clase": id_clase,
+            "fecha": now.strftime("%Y-%m-%d"),
+            "id_estudiante": id_estudiante,
+            "confianza": confianza,
+            "es_tardia": time.time() - tiempo_inicio >= tiempo_maximo_deteccion,
+            "fecha_deteccion": now.isoformat()
+        }
+        try:
+            self._cola.put_nowait(evento)
+        except queue.Full:
+            with self._stats_lock:
+                self._stats["rechazados"] += 1
+            logger.warning(f"[ESCRITOR] Cola de asistencias llena; se descarta la detección de {id_estudiante} en clase {id_clase}")
+            return False
+        with self._stats_lock:
+            self._stats["encolados"] += 1
+            self._sin_volcar += 1
+            self._stats["max_profundidad"] = max(self._stats["max_profundidad"], self._cola.qsize())
+        return True
+
+    def vaciar(self):
+        """Pide al hilo escritor que vuelque de inmediato los eventos pendientes."""
+        self._vaciar.set()
+
+    def _bucle(self):
+        pendientes = {}
+        total_pendientes = 0
+        limite = time.monotonic() + self.intervalo_s
+        while True:
+            try:
+                evento = self._cola.get(timeout=max(0.0, min(0.5, limite - time.monotonic())))
+                pendientes.setdefault((evento["id_clase"], evento["fecha"]), []).append(evento)
+                total_pendientes += 1
+                # Recoger sin esperar lo que ya esté en la cola
+                while total_pendientes < self.lote_max:
+                    evento = self._cola.get_nowait()
+                    pendientes.setdefault((evento["id_clase"], evento["fecha"]), []).append(evento)
+                    total_pendientes += 1
+            except queue.Empty:
+                pass
+
+            ahora = time.monotonic()
+            if total_pendientes and (total_pendientes >= self.lote_max or ahora >= limite or self._vaciar.is_set()):
+                self._volcar(pendientes)
+                with self._stats_lock:
+                    self._sin_volcar -= total_pendientes
+                pendientes = {}
+                total_pendientes = 0
+            if ahora >= limite:
+                limite = ahora + self.intervalo_s
+            if self._vaciar.is_set() and not total_pendientes and self._cola.empty():
+                self._vaciar.clear()
+
+    def _volcar(self, pendientes):
+        """Aplica los eventos agrupados por documento y escribe solo los registros que cambian."""
+        inicio = time.perf_counter()
+        escrituras = 0
+        for (id_clase, fecha), eventos in pendientes.items():
+            try:
+                escrituras += self._volcar_documento(id_clase, fecha, eventos)
+            except Exception as e:
+                logger.error(f"[ESCRITOR] Error al volcar asistencias de clase {id_clase} en {fecha}: {e}")
+        duracion_ms = (time.perf_counter() - inicio) * 1000
+        with self._stats_lock:
+            self._stats["volcados"] += 1
+            self._stats["escrituras"] += escrituras
+            self._stats["ultima_duracion_ms"] = round(duracion_ms, 1)
+
+    def _volcar_documento(self, id_clase, fecha, eventos):
+        # Los eventos se aplican en orden sobre el estado en memoria de la sesión:
+        # no se relee el documento y solo se envía el estado final de los registros que cambian
+        doc_id = None
+        cambios = {}
+        estados_anteriores = {}
+        for evento in eventos:
+            resultado = estado_asistencias.aplicar_deteccion(
+                id_clase, fecha, evento["id_estudiante"],
+                evento["confianza"], evento["es_tardia"], evento["fecha_deteccion"]
+            )
+            if resultado:
+                doc_id, campos, estado_anterior = resultado
+                cambios.setdefault(evento["id_estudiante"], {}).update(campos)
+                estados_anteriores.setdefault(evento["id_estudiante"], estado_anterior)
+
+        if not cambios:
+            return 0
+
+        operaciones = [
+            UpdateOne(
+                {"_id": doc_id, "registros.id_estudiante": id_estudiante},
+                {"$set": {f"registros.$.{campo}": valor for campo, valor in campos.items()}}
+            )
+            for id_estudiante, campos in cambios.items()
+        ]
+        try:
+            asistencias_collection.bulk_write(operaciones, ordered=False)
+        except Exception:
+            # La copia en memoria ya no coincide con MongoDB: se vuelve a leer en el siguiente volcado
+            estado_asistencias.descartar(id_clase, fecha)
+            raise
+        resumenes = []
+        for id_estudiante, campos in cambios.items():
+            registro = estado_asistencias.registro(id_clase, fecha, id_estudiante) or campos
+            resumenes.append(operacion_resumen(
+                id_clase, id_estudiante, fecha,
+                estados_anteriores[id_estudiante], registro.get("estado"),
+                registro.get("fecha_deteccion_tardia") or registro.get("fecha_deteccion")
+            ))
+            bus_eventos.publicar(id_clase, "asistencia", {"id_estudiante": id_estudiante, **registro})
+            logger.info(f"Estudiante {id_estudiante} registrado como {registro.get('estado')} con confianza {registro.get('confianza'):.2f} para clase {id_clase}")
+        aplicar_operaciones(resumenes)
+        return len(operaciones)
+
+    def metricas(self):
+        """Métricas de presión de la cola y de los volcados."""
+        with self._stats_lock:
+            metricas = dict(self._stats)
+            metricas["sin_volcar"] = self._sin_volcar
+        metricas["profundidad"] = self._cola.qsize()
+        return metricas
+
+    def detener(self, timeout=5):
+        """Vuelca lo pendiente antes de terminar el proceso."""
+        self.vaciar()
+        limite = time.monotonic() + timeout
+        while time.monotonic() < limite:
+            with self._stats_lock:
+                if self._sin_volcar <= 0:
+                    return
+            time.sleep(0.05)
+        logger.warning("[ESCRITOR] Quedaron asistencias sin volcar al detener el escritor")
+
+escritor_asistencias = EscritorAsistencias()
+atexit.register(escritor_asistencias.detener)
@@ -0,0 +1,159 @@
+import threading
+from src.logica.database import asistencias_collection
+from src.logica.logger import logger
+
+def calcular_actualizacion_registro(registro, confianza, es_tardia, fecha_deteccion):
+    """
+    Calcula los campos de un registro de asistencia que cambian con una nueva detección.
+    Solo hay cambios si el estado pasa de "ausente" a detectado, si mejora la mejor
+    confianza o si es la primera detección tardía de un estudiante ya detectado.
+
+    Args:
+        registro (dict): Registro actual del estudiante en el documento de asistencia.
+        confianza (float): Nivel de similitud de la detección.
+        es_tardia (bool): Si la detección se produjo después del tiempo máximo.
+        fecha_deteccion (str): Fecha y hora de la detección en formato ISO.
+
+    Returns:
+        dict: Campos del registro a actualizar, o None si la detección no cambia nada.
+    """
+    # Si el estudiante ya tiene una detección (estado "confirmado" o "tarde")
+    if registro["estado"] in ["confirmado", "tarde"]:
+        update_fields = {}
+        confianza_existente = registro["confianza"]
+        if confianza_existente is None or confianza > confianza_existente:
+            update_fields["confianza"] = confianza
+            if es_tardia:
+                # Si es tardía, actualizar fecha_deteccion_tardia
+                update_fields["fecha_deteccion_tardia"] = fecha_deteccion
+            else:
+                # Si es a tiempo, actualizar fecha_deteccion
+                update_fields["fecha_deteccion"] = fecha_deteccion
+
+        # Registrar la primera detección tardía aunque no mejore la confianza
+        if es_tardia and "fecha_deteccion_tardia" not in update_fields and not registro.get("fecha_deteccion_tardia"):
+            update_fields["fecha_deteccion_tardia"] = fecha_deteccion
+
+        if not update_fields:
+            return None
+        return {
+            "confianza": update_fields.get("confianza", registro["confianza"]),
+            "fecha_deteccion": update_fields.get("fecha_deteccion", registro.get("fecha_deteccion")),
+            "fecha_deteccion_tardia": update_fields.get("fecha_deteccion_tardia", registro.get("fecha_deteccion_tardia"))
+        }
+
+    # Si el estudiante no tiene una detección previa (estado "ausente")
+    return {
+        "estado": "confirmado" if not es_tardia else "tarde",
+        "confianza": confianza,
+        "fecha_deteccion": None if es_tardia else fecha_deteccion,
+        "fecha_deteccion_tardia": fecha_deteccion if es_tardia else None,
+        "modificado_por_usuario": None,
+        "modificado_fecha": None
+    }
+
+class EstadoAsistencias:
+    """
+    Copia en memoria de los documentos de asistencia de las sesiones en curso,
+    indexada por (id_clase, fecha) y, dentro de cada sesión, por id_estudiante.
+    Durante una sesión el servidor es el único escritor salvo las correcciones manuales,
+    que se aplican también aquí para mantener la copia coherente.
+    """
+    def __init__(self):
+        self._sesiones = {}
+        self._lock = threading.Lock()
+
+    def _guardar(self, doc, reemplazar=True):
+        """
+        Guarda un documento de asistencia como sesión y descarta las de otras fechas.
+
+        :param reemplazar: Si es False y otro hilo ya cargó la sesión mientras se leía de
+                           MongoDB, se conserva y devuelve esa (puede tener cambios aplicados).
+        """
+        clave = (doc["id_clase"], doc["fecha"])
+        sesion = {
+            "_id": doc["_id"],
+            "registros": {r["id_estudiante"]: dict(r) for r in doc.get("registros", [])}
+        }
+        with self._lock:
+            for otra in [c for c in self._sesiones if c[1] != doc["fecha"]]:
+                del self._sesiones[otra]
+            if reemplazar:
+                self._sesiones[clave] = sesion
+                return sesion
+            return self._sesiones.setdefault(clave, sesion)
+
+    def cargar(self, doc):
+        """
+        Carga en memoria un documento de asistencia ya leído o recién creado.
+
+        :param doc: Documento de asistencia con id_clase, fecha y registros.
+        """
+        self._guardar(doc)
+        logger.debug(f"[ASISTENCIA] Sesión {doc['id_clase']} {doc['fecha']} cargada con {len(doc.get('registros', []))} registros")
+
+    def obtener(self, id_clase, fecha):
+        """Devuelve la sesión en memoria, leyéndola de MongoDB si aún no está cargada."""
+        with self._lock:
+            sesion = self._sesiones.get((id_clase, fecha))
+        if sesion is not None:
+            return sesion
+        doc = asistencias_collection.find_one({"id_clase": id_clase, "fecha": fecha})
+        if not doc:
+            return None
+        # find_one se hace fuera del lock: si otro hilo cargó la sesión entretanto, gana la suya
+        return self._guardar(doc, reemplazar=False)
+
+    def aplicar_deteccion(self, id_clase, fecha, id_estudiante, confianza, es_tardia, fecha_deteccion):
+        """
+        Aplica una detección a la sesión en memoria.
+
+        Returns:
+            tuple: (_id del documento, campos cambiados, estado anterior),
+            o None si no hay nada que escribir.
+        """
+        sesion = self.obtener(id_clase, fecha)
+        if sesion is None:
+            logger.warning(f"Documento no encontrado para clase {id_clase} en {fecha}")
+            return None
+        with self._lock:
+            registro = sesion["registros"].get(id_estudiante)
+            if registro is None:
+                logger.warning(f"Estudiante {id_estudiante} no encontrado en registros de clase {id_clase}")
+                return None
+            campos = calcular_actualizacion_registro(registro, confianza, es_tardia, fecha_deteccion)
+            if not campos:
+                return None
+            estado_anterior = registro["estado"]
+            registro.update(campos)
+        return sesion["_id"], campos, estado_anterior
+
+    def aplicar_correccion(self, id_clase, fecha, id_estudiante, campos):
+        """Aplica una corrección manual si la sesión está en memoria."""
+        with self._lock:
+            sesion = self._sesiones.get((id_clase, fecha))
+            if sesion is not None and id_estudiante in sesion["registros"]:
+                sesion["registros"][id_estudiante].update(campos)
+
+    def registro(self, id_clase, fecha, id_estudiante):
+        """Devuelve una copia del registro de un estudiante si la sesión está en memoria."""
+        with self._lock:
+            sesion = self._sesiones.get((id_clase, fecha))
+            if sesion is None or id_estudiante not in sesion["registros"]:
+                return None
+            return dict(sesion["registros"][id_estudiante])
+
+    def instantanea(self, id_clase, fecha):
+        """Devuelve una copia de todos los registros de la sesión (leyéndola si no está cargada)."""
+        sesion = self.obtener(id_clase, fecha)
+        if sesion is None:
+            return []
+        with self._lock:
+            return [dict(r) for r in sesion["registros"].values()]
+
+    def descartar(self, id_clase, fecha):
+        """Olvida una sesión para que se vuelva a leer de MongoDB la próxima vez."""
+        with self._lock:
+            self._sesiones.pop((id_clase, fecha), None)
+
+estado_asistencias = EstadoAsistencias()
@@ -0,0 +1,85 @@
+import json
+import queue
+import threading
+from src.config.settings import SSE_HEARTBEAT_S, SSE_COLA_MAX
+from src.logica.logger import logger
+
+class BusEventosAsistencia:
+    def __init__(self, heartbeat_s=SSE_HEARTBEAT_S, cola_max=SSE_COLA_MAX):
+        """
+        Bus de eventos en memoria para enviar por Server-Sent Events los cambios de asistencia
+        y de estado de transmisión de cada clase a los paneles de los profesores.
+
+        :param heartbeat_s: Segundos sin eventos tras los que se envía un latido al cliente.
+        :param cola_max: Eventos pendientes por cliente antes de considerarlo desincronizado.
+        """
+        self.heartbeat_s = heartbeat_s
+        self.cola_max = cola_max
+        self._suscriptores = {}   # id_clase -> set de colas
+        self._lock = threading.Lock()
+
+    def publicar(self, id_clase, tipo, datos):
+        """Envía un evento a todos los clientes suscritos a la clase sin bloquear al emisor."""
+        with self._lock:
+            colas = list(self._suscriptores.get(id_clase, ()))
+        for cola in colas:
+            try:
+                cola.put_nowait((tipo, datos))
+            except queue.Full:
+                # Cliente demasiado lento: se vacía su cola y se le pide volver a sincronizar
+                with cola.mutex:
+                    cola.queue.clear()
+                cola.put_nowait(("resincronizar", {}))
+
+    def suscriptores(self, id_clase):
+        with self._lock:
+            return len(self._suscriptores.get(id_clase, ()))
+
+    def _suscribir(self, id_clase):
+        cola = queue.Queue(maxsize=self.cola_max)
+        with self._lock:
+            self._suscriptores.setdefault(id_clase, set()).add(cola)
+        return cola
+
+    def _desuscribir(self, id_clase, cola):
+        with self._lock:
+            colas = self._suscriptores.get(id_clase)
+            if colas is not None:
+                colas.discard(cola)
+                if not colas:
+                    del self._suscriptores[id_clase]
+
+    @staticmethod
+    def _formatear(tipo, datos):
+        return f"event: {tipo}\ndata: {json.dumps(datos, default=str)}\n\n"
+
+    def flujo(self, id_clase, instantanea):
+        """
+        Generador SSE para un cliente: envía primero una instantánea completa y después
+        los eventos de la clase a medida que ocurren, con un latido periódico.
+
+        :param id_clase: Clase a la que se suscribe el cliente.
+        :param instantanea: Función sin argumentos que devuelve el estado completo actual.
+        """
+        # Suscribirse antes de la instantánea para no perder eventos entre ambas
+        cola = self._suscribir(id_clase)
+        logger.debug(f"[SSE] Cliente suscrito a clase {id_clase} ({self.suscriptores(id_clase)} conectados)")
+        try:
+            yield "retry: 3000\n\n"
+            yield self._formatear("instantanea", instantanea())
+            while True:
+                try:
+                    tipo, datos = cola.get(timeout=self.heartbeat_s)
+                except queue.Empty:
+                    yield ": latido\n\n"
+                    continue
+                if tipo in ("resincronizar", "transmision"):
+                    # Al empezar o terminar una transmisión cambia el conjunto de registros visibles
+                    yield self._formatear("instantanea", instantanea())
+                else:
+                    yield self._formatear(tipo, datos)
+        finally:
+            self._desuscribir(id_clase, cola)
+            logger.debug(f"[SSE] Cliente desconectado de clase {id_clase}")
+
+bus_eventos = BusEventosAsistencia()
@@ -0,0 +1,94 @@
+import csv
+import io
+import time
+from openpyxl import Workbook
+from src.logica.database import asistencias_collection, get_nombres_asignaturas, get_nombres_aulas, get_nombres_estudiantes
+from src.logica.logger import logger
+
+COLUMNAS_EXPORTACION = [
+    "Fecha",
+    "Clase",
+    "Aula",
+    "Estudiante",
+    "Estado",
+    "Fecha detección",
+    "Modificado por",
+    "Fecha modificación"
+]
+FILAS_POR_BLOQUE_CSV = 500  # Filas que se acumulan antes de enviar un fragmento CSV
+
+def hay_registros(query):
+    """Indica si algún documento de asistencia de la consulta tiene registros que exportar."""
+    return asistencias_collection.find_one({**query, "registros.0": {"$exists": True}}, {"_id": 1}) is not None
+
+def generar_filas(query, clases_dict):
+    """
+    Generador de filas de exportación recorriendo el cursor de asistencias.
+    Los nombres de asignaturas, aulas y estudiantes se resuelven antes, con una consulta
+    por colección, así que el recorrido no hace consultas adicionales.
+
+    :param query: Consulta sobre la colección de asistencias.
+    :param clases_dict: Diccionario {id_clase: documento de clase} de las clases exportadas.
+    """
+    nombres_asignaturas = get_nombres_asignaturas(
+        [c.get("id_asignatura") for c in clases_dict.values() if c.get("id_asignatura")]
+    )
+    nombres_aulas = get_nombres_aulas(asistencias_collection.distinct("id_aula", query))
+    nombres_estudiantes = get_nombres_estudiantes(asistencias_collection.distinct("registros.id_estudiante", query))
+
+    inicio = time.perf_counter()
+    filas = 0
+    cursor = asistencias_collection.find(query).sort([("fecha", 1), ("id_clase", 1)])
+    try:
+        for doc in cursor:
+            clase = clases_dict.get(doc["id_clase"], {})
+            nombre_clase = nombres_asignaturas.get(clase.get("id_asignatura"), "Asignatura desconocida")
+            nombre_aula = nombres_aulas.get(doc.get("id_aula"), "Aula desconocida")
+            for r in doc.get("registros", []):
+                filas += 1
+                yield [
+                    doc["fecha"],
+                    nombre_clase,
+                    nombre_aula,
+                    nombres_estudiantes.get(r["id_estudiante"], "Estudiante no registrado"),
+                    r.get("estado"),
+                    r.get("fecha_deteccion"),
+                    r.get("modificado_por_usuario"),
+                    r.get("modificado_fecha")
+                ]
+    finally:
+        cursor.close()
+        duracion = time.perf_counter() - inicio
+        ritmo = filas / duracion if duracion > 0 else 0.0
+        logger.info(f"[EXPORTAR] {filas} filas exportadas en {duracion:.2f} s ({ritmo:.0f} filas/s)")
+
+def generar_csv(filas):
+    """Convierte las filas en fragmentos CSV codificados en UTF-8, listos para enviarse en streaming."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNAS_EXPORTACION)
+    pendientes = 0
+    for fila in filas:
+        writer.writerow(["" if valor is None else valor for valor in fila])
+        pendientes += 1
+        if pendientes >= FILAS_POR_BLOQUE_CSV:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate(0)
+            pendientes = 0
+    yield buffer.getvalue().encode("utf-8")
+
+def escribir_xlsx(filas, destino):
+    """
+    Escribe las filas en un libro XLSX con el modo write_only de openpyxl,
+    que vuelca cada fila a disco en lugar de mantener la hoja en memoria.
+
+    :param filas: Iterable de filas.
+    :param destino: Fichero binario donde guardar el libro.
+    """
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet("Asistencias")
+    hoja.append(COLUMNAS_EXPORTACION)
+    for fila in filas:
+        hoja.append(fila)
+    libro.save(destino)
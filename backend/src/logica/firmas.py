@@ -0,0 +1,32 @@
+import hashlib
+import hmac
+import time
+from src.config.settings import JWT_SECRET_KEY
+
+def _firma(recurso, expira):
+    mensaje = f"{recurso}:{expira}".encode("utf-8")
+    return hmac.new(JWT_SECRET_KEY.encode("utf-8"), mensaje, hashlib.sha256).hexdigest()
+
+def firmar(recurso, ventana):
+    """
+    Credencial de corta duración limitada a un único recurso (por ejemplo "imagen:<file_id>"),
+    para los casos en los que el navegador no puede enviar la cabecera Authorization.
+    La caducidad se redondea a la ventana, así que dentro de la misma ventana se devuelve la
+    misma firma y la URL (y la caché del navegador) no cambia en cada petición.
+
+    :param recurso: Identificador del recurso al que da acceso la firma.
+    :param ventana: Segundos de la ventana; la firma es válida entre `ventana` y 2·`ventana`.
+    :return: Tupla (expira, firma), con `expira` en segundos epoch.
+    """
+    expira = (int(time.time()) // ventana + 2) * ventana
+    return expira, _firma(recurso, expira)
+
+def verificar(recurso, expira, firma):
+    """Comprueba que la firma corresponde al recurso y que no ha caducado."""
+    try:
+        expira = int(expira)
+    except (TypeError, ValueError):
+        return False
+    if not firma or expira < time.time():
+        return False
+    return hmac.compare_digest(_firma(recurso, expira), firma)
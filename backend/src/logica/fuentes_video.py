@@ -0,0 +1,285 @@
+import cv2
+import subprocess
+import threading
+import time
+import numpy as np
+from src.logica.logger import logger
+
+def _log_ffmpeg_stderr(process):
+    """Registra los mensajes de error de FFmpeg en un hilo separado."""
+    while True:
+        stderr_line = process.stderr.readline().decode().strip()
+        if not stderr_line and process.poll() is not None:
+            break
+        # Logging desactivado por rendimiento; descomentar si es necesario para depuración
+        #if stderr_line:
+        #   logger.debug(f"[FFMPEG] {stderr_line}")
+
+def iniciar_ffmpeg(width, height):
+    """
+    Lanza FFmpeg para recibir el stream RTP descrito en stream.sdp y decodificarlo a BGR24.
+    Devuelve el proceso de FFmpeg con un hilo que consume su stderr.
+    """
+    logger.info("Iniciando recepción de video desde FFmpeg...")
+
+    cmd = [
+        "ffmpeg",
+        "-thread_queue_size", "1024",
+        "-protocol_whitelist", "file,udp,rtp",
+        "-fflags", "+nobuffer+genpts+discardcorrupt",
+        "-flags", "+low_delay",
+        "-max_delay", "100000",
+        "-analyzeduration", "100000",
+        "-probesize", "100000",
+        "-i", "stream.sdp",
+        "-s", f"{width}x{height}",
+        "-pix_fmt", "bgr24",
+        "-f", "rawvideo",
+        "-vcodec", "rawvideo",
+        "-"
+    ]
+    proceso = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        bufsize=0  # Desactivar el buffering
+    )
+    logger.info(f"FFmpeg iniciado, PID: {proceso.pid}")
+    # Hilo para stderr
+    stderr_thread = threading.Thread(
+        target=_log_ffmpeg_stderr,
+        args=(proceso,),
+        daemon=True
+    )
+    stderr_thread.start()
+    return proceso
+
+# Huecos de frame preasignados por aula: lectura, último leído, procesado,
+# pendiente en el difusor, en codificación JPEG y uno de margen
+HUECOS_ANILLO = 6
+
+class AnilloFrames:
+    def __init__(self, width, height, huecos=HUECOS_ANILLO):
+        """
+        Anillo de frames BGR preasignados en el que FFmpeg escribe directamente con readinto.
+        Cada hueco lleva un contador de referencias; solo se reutiliza cuando nadie lo retiene.
+        El propio array del hueco actúa como identificador en retener/liberar.
+
+        :param width: Ancho de los frames.
+        :param height: Alto de los frames.
+        :param huecos: Número de frames preasignados.
+        """
+        self._bloque = np.empty((huecos, height, width, 3), dtype=np.uint8)
+        self.huecos = [self._bloque[i] for i in range(huecos)]
+        self._vistas = [memoryview(hueco).cast('B') for hueco in self.huecos]
+        self._indices = {id(hueco): i for i, hueco in enumerate(self.huecos)}
+        self._referencias = [0] * huecos
+        self._siguiente = 0
+        self._lock = threading.Lock()
+
+    def reservar(self):
+        """Devuelve un hueco libre con una referencia del escritor, o None si todos están en uso."""
+        with self._lock:
+            total = len(self.huecos)
+            for k in range(total):
+                i = (self._siguiente + k) % total
+                if self._referencias[i] == 0:
+                    self._referencias[i] = 1
+                    self._siguiente = (i + 1) % total
+                    return self.huecos[i]
+        return None
+
+    def vista(self, hueco):
+        """Vista de bytes del hueco para escribir en él con readinto."""
+        return self._vistas[self._indices[id(hueco)]]
+
+    def retener(self, frame):
+        """Añade una referencia al hueco; no hace nada si el frame no pertenece al anillo."""
+        i = self._indices.get(id(frame))
+        if i is not None:
+            with self._lock:
+                self._referencias[i] += 1
+
+    def liberar(self, frame):
+        """Quita una referencia al hueco; no hace nada si el frame no pertenece al anillo."""
+        i = self._indices.get(id(frame))
+        if i is not None:
+            with self._lock:
+                self._referencias[i] = max(0, self._referencias[i] - 1)
+
+class MetricasIngesta:
+    """Contadores de la ingesta de un aula: frames, copias de frame completas y descartes."""
+    def __init__(self):
+        self.frames = 0
+        self.copias = 0
+        self.descartados = 0
+        self._ultimo_informe = time.time()
+
+    def registrar_frame(self, copias=0):
+        self.frames += 1
+        self.copias += copias
+
+    def registrar_descarte(self):
+        self.descartados += 1
+
+    def resumen(self):
+        return {
+            "frames": self.frames,
+            "copias": self.copias,
+            "copias_por_frame": round(self.copias / self.frames, 2) if self.frames else 0.0,
+            "descartados": self.descartados
+        }
+
+    def toca_informar(self, intervalo):
+        """Indica si han pasado `intervalo` segundos desde el último informe."""
+        ahora = time.time()
+        if ahora - self._ultimo_informe >= intervalo:
+            self._ultimo_informe = ahora
+            return True
+        return False
+
+def _leer_completo(stream, vista, detener_evento):
+    """Rellena `vista` con readinto; devuelve False si el stream termina antes."""
+    leidos = 0
+    total = len(vista)
+    while leidos < total:
+        if detener_evento.is_set():
+            return False
+        n = stream.readinto(vista[leidos:])
+        if not n:
+            return False
+        leidos += n
+    return True
+
+def leer_frames_ffmpeg(proceso, width, height, detener_evento, anillo=None, metricas=None):
+    """
+    Generador de frames BGR (H×W×3) leídos de la salida estándar de FFmpeg.
+    Los bytes se escriben directamente en un hueco del anillo y se entrega una vista de él,
+    sin copias intermedias. El hueco queda retenido hasta que se pide el siguiente frame.
+    Termina cuando se activa `detener_evento` o FFmpeg finaliza.
+    """
+    anillo = anillo if anillo is not None else AnilloFrames(width, height)
+    frame_size = width * height * 3  # bytes por frame: W×H×3 canales
+    descarte = None
+
+    while not detener_evento.is_set():
+        hueco = anillo.reservar()
+        if hueco is None:
+            # Todos los huecos retenidos: se lee el frame en un buffer aparte y se descarta
+            if descarte is None:
+                descarte = memoryview(bytearray(frame_size))
+            vista = descarte
+        else:
+            vista = anillo.vista(hueco)
+
+        try:
+            completo = _leer_completo(proceso.stdout, vista, detener_evento)
+        except Exception as e:
+            logger.debug(f"Error al leer datos de FFmpeg: {e}")
+            completo = False
+
+        if hueco is None:
+            if metricas is not None:
+                metricas.registrar_descarte()
+            continue
+        if not completo:
+            anillo.liberar(hueco)
+            if proceso.poll() is not None:
+                logger.warning("FFmpeg ha terminado; fin de la lectura de frames")
+                break
+            continue
+
+        try:
+            yield hueco
+        finally:
+            anillo.liberar(hueco)
+
+class LectorUltimoFrame:
+    def __init__(self, frames, anillo=None, metricas=None):
+        """
+        Desacopla la lectura del análisis: un hilo consume `frames` y conserva solo el más reciente.
+        Si el análisis va más lento que la fuente, los frames intermedios se descartan
+        en lugar de acumularse en la tubería de FFmpeg.
+
+        :param frames: Iterable de frames (por ejemplo, leer_frames_ffmpeg).
+        :param anillo: Anillo al que pertenecen los frames, para retener el último leído.
+        :param metricas: MetricasIngesta donde se cuentan los frames descartados.
+        """
+        self._frames = frames
+        self._anillo = anillo
+        self._metricas = metricas
+        self._cond = threading.Condition()
+        self._ultimo = None
+        self._terminado = False
+        self.descartados = 0
+        self._hilo = threading.Thread(target=self._leer, daemon=True)
+        self._hilo.start()
+
+    def _retener(self, frame):
+        if self._anillo is not None:
+            self._anillo.retener(frame)
+
+    def _liberar(self, frame):
+        if self._anillo is not None:
+            self._anillo.liberar(frame)
+
+    def _leer(self):
+        try:
+            for frame in self._frames:
+                self._retener(frame)
+                with self._cond:
+                    if self._ultimo is not None:
+                        # El análisis no llegó a tiempo para el frame anterior
+                        self._liberar(self._ultimo)
+                        self.descartados += 1
+                        if self._metricas is not None:
+                            self._metricas.registrar_descarte()
+                    self._ultimo = frame
+                    self._cond.notify()
+        except Exception as e:
+            logger.error(f"Error en el hilo lector de frames: {e}")
+        finally:
+            with self._cond:
+                self._terminado = True
+                self._cond.notify_all()
+
+    def __iter__(self):
+        """Entrega siempre el frame más reciente; termina cuando la fuente se agota."""
+        while True:
+            with self._cond:
+                while self._ultimo is None and not self._terminado:
+                    self._cond.wait()
+                if self._ultimo is None:
+                    return
+                frame = self._ultimo
+                self._ultimo = None
+            try:
+                yield frame
+            finally:
+                self._liberar(frame)
+
+def leer_frames_locales(cap, detener_evento):
+    """
+    Generador de frames de una cámara o vídeo local, respetando los FPS de la fuente.
+    Termina cuando se activa `detener_evento` o la fuente deja de devolver frames.
+    """
+    # Obtener FPS real del vídeo y calcular el intervalo entre cuadros
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    if fps <= 0:
+        fps = 30  # fallback si no lo detecta bien
+    frame_interval = 1.0 / fps
+
+    while not detener_evento.is_set():
+        t0 = time.time()
+        ret, frame = cap.read()
+        if not ret:
+            logger.error("No se pudo leer un frame de la cámara")
+            break
+
+        yield frame
+
+        # Esperar el resto del intervalo si el procesamiento fue rápido
+        elapsed = time.time() - t0
+        to_sleep = frame_interval - elapsed
+        if to_sleep > 0:
+            time.sleep(to_sleep)
@@ -0,0 +1,386 @@
+import argparse
+import time
+import numpy as np
+from src.config.settings import GALERIA_BACKEND, GALERIA_PRECISION, GALERIA_CENTROIDES, GALERIA_IVF_LISTAS, GALERIA_IVF_SONDEOS, GALERIA_IVF_MIN
+from src.logica.logger import logger
+
+DIMENSION_EMBEDDING = 512
+PRECISIONES = ("float32", "float16", "int8")
+
+def normalizar(matriz):
+    """Devuelve las filas de la matriz con norma unidad (las filas nulas se dejan a cero)."""
+    matriz = np.asarray(matriz, dtype=np.float32)
+    normas = np.linalg.norm(matriz, axis=-1, keepdims=True)
+    return matriz / np.maximum(normas, 1e-12)
+
+def apilar_embeddings(embeddings_dict):
+    """
+    Apila {id_estudiante: [embedding, ...]} en una matriz (n, 512) float32 y la lista con el
+    id_estudiante de cada fila. Los embeddings con otra forma se descartan con un aviso.
+    """
+    embedding_list = []
+    ids = []
+    for id_estudiante, emb_list in (embeddings_dict or {}).items():
+        for emb in emb_list:
+            emb_array = np.asarray(emb, dtype=np.float32)
+            if emb_array.ndim == 1 and emb_array.shape[0] == DIMENSION_EMBEDDING:
+                embedding_list.append(emb_array)
+                ids.append(id_estudiante)
+            else:
+                logger.warning(f"Embedding inválido para {id_estudiante}: forma {emb_array.shape}, esperado ({DIMENSION_EMBEDDING},)")
+    if not embedding_list:
+        return np.zeros((0, DIMENSION_EMBEDDING), dtype=np.float32), ids
+    return np.stack(embedding_list), ids
+
+class AlmacenEmbeddings:
+    def __init__(self, matriz, precision="float32"):
+        """
+        Matriz de embeddings unitarios guardada de forma compacta.
+        En int8 cada fila se cuantiza con su propia escala (max|x| / 127).
+
+        :param matriz: Matriz (n, 512) float32 con filas de norma unidad.
+        :param precision: "float32", "float16" o "int8".
+        """
+        if precision not in PRECISIONES:
+            raise ValueError(f"Precisión de galería desconocida: {precision}. Opciones: {', '.join(PRECISIONES)}")
+        self.precision = precision
+        self.escalas = None
+        if precision == "int8":
+            escalas = np.maximum(np.abs(matriz).max(axis=1, initial=0.0), 1e-12) / 127.0
+            self.datos = np.round(matriz / escalas[:, np.newaxis]).astype(np.int8)
+            self.escalas = escalas.astype(np.float32)
+        else:
+            self.datos = np.ascontiguousarray(matriz, dtype=precision)
+
+    def __len__(self):
+        return len(self.datos)
+
+    @property
+    def nbytes(self):
+        return self.datos.nbytes + (self.escalas.nbytes if self.escalas is not None else 0)
+
+    def _puntuar_filas(self, consultas, filas, escalas):
+        if self.precision == "float32":
+            return consultas @ filas.T
+        # numpy no tiene productos matriciales nativos en float16/int8: se convierte el bloque
+        similitudes = consultas @ filas.astype(np.float32).T
+        if escalas is not None:
+            similitudes *= escalas
+        return similitudes
+
+    def puntuar(self, consultas, posiciones=None, bloque=16384):
+        """
+        Producto escalar (similitud coseno) de cada consulta con las filas indicadas.
+
+        :param consultas: Matriz (m, 512) float32 de embeddings unitarios.
+        :param posiciones: Filas a puntuar; None puntúa toda la galería por bloques.
+        :return: Matriz (m, len(posiciones)) float32.
+        """
+        if posiciones is not None:
+            escalas = self.escalas[posiciones] if self.escalas is not None else None
+            return self._puntuar_filas(consultas, self.datos[posiciones], escalas)
+        if self.precision == "float32":
+            return consultas @ self.datos.T
+        return np.concatenate([
+            self._puntuar_filas(consultas, self.datos[i:i + bloque], self.escalas[i:i + bloque] if self.escalas is not None else None)
+            for i in range(0, len(self.datos), bloque)
+        ], axis=1) if len(self.datos) else np.zeros((len(consultas), 0), dtype=np.float32)
+
+class IndiceGaleria:
+    """
+    Índice de búsqueda sobre la galería de embeddings de los estudiantes.
+    Los embeddings se normalizan una sola vez al construir el índice y se guardan en la
+    precisión configurada; las implementaciones devuelven la similitud coseno de los k
+    embeddings más parecidos.
+    """
+    nombre = None
+
+    def __init__(self, embeddings, ids, precision=GALERIA_PRECISION):
+        """
+        :param embeddings: Matriz (n, 512) con un embedding por fila.
+        :param ids: Lista de n id_estudiante, uno por fila de `embeddings`.
+        :param precision: Precisión en memoria de la galería ("float32", "float16" o "int8").
+        """
+        ids = list(ids)
+        normalizados = normalizar(embeddings).reshape(-1, DIMENSION_EMBEDDING)
+        # Las implementaciones pueden reordenar las filas (por lista o por estudiante)
+        orden = self._preparar(normalizados, ids)
+        self.ids = [ids[i] for i in orden]
+        self.almacen = AlmacenEmbeddings(normalizados[orden], precision)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _preparar(self, normalizados, ids):
+        """Prepara las estructuras auxiliares del índice y devuelve el orden de las filas."""
+        return np.arange(len(ids))
+
+    def buscar(self, consultas, k=1):
+        """
+        Busca los k embeddings de la galería más similares a cada consulta.
+
+        :param consultas: Matriz (m, 512) de embeddings de norma unidad (como `normed_embedding`
+                          de InsightFace); no se vuelven a normalizar en cada frame.
+        :param k: Número de candidatos por consulta.
+        :return: Tupla (similitudes, indices), ambas de forma (m, k) y ordenadas de mayor
+                 a menor similitud. Los índices se refieren a `self.ids`; los huecos sin
+                 candidato llevan índice -1 y similitud -inf.
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def _consultas(consultas):
+        return np.asarray(consultas, dtype=np.float32).reshape(-1, DIMENSION_EMBEDDING)
+
+    @staticmethod
+    def _vacio(m, k):
+        return np.full((m, k), -np.inf, dtype=np.float32), np.full((m, k), -1, dtype=np.int64)
+
+    @staticmethod
+    def _top_k(similitudes, k):
+        """Índices de las k mayores similitudes de cada fila, ordenados de mayor a menor."""
+        k = min(k, similitudes.shape[1])
+        if k < similitudes.shape[1]:
+            candidatos = np.argpartition(-similitudes, k - 1, axis=1)[:, :k]
+        else:
+            candidatos = np.tile(np.arange(similitudes.shape[1]), (similitudes.shape[0], 1))
+        orden = np.argsort(-np.take_along_axis(similitudes, candidatos, axis=1), axis=1)
+        return np.take_along_axis(candidatos, orden, axis=1)
+
+    @staticmethod
+    def _agrupar(claves, grupos):
+        """
+        Orden estable de las filas por grupo y límites de cada grupo en ese orden,
+        de forma que las filas del grupo g ocupan [limites[g], limites[g + 1]).
+        """
+        orden = np.argsort(claves, kind="stable")
+        limites = np.searchsorted(claves[orden], np.arange(grupos + 1))
+        return orden, limites
+
+    def _buscar_en_grupos(self, consultas, centroides, sondeos, limites, k):
+        """
+        Primera pasada contra los centroides de los grupos y puntuación exacta de las
+        filas de los `sondeos` grupos más cercanos a cada consulta.
+        """
+        similitudes_out, indices_out = self._vacio(len(consultas), k)
+        grupos_cercanos = self._top_k(consultas @ centroides.T, sondeos)
+        for fila, (consulta, grupos) in enumerate(zip(consultas, grupos_cercanos)):
+            posiciones = np.concatenate([np.arange(limites[g], limites[g + 1]) for g in grupos])
+            if len(posiciones) == 0:
+                continue
+            similitudes = self.almacen.puntuar(consulta[np.newaxis, :], posiciones)
+            mejores = self._top_k(similitudes, k)[0]
+            indices_out[fila, :len(mejores)] = posiciones[mejores]
+            similitudes_out[fila, :len(mejores)] = similitudes[0, mejores]
+        return similitudes_out, indices_out
+
+class IndiceExacto(IndiceGaleria):
+    """
+    Búsqueda exhaustiva: un único producto matricial contra toda la galería.
+    Con `centroides` > 0 se hace antes una pasada contra el embedding medio de cada
+    estudiante y solo se puntúan exactamente los embeddings de los mejores candidatos.
+    """
+    nombre = "exacto"
+
+    def __init__(self, embeddings, ids, centroides=GALERIA_CENTROIDES, **opciones):
+        """
+        :param centroides: Estudiantes candidatos que se puntúan tras la pasada por centroides; 0 la desactiva.
+        """
+        self.candidatos = max(0, int(centroides))
+        self.centroides = None
+        super().__init__(embeddings, ids, **opciones)
+
+    def _preparar(self, normalizados, ids):
+        estudiantes = list(dict.fromkeys(ids))
+        # La pasada por centroides solo compensa si reduce el número de filas a puntuar
+        if not self.candidatos or self.candidatos >= len(estudiantes):
+            self.candidatos = 0
+            return np.arange(len(ids))
+        posicion = {id_estudiante: i for i, id_estudiante in enumerate(estudiantes)}
+        claves = np.array([posicion[id_estudiante] for id_estudiante in ids])
+        orden, self.limites = self._agrupar(claves, len(estudiantes))
+        sumas = np.zeros((len(estudiantes), DIMENSION_EMBEDDING), dtype=np.float32)
+        np.add.at(sumas, claves, normalizados)
+        self.centroides = normalizar(sumas)
+        return orden
+
+    def buscar(self, consultas, k=1):
+        consultas = self._consultas(consultas)
+        if len(self) == 0 or len(consultas) == 0:
+            return self._vacio(len(consultas), k)
+        if self.candidatos:
+            return self._buscar_en_grupos(consultas, self.centroides, self.candidatos, self.limites, k)
+        similitudes_out, indices_out = self._vacio(len(consultas), k)
+        similitudes = self.almacen.puntuar(consultas)
+        indices = self._top_k(similitudes, k)
+        kk = indices.shape[1]
+        indices_out[:, :kk] = indices
+        similitudes_out[:, :kk] = np.take_along_axis(similitudes, indices, axis=1)
+        return similitudes_out, indices_out
+
+class IndiceIVF(IndiceGaleria):
+    """
+    Índice de ficheros invertidos (IVF): la galería se reparte en listas mediante k-means
+    esférico y cada consulta solo se compara con los embeddings de las `sondeos` listas
+    cuyos centroides son más parecidos. La puntuación final dentro de esas listas es exacta.
+    """
+    nombre = "ivf"
+
+    def __init__(self, embeddings, ids, listas=GALERIA_IVF_LISTAS, sondeos=GALERIA_IVF_SONDEOS, iteraciones=10, semilla=0, **opciones):
+        """
+        :param listas: Número de listas (centroides); 0 usa ~4·sqrt(n).
+        :param sondeos: Listas que se recorren por consulta; más sondeos dan más recall y más latencia.
+        :param iteraciones: Iteraciones de k-means al construir el índice.
+        :param semilla: Semilla del generador aleatorio, para que el índice sea reproducible.
+        """
+        self.listas = listas
+        self.sondeos = sondeos
+        self.iteraciones = iteraciones
+        self.semilla = semilla
+        super().__init__(embeddings, ids, **opciones)
+
+    def _preparar(self, normalizados, ids):
+        n = len(ids)
+        listas = self.listas if self.listas > 0 else int(4 * np.sqrt(n))
+        self.listas = max(1, min(listas, n))
+        self.sondeos = max(1, min(self.sondeos, self.listas))
+        inicio = time.perf_counter()
+        if n:
+            self.centroides = self._kmeans(normalizados, np.random.default_rng(self.semilla))
+            asignacion = self._asignar(normalizados)
+        else:
+            self.centroides = np.zeros((0, DIMENSION_EMBEDDING), dtype=np.float32)
+            asignacion = np.zeros((0,), dtype=np.int64)
+        # Las filas se reordenan por lista para que cada lista sea un bloque contiguo
+        orden, self.limites = self._agrupar(asignacion, self.listas)
+        logger.info(f"[GALERIA] Índice IVF de {n} embeddings en {self.listas} listas construido en {time.perf_counter() - inicio:.2f}s")
+        return orden
+
+    def _asignar(self, matriz, bloque=65536):
+        """Centroide más próximo de cada fila, procesando por bloques para acotar la memoria."""
+        return np.concatenate([
+            np.argmax(matriz[i:i + bloque] @ self.centroides.T, axis=1)
+            for i in range(0, len(matriz), bloque)
+        ])
+
+    def _kmeans(self, normalizados, rng):
+        # Se entrena con una muestra; 256 puntos por lista bastan para situar los centroides
+        muestra_max = 256 * self.listas
+        muestra = normalizados if len(normalizados) <= muestra_max else normalizados[rng.choice(len(normalizados), muestra_max, replace=False)]
+        self.centroides = muestra[rng.choice(len(muestra), self.listas, replace=False)].copy()
+        for _ in range(self.iteraciones):
+            asignacion = self._asignar(muestra)
+            sumas = np.zeros_like(self.centroides)
+            np.add.at(sumas, asignacion, muestra)
+            vacias = ~sumas.any(axis=1)
+            # Las listas que se quedan vacías se reinician con puntos al azar de la muestra
+            sumas[vacias] = muestra[rng.choice(len(muestra), int(vacias.sum()))]
+            self.centroides = normalizar(sumas)
+        return self.centroides
+
+    def buscar(self, consultas, k=1):
+        consultas = self._consultas(consultas)
+        if len(self) == 0 or len(consultas) == 0:
+            return self._vacio(len(consultas), k)
+        return self._buscar_en_grupos(consultas, self.centroides, self.sondeos, self.limites, k)
+
+BACKENDS = {IndiceExacto.nombre: IndiceExacto, IndiceIVF.nombre: IndiceIVF}
+
+def crear_indice(embeddings, ids, backend=GALERIA_BACKEND, **opciones):
+    """
+    Construye el índice de galería configurado. Las galerías pequeñas (por debajo de
+    GALERIA_IVF_MIN embeddings) usan siempre la búsqueda exacta, que en ese tamaño es
+    más rápida que recorrer las listas del IVF y no pierde recall.
+
+    :param embeddings: Matriz (n, 512) de embeddings.
+    :param ids: id_estudiante de cada fila.
+    :param backend: "exacto" o "ivf".
+    :return: Instancia de IndiceGaleria.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend de galería desconocido: {backend}. Opciones: {', '.join(BACKENDS)}")
+    if backend != IndiceExacto.nombre and len(ids) < GALERIA_IVF_MIN:
+        backend = IndiceExacto.nombre
+    return BACKENDS[backend](embeddings, ids, **opciones)
+
+def _galeria_sintetica(estudiantes, por_estudiante, consultas, ruido, rng):
+    """
+    Galería con varios embeddings ruidosos por identidad y consultas de identidades conocidas.
+    El ruido tiene norma esperada `ruido`, así que dos muestras de la misma identidad tienen una
+    similitud coseno de aproximadamente 1 / (1 + ruido²) (≈0,6 con ruido 0,8, como con rostros reales).
+
+    :return: Tupla (galeria, ids, consultas, verdad), con la identidad real de cada consulta en `verdad`.
+    """
+    identidades = normalizar(rng.standard_normal((estudiantes, DIMENSION_EMBEDDING)))
+    ids = np.repeat(np.arange(estudiantes), por_estudiante)
+    galeria = normalizar(identidades[ids] + ruido * rng.standard_normal((len(ids), DIMENSION_EMBEDDING)) / np.sqrt(DIMENSION_EMBEDDING))
+    verdad = rng.integers(0, estudiantes, consultas)
+    consultas = normalizar(identidades[verdad] + ruido * rng.standard_normal((consultas, DIMENSION_EMBEDDING)) / np.sqrt(DIMENSION_EMBEDDING))
+    return galeria, ids, consultas, verdad
+
+def _medir(indice, consultas, k, lote):
+    """Latencia media por lote de consultas (como en un frame con varios rostros)."""
+    resultados = []
+    inicio = time.perf_counter()
+    for i in range(0, len(consultas), lote):
+        resultados.append(indice.buscar(consultas[i:i + lote], k=k)[1])
+    transcurrido = time.perf_counter() - inicio
+    return np.concatenate(resultados), 1000 * transcurrido / max(1, -(-len(consultas) // lote))
+
+"""
+    Banco de pruebas de la galería:
+    Compara cada configuración con la búsqueda exacta en float32 sobre una galería sintética.
+    - recall@k: fracción de consultas cuyo mejor resultado exacto aparece entre los k devueltos.
+    - Acierto: fracción de consultas cuyo primer resultado es su identidad real.
+    - Latencia media por lote de consultas (un lote equivale a los rostros de un frame).
+    - Memoria ocupada por los embeddings de la galería.
+"""
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall, latencia y memoria de los índices de galería frente a la búsqueda exacta.")
+    parser.add_argument("--estudiantes", type=int, default=20000)
+    parser.add_argument("--por-estudiante", type=int, default=3)
+    parser.add_argument("--consultas", type=int, default=2000)
+    parser.add_argument("--lote", type=int, default=8, help="Rostros por frame")
+    parser.add_argument("--k", type=int, default=1)
+    parser.add_argument("--ruido", type=float, default=0.8, help="Norma del ruido; similitud entre muestras de la misma identidad ≈ 1/(1+ruido²)")
+    parser.add_argument("--precisiones", nargs="+", default=list(PRECISIONES), choices=PRECISIONES)
+    parser.add_argument("--centroides", type=int, nargs="+", default=[50, 200], help="Candidatos de la pasada por centroides")
+    parser.add_argument("--listas", type=int, default=GALERIA_IVF_LISTAS)
+    parser.add_argument("--sondeos", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    galeria, ids, consultas, verdad = _galeria_sintetica(args.estudiantes, args.por_estudiante, args.consultas, args.ruido, rng)
+    # Similitud media de cada consulta con las muestras de su identidad en la galería
+    similitud_misma = np.mean([galeria[ids == v] @ c for c, v in zip(consultas[:200], verdad[:200])])
+    print(f"Galería: {len(galeria)} embeddings de {args.estudiantes} estudiantes; {len(consultas)} consultas en lotes de {args.lote}")
+    print(f"Similitud media con la misma identidad: {similitud_misma:.3f}")
+
+    exacto = IndiceExacto(galeria, ids, centroides=0, precision="float32")
+    referencia, latencia_exacta = _medir(exacto, consultas, args.k, args.lote)
+
+    def informar(etiqueta, indice, resultado, latencia):
+        # Las filas pueden estar reordenadas: se compara por identidad del estudiante
+        ids_referencia = [exacto.ids[i] for i in referencia[:, 0]]
+        recall = np.mean([ids_referencia[i] in {indice.ids[j] for j in resultado[i] if j >= 0} for i in range(len(consultas))])
+        acierto = np.mean([resultado[i, 0] >= 0 and indice.ids[resultado[i, 0]] == verdad[i] for i in range(len(consultas))])
+        memoria = indice.almacen.nbytes / 2**20
+        print(f"{etiqueta:>22}: recall@{args.k} {recall:.4f}, acierto {acierto:.4f}, {latencia:.3f} ms/lote ({latencia_exacta / latencia:.1f}x), {memoria:.1f} MiB")
+
+    informar("exacto/float32", exacto, referencia, latencia_exacta)
+    for precision in args.precisiones:
+        for centroides in [0] + args.centroides:
+            if precision == "float32" and centroides == 0:
+                continue
+            indice = IndiceExacto(galeria, ids, centroides=centroides, precision=precision)
+            resultado, latencia = _medir(indice, consultas, args.k, args.lote)
+            informar(f"exacto/{precision}/c{indice.candidatos}", indice, resultado, latencia)
+
+    for precision in args.precisiones:
+        inicio = time.perf_counter()
+        ivf = IndiceIVF(galeria, ids, listas=args.listas, precision=precision)
+        print(f"IVF {precision} con {ivf.listas} listas construido en {time.perf_counter() - inicio:.2f}s")
+        for sondeos in args.sondeos:
+            ivf.sondeos = max(1, min(sondeos, ivf.listas))
+            resultado, latencia = _medir(ivf, consultas, args.k, args.lote)
+            informar(f"ivf/{precision}/{ivf.sondeos}", ivf, resultado, latencia)
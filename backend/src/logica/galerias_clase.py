@@ -0,0 +1,116 @@
+import glob
+import json
+import os
+import re
+import threading
+import numpy as np
+from src.config.settings import GALERIAS_DIR
+from src.logica.codec_embeddings import decodificar_embeddings
+from src.logica.database import clases_collection, get_estudiantes_by_clase, get_estudiantes_by_ids
+from src.logica.galeria import apilar_embeddings, normalizar
+from src.logica.logger import logger
+
+def incrementar_version_galeria(ids_clases):
+    """
+    Marca como obsoletas las galerías compiladas de las clases indicadas.
+    Debe llamarse después de escribir el cambio de embeddings o de pertenencia a la clase.
+    """
+    ids_clases = [id_clase for id_clase in set(ids_clases or []) if id_clase]
+    if ids_clases:
+        clases_collection.update_many({"id_clase": {"$in": ids_clases}}, {"$inc": {"version_galeria": 1}})
+
+def incrementar_version_galeria_estudiantes(ids_estudiantes):
+    """Incrementa la versión de galería de todas las clases de los estudiantes indicados."""
+    ids_clases = set()
+    for estudiante in get_estudiantes_by_ids(ids_estudiantes, "clases"):
+        ids_clases.update(estudiante.get("ids_clases", []))
+    incrementar_version_galeria(ids_clases)
+
+class CacheGalerias:
+    def __init__(self, directorio=GALERIAS_DIR):
+        """
+        Caché de galerías compiladas por clase: matriz de embeddings normalizados y el
+        id_estudiante de cada fila. Cada entrada está ligada a `clases.version_galeria`,
+        que se incrementa al cambiar los embeddings o los estudiantes de la clase.
+
+        :param directorio: Si se indica, las galerías se guardan también como .npy y se
+                           cargan con memory-map, de forma que sobreviven a un reinicio.
+        """
+        self.directorio = directorio
+        self._galerias = {}   # id_clase -> (version, embeddings, ids)
+        self._lock = threading.Lock()
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+
+    @staticmethod
+    def _version(id_clase):
+        clase = clases_collection.find_one({"id_clase": id_clase}, {"_id": 0, "version_galeria": 1})
+        return (clase or {}).get("version_galeria", 0)
+
+    def _rutas(self, id_clase, version):
+        base = os.path.join(self.directorio, re.sub(r"[^A-Za-z0-9_-]", "_", id_clase))
+        return f"{base}_v{version}.npy", f"{base}_v{version}_ids.json", base
+
+    def _leer_disco(self, id_clase, version):
+        if not self.directorio:
+            return None
+        ruta_embeddings, ruta_ids, _ = self._rutas(id_clase, version)
+        try:
+            with open(ruta_ids, encoding="utf-8") as f:
+                ids = json.load(f)
+            # Vista ndarray sobre el memory-map: se lee de disco bajo demanda y se serializa como array normal
+            embeddings = np.asarray(np.load(ruta_embeddings, mmap_mode="r"))
+        except (OSError, ValueError):
+            return None
+        if len(embeddings) != len(ids):
+            return None
+        return embeddings, ids
+
+    def _escribir_disco(self, id_clase, version, embeddings, ids):
+        ruta_embeddings, ruta_ids, base = self._rutas(id_clase, version)
+        try:
+            # Escritura atómica: primero a un temporal y después os.replace
+            with open(ruta_embeddings + ".tmp", "wb") as f:
+                np.save(f, embeddings)
+            with open(ruta_ids + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(ids, f)
+            os.replace(ruta_embeddings + ".tmp", ruta_embeddings)
+            os.replace(ruta_ids + ".tmp", ruta_ids)
+            # Borrar las versiones anteriores de la misma clase
+            for ruta in glob.glob(f"{glob.escape(base)}_v*"):
+                if ruta not in (ruta_embeddings, ruta_ids):
+                    os.remove(ruta)
+        except OSError as e:
+            logger.warning(f"[GALERIAS] No se pudo guardar la galería de {id_clase} en disco: {e}")
+
+    @staticmethod
+    def _compilar(id_clase):
+        estudiantes = get_estudiantes_by_clase(id_clase, "embeddings")
+        embeddings_dict = {est["id_estudiante"]: decodificar_embeddings(est.get("embeddings")) for est in estudiantes}
+        embeddings, ids = apilar_embeddings(embeddings_dict)
+        return normalizar(embeddings), ids
+
+    def obtener(self, id_clase):
+        """
+        Devuelve la galería de la clase como (embeddings, ids): matriz (n, 512) float32 de
+        filas unitarias y lista de id_estudiante. Solo se recompila si cambió su versión.
+        """
+        version = self._version(id_clase)
+        with self._lock:
+            entrada = self._galerias.get(id_clase)
+        if entrada is not None and entrada[0] == version:
+            return entrada[1], entrada[2]
+
+        galeria = self._leer_disco(id_clase, version)
+        if galeria is not None:
+            logger.info(f"[GALERIAS] Galería de {id_clase} (v{version}) cargada desde disco")
+        else:
+            galeria = self._compilar(id_clase)
+            logger.info(f"[GALERIAS] Galería de {id_clase} (v{version}) compilada: {len(galeria[1])} embeddings")
+            if self.directorio:
+                self._escribir_disco(id_clase, version, *galeria)
+        with self._lock:
+            self._galerias[id_clase] = (version, *galeria)
+        return galeria
+
+cache_galerias = CacheGalerias()
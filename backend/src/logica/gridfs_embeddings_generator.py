@@ -3,6 +3,7 @@ import numpy as np
 import torch  
 from insightface.app import FaceAnalysis  
 from src.logica.logger import logger  
+from src.logica.codec_embeddings import codificar_embedding
 
 class GridFSEmbeddingsGenerator:
     def __init__(self, model_name="buffalo_sc"):
@@ -31,7 +32,7 @@ class GridFSEmbeddingsGenerator:
         Genera un embedding facial a partir de datos de imagen en formato binario.
         
         :param image_data: Datos de la imagen en formato de bytes.
-        :return: Lista con el embedding facial o None si no se puede generar.
+        :return: Embedding facial empaquetado en binario (ver codec_embeddings) o None si no se puede generar.
         """
         try:
             # Convierte los datos binarios en una matriz de numpy
@@ -51,7 +52,7 @@ class GridFSEmbeddingsGenerator:
 
             # Obtiene el embedding normalizado del primer rostro detectado
             embedding = faces[0].normed_embedding
-            return embedding.tolist()
+            return codificar_embedding(embedding)
         except Exception as e:
             # Registra un error si ocurre una excepción
             logger.error(f"Error al generar embedding: {e}")
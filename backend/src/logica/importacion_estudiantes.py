@@ -0,0 +1,216 @@
+import argparse
+import json
+import os
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from bson.objectid import ObjectId
+from pymongo import UpdateOne
+from src.config.settings import EMBEDDINGS_LOTE, EMBEDDINGS_DET_SIZE, EMBEDDINGS_POOL_TAMANO, IMPORTACION_HILOS
+from src.logica.codec_embeddings import codificar_embedding
+from src.logica.database import estudiantes_collection, fs, trabajos_embeddings_collection, get_estudiantes_by_ids
+from src.logica.pool_modelos import obtener_pool
+from src.logica.trabajos_embeddings import calcular_embeddings, decodificar_imagen, trabajador_embeddings, PENDIENTE, PROCESANDO, COMPLETADO, ERROR
+from src.logica.galerias_clase import incrementar_version_galeria_estudiantes
+from src.logica.miniaturas import guardar_miniatura
+from src.logica.logger import logger
+
+EXTENSIONES_IMAGEN = (".jpg", ".jpeg", ".png")
+
+def _listar_entradas(origen):
+    """
+    Devuelve las imágenes de un ZIP o de un directorio como lista de (nombre, leer),
+    donde leer() devuelve los bytes del fichero.
+
+    :param origen: Ruta a un directorio o a un ZIP, o un fichero ZIP ya abierto.
+    """
+    if isinstance(origen, str) and os.path.isdir(origen):
+        nombres = sorted(n for n in os.listdir(origen) if n.lower().endswith(EXTENSIONES_IMAGEN))
+        def lector(nombre):
+            def leer():
+                with open(os.path.join(origen, nombre), "rb") as f:
+                    return f.read()
+            return leer
+        return [(nombre, lector(nombre)) for nombre in nombres]
+
+    archivo = zipfile.ZipFile(origen)
+    return [
+        (info.filename, lambda info=info: archivo.read(info))
+        for info in archivo.infolist()
+        if not info.is_dir()
+        and not os.path.basename(info.filename).startswith(".")
+        and "__MACOSX" not in info.filename
+        and info.filename.lower().endswith(EXTENSIONES_IMAGEN)
+    ]
+
+def _candidatos_id(nombre):
+    """
+    Posibles id_estudiante de un fichero `<id_estudiante>_*.jpg`, del más largo al más corto.
+    Los ids pueden contener '_' (est_12), así que se prueban todos los prefijos.
+    """
+    partes = os.path.splitext(os.path.basename(nombre))[0].split("_")
+    return ["_".join(partes[:i]) for i in range(len(partes), 0, -1)]
+
+def _resolver_estudiantes(nombres):
+    """Asigna a cada fichero el id_estudiante existente con el prefijo más largo (una sola consulta)."""
+    candidatos = {nombre: _candidatos_id(nombre) for nombre in nombres}
+    todos = {c for lista in candidatos.values() for c in lista}
+    existentes = {e["id_estudiante"] for e in get_estudiantes_by_ids(todos, "id")}
+    return {
+        nombre: next((c for c in lista if c in existentes), None)
+        for nombre, lista in candidatos.items()
+    }
+
+def _separar_fallos(entradas, ids_por_fichero):
+    fallos = []
+    pendientes = []
+    for nombre, leer in entradas:
+        if ids_por_fichero[nombre] is None:
+            fallos.append({"archivo": nombre, "error": "Estudiante no encontrado"})
+        else:
+            pendientes.append((nombre, leer))
+    return pendientes, fallos
+
+def encolar_importacion(origen):
+    """
+    Importación en bloque en segundo plano (la que usa la API): guarda las imágenes en GridFS,
+    las añade a sus estudiantes y encola sus embeddings en `trabajador_embeddings` bajo un mismo
+    id_importacion. La detección y los embeddings no se calculan durante la petición.
+
+    :param origen: Ruta a un directorio o a un ZIP, o un fichero ZIP abierto (por ejemplo, una subida).
+    :return: Resumen con el id_importacion con el que consultar el progreso en estado_importacion.
+    """
+    entradas = _listar_entradas(origen)
+    ids_por_fichero = _resolver_estudiantes([nombre for nombre, _ in entradas])
+    pendientes, fallos = _separar_fallos(entradas, ids_por_fichero)
+
+    imagenes = []
+    operaciones = []
+    for nombre, leer in pendientes:
+        imagen_data = leer()
+        if not imagen_data:
+            fallos.append({"archivo": nombre, "error": "Archivo de imagen vacío"})
+            continue
+        id_estudiante = ids_por_fichero[nombre]
+        file_id = str(fs.put(imagen_data, filename=os.path.basename(nombre), metadata={"id_estudiante": id_estudiante}))
+        # El embedding lo añade el trabajador al terminar, como en la subida individual
+        operaciones.append(UpdateOne({"id_estudiante": id_estudiante}, {"$push": {"imagenes_ids": file_id}}))
+        imagenes.append((id_estudiante, file_id, nombre))
+    if operaciones:
+        estudiantes_collection.bulk_write(operaciones, ordered=False)
+
+    id_importacion = str(ObjectId())
+    trabajador_embeddings.encolar_importacion(id_importacion, imagenes, fallos)
+    logger.info(f"[IMPORTACION] Importación {id_importacion}: {len(imagenes)}/{len(entradas)} imágenes encoladas")
+    return {
+        "id_importacion": id_importacion,
+        "total": len(entradas),
+        "encoladas": len(imagenes),
+        "fallidas": len(fallos)
+    }
+
+def estado_importacion(id_importacion):
+    """
+    Progreso de una importación en segundo plano a partir de sus trabajos de embeddings.
+
+    :return: Totales por estado y fallos por archivo, o None si la importación no existe.
+    """
+    trabajos = list(trabajos_embeddings_collection.find(
+        {"id_importacion": id_importacion}, {"_id": 0, "archivo": 1, "estado": 1, "error": 1}
+    ))
+    if not trabajos:
+        return None
+    por_estado = {estado: 0 for estado in (PENDIENTE, PROCESANDO, COMPLETADO, ERROR)}
+    for trabajo in trabajos:
+        por_estado[trabajo["estado"]] += 1
+    return {
+        "id_importacion": id_importacion,
+        "total": len(trabajos),
+        "por_estado": por_estado,
+        "terminada": por_estado[PENDIENTE] + por_estado[PROCESANDO] == 0,
+        "fallos": [{"archivo": t.get("archivo"), "error": t.get("error")} for t in trabajos if t["estado"] == ERROR]
+    }
+
+def importar_fotos(origen, lote=EMBEDDINGS_LOTE, hilos=IMPORTACION_HILOS):
+    """
+    Importación síncrona, para la línea de comandos. Importa en bloque las fotos de los estudiantes desde un ZIP o un directorio con ficheros
+    `<id_estudiante>_*.jpg`. Las imágenes se decodifican en un pool de hilos, los rostros y
+    embeddings se calculan por lotes con un único modelo y cada lote se guarda con un
+    bulk_write. Solo se guardan las imágenes de las que se obtiene un embedding.
+
+    :param origen: Ruta a un directorio o a un ZIP, o un fichero ZIP abierto (por ejemplo, una subida).
+    :param lote: Imágenes por lote de inferencia y de escritura.
+    :param hilos: Hilos para leer y decodificar las imágenes.
+    :return: Informe con totales, fallos por imagen y rendimiento.
+    """
+    inicio = time.perf_counter()
+    entradas = _listar_entradas(origen)
+    ids_por_fichero = _resolver_estudiantes([nombre for nombre, _ in entradas])
+    pendientes, fallos = _separar_fallos(entradas, ids_por_fichero)
+
+    importadas = 0
+    estudiantes = set()
+    pool = obtener_pool(det_size=(EMBEDDINGS_DET_SIZE, EMBEDDINGS_DET_SIZE), tamano=EMBEDDINGS_POOL_TAMANO)
+    with ThreadPoolExecutor(max_workers=max(1, hilos)) as ejecutor:
+        for desde in range(0, len(pendientes), lote):
+            bloque = pendientes[desde:desde + lote]
+            datos = [leer() for _, leer in bloque]
+            imagenes = list(ejecutor.map(decodificar_imagen, datos))
+
+            validos = []
+            for (nombre, _), imagen_data, img in zip(bloque, datos, imagenes):
+                if img is None:
+                    fallos.append({"archivo": nombre, "error": "No se pudo decodificar la imagen"})
+                else:
+                    validos.append((nombre, imagen_data, img))
+            if not validos:
+                continue
+
+            with pool.prestar() as modelo:
+                embeddings = calcular_embeddings(modelo, [img for _, _, img in validos])
+
+            operaciones = []
+            for (nombre, imagen_data, img), embedding in zip(validos, embeddings):
+                if embedding is None:
+                    fallos.append({"archivo": nombre, "error": "No se detectó rostro en la imagen"})
+                    continue
+                id_estudiante = ids_por_fichero[nombre]
+                file_id = str(fs.put(imagen_data, filename=os.path.basename(nombre), metadata={"id_estudiante": id_estudiante}))
+                guardar_miniatura(file_id, id_estudiante, img)
+                operaciones.append(UpdateOne(
+                    {"id_estudiante": id_estudiante},
+                    {"$push": {"imagenes_ids": file_id, "embeddings": codificar_embedding(embedding), "embeddings_imagenes": file_id}}
+                ))
+                estudiantes.add(id_estudiante)
+            if operaciones:
+                estudiantes_collection.bulk_write(operaciones, ordered=False)
+                importadas += len(operaciones)
+            logger.info(f"[IMPORTACION] {desde + len(bloque)}/{len(pendientes)} imágenes procesadas, {importadas} importadas")
+
+    incrementar_version_galeria_estudiantes(estudiantes)
+    segundos = time.perf_counter() - inicio
+    informe = {
+        "total": len(entradas),
+        "importadas": importadas,
+        "fallidas": len(fallos),
+        "estudiantes": len(estudiantes),
+        "segundos": round(segundos, 2),
+        "imagenes_por_segundo": round(len(entradas) / segundos, 2) if segundos > 0 else None,
+        "fallos": fallos
+    }
+    logger.info(f"[IMPORTACION] {importadas}/{len(entradas)} imágenes de {len(estudiantes)} estudiantes en {segundos:.1f}s")
+    return informe
+
+"""
+    Importación en bloque de fotos de estudiantes:
+    Recibe un ZIP o un directorio con ficheros `<id_estudiante>_*.jpg` y guarda las imágenes
+    y sus embeddings. Imprime el informe en JSON.
+"""
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importa en bloque las fotos de los estudiantes desde un ZIP o un directorio.")
+    parser.add_argument("origen", help="Ruta al ZIP o al directorio de imágenes")
+    parser.add_argument("--lote", type=int, default=EMBEDDINGS_LOTE, help="Imágenes por lote de inferencia")
+    parser.add_argument("--hilos", type=int, default=IMPORTACION_HILOS, help="Hilos de decodificación")
+    args = parser.parse_args()
+
+    print(json.dumps(importar_fotos(args.origen, args.lote, args.hilos), indent=2, ensure_ascii=False))
@@ -0,0 +1,138 @@
+import threading
+import time
+from bisect import bisect_right
+from datetime import datetime
+import pytz
+from src.config.settings import INDICE_HORARIOS_TTL_S
+from src.logica.database import clases_collection
+from src.logica.logger import logger
+
+# Mapeo de días en inglés a español
+DIAS_EN_ESPANOL = {
+    "monday": "lunes",
+    "tuesday": "martes",
+    "wednesday": "miércoles",
+    "thursday": "jueves",
+    "friday": "viernes",
+    "saturday": "sábado",
+    "sunday": "domingo"
+}
+
+def momento_actual():
+    """Devuelve (día en español, segundos desde medianoche) en la zona horaria de Madrid."""
+    now_utc = datetime.utcnow().replace(tzinfo=pytz.UTC)
+    now = now_utc.astimezone(pytz.timezone("Europe/Madrid"))
+    dia_ingles = now.strftime("%A").lower()
+    return DIAS_EN_ESPANOL.get(dia_ingles, dia_ingles), now.hour * 3600 + now.minute * 60 + now.second
+
+def _minuto_del_dia(hora):
+    """Convierte "HH:MM" en minutos desde medianoche."""
+    horas, minutos = hora.split(":")
+    return int(horas) * 60 + int(minutos)
+
+class _Intervalos:
+    """
+    Intervalos [inicio, fin] de un día ordenados por inicio, en segundos desde medianoche.
+    `max_fines[i]` es el mayor fin de los intervalos 0..i, de modo que un intervalo que empezó
+    antes y sigue abierto (solapado con otros) también se encuentra.
+    """
+    def __init__(self):
+        self.inicios = []
+        self.max_fines = []
+        self.entradas = []
+
+    def ordenar(self):
+        self.entradas.sort(key=lambda e: e[0])
+        self.inicios = [e[0] for e in self.entradas]
+        self.max_fines = []
+        for _, fin, _ in self.entradas:
+            self.max_fines.append(max(fin, self.max_fines[-1]) if self.max_fines else fin)
+
+    def buscar(self, segundo):
+        """
+        Devuelve el valor del intervalo que contiene `segundo` (extremos incluidos) o None.
+        Si varios lo contienen, el que empezó más tarde.
+        """
+        i = bisect_right(self.inicios, segundo) - 1
+        while i >= 0 and self.max_fines[i] >= segundo:
+            inicio, fin, valor = self.entradas[i]
+            if segundo <= fin:
+                return valor
+            i -= 1
+        return None
+
+class IndiceHorarios:
+    def __init__(self, ttl_s=INDICE_HORARIOS_TTL_S):
+        """
+        Índice en memoria de los horarios semanales de todas las clases.
+        Responde qué clase está activa en un aula (o en qué aula está una clase) con una
+        búsqueda binaria, sin consultar MongoDB ni convertir horas en cada petición.
+        Se reconstruye al invalidarse o al caducar `ttl_s` segundos.
+
+        :param ttl_s: Segundos tras los que el índice se vuelve a leer de MongoDB.
+        """
+        self.ttl_s = ttl_s
+        self._por_aula = {}     # (id_aula, dia) -> _Intervalos con valor id_clase
+        self._por_clase = {}    # (id_clase, dia) -> _Intervalos con valor id_aula
+        self._clases = set()
+        self._construido = 0.0
+        self._valido = False
+        self._lock = threading.Lock()
+
+    def invalidar(self):
+        """
+        Fuerza la reconstrucción del índice en la siguiente consulta. Debe llamarse tras
+        cualquier escritura de clases u horarios desde la API; los cambios hechos fuera de
+        ella (altas o bajas directas en MongoDB) se recogen al caducar `ttl_s`.
+        """
+        with self._lock:
+            self._valido = False
+
+    def _construir(self):
+        por_aula = {}
+        por_clase = {}
+        clases = set()
+        total = 0
+        for clase in clases_collection.find({}, {"id_clase": 1, "horarios": 1}):
+            id_clase = clase["id_clase"]
+            clases.add(id_clase)
+            for horario in clase.get("horarios", []):
+                try:
+                    inicio = _minuto_del_dia(horario["hora_inicio"]) * 60
+                    fin = _minuto_del_dia(horario["hora_fin"]) * 60
+                except (KeyError, ValueError) as e:
+                    logger.error(f"Formato de hora inválido en horario de clase {id_clase}: {e}")
+                    continue
+                id_aula = horario.get("id_aula")
+                por_aula.setdefault((id_aula, horario["dia"]), _Intervalos()).entradas.append((inicio, fin, id_clase))
+                por_clase.setdefault((id_clase, horario["dia"]), _Intervalos()).entradas.append((inicio, fin, id_aula))
+                total += 1
+        for intervalos in list(por_aula.values()) + list(por_clase.values()):
+            intervalos.ordenar()
+        self._por_aula, self._por_clase, self._clases = por_aula, por_clase, clases
+        self._construido = time.monotonic()
+        self._valido = True
+        logger.debug(f"[HORARIOS] Índice construido: {len(clases)} clases, {total} horarios")
+
+    def _asegurar(self):
+        with self._lock:
+            if not self._valido or time.monotonic() - self._construido >= self.ttl_s:
+                self._construir()
+
+    def existe_clase(self, id_clase):
+        self._asegurar()
+        return id_clase in self._clases
+
+    def clase_activa_en_aula(self, id_aula, dia, segundo):
+        """Devuelve el id_clase activo en el aula en ese momento o None."""
+        self._asegurar()
+        intervalos = self._por_aula.get((id_aula, dia))
+        return intervalos.buscar(segundo) if intervalos else None
+
+    def aula_activa_de_clase(self, id_clase, dia, segundo):
+        """Devuelve el id_aula en el que la clase está activa en ese momento o None."""
+        self._asegurar()
+        intervalos = self._por_clase.get((id_clase, dia))
+        return intervalos.buscar(segundo) if intervalos else None
+
+indice_horarios = IndiceHorarios()
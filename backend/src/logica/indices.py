@@ -0,0 +1,135 @@
+import argparse
+import sys
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+from src.logica.database import db
+from src.logica.logger import logger
+
+# Registro declarativo de índices: colección -> [(nombre, claves, opciones)]
+# Los nombres son explícitos para que aplicar_indices sea idempotente entre arranques
+INDICES = {
+    "estudiantes": [
+        ("id_estudiante_unico", [("id_estudiante", ASCENDING)], {"unique": True}),
+        ("ids_clases", [("ids_clases", ASCENDING)], {}),
+    ],
+    "asistencias": [
+        ("clase_fecha_unico", [("id_clase", ASCENDING), ("fecha", DESCENDING)], {"unique": True}),
+    ],
+    "clases": [
+        ("id_clase_unico", [("id_clase", ASCENDING)], {"unique": True}),
+        ("horarios_aula", [("horarios.id_aula", ASCENDING)], {}),
+        ("id_usuario", [("id_usuario", ASCENDING)], {}),
+    ],
+    "usuarios": [
+        ("correo_unico", [("correo", ASCENDING)], {"unique": True}),
+        ("id_usuario_unico", [("id_usuario", ASCENDING)], {"unique": True}),
+        ("rol", [("rol", ASCENDING)], {}),
+    ],
+    "configuracion_raspberry": [
+        ("id_raspberry_pi_unico", [("id_raspberry_pi", ASCENDING)], {"unique": True}),
+    ],
+    "aulas": [
+        ("id_aula_unico", [("id_aula", ASCENDING)], {"unique": True}),
+    ],
+    "asignaturas": [
+        ("id_asignatura_unico", [("id_asignatura", ASCENDING)], {"unique": True}),
+    ],
+    "imagenes_estudiantes.files": [
+        ("miniatura_original", [("metadata.original", ASCENDING)], {}),
+    ],
+    "trabajos_embeddings": [
+        ("id_trabajo_unico", [("id_trabajo", ASCENDING)], {"unique": True}),
+        ("estado_creado", [("estado", ASCENDING), ("creado", ASCENDING)], {}),
+        ("id_importacion", [("id_importacion", ASCENDING)], {"sparse": True}),
+    ],
+}
+
+# Formas de las consultas más frecuentes de las rutas: (descripción, colección, filtro, orden)
+# Los valores son de ejemplo; explain() solo depende de la forma de la consulta
+CONSULTAS_FRECUENTES = [
+    ("estudiantes por clase", "estudiantes", {"ids_clases": "clase_1"}, None),
+    ("estudiante por id", "estudiantes", {"id_estudiante": "est_1"}, None),
+    ("nombres de estudiantes", "estudiantes", {"id_estudiante": {"$in": ["est_1", "est_2"]}}, None),
+    ("asistencia de una sesión", "asistencias", {"id_clase": "clase_1", "fecha": "2025-01-01"}, None),
+    ("listado de asistencias", "asistencias", {"id_clase": {"$in": ["clase_1", "clase_2"]}, "fecha": {"$gte": "2025-01-01", "$lte": "2025-01-31"}}, [("fecha", DESCENDING)]),
+    ("resumen de asistencias de un estudiante", "resumen_asistencias", {"_id": "clase_1_est_1"}, None),
+    ("clase por id", "clases", {"id_clase": "clase_1"}, None),
+    ("clases de un aula", "clases", {"horarios.id_aula": "aula_1", "id_clase": {"$ne": "clase_1"}}, None),
+    ("clases de un profesor", "clases", {"id_usuario": "usuario_1"}, None),
+    ("usuario por correo", "usuarios", {"correo": "profesor@ejemplo.com"}, None),
+    ("usuario por id", "usuarios", {"id_usuario": "usuario_1"}, None),
+    ("profesores", "usuarios", {"rol": "profesor"}, None),
+    ("raspberry por id", "configuracion_raspberry", {"id_raspberry_pi": "rpi_1"}, None),
+    ("aula por id", "aulas", {"id_aula": "aula_1"}, None),
+    ("asignatura por id", "asignaturas", {"id_asignatura": "asig_1"}, None),
+    ("miniatura de una imagen", "imagenes_estudiantes.files", {"metadata.original": "file_1"}, None),
+    ("trabajo de embeddings por id", "trabajos_embeddings", {"id_trabajo": "trabajo_1"}, None),
+    ("trabajos de una importación", "trabajos_embeddings", {"id_importacion": "importacion_1"}, None),
+    ("trabajos de embeddings pendientes", "trabajos_embeddings", {"estado": {"$in": ["pendiente", "procesando"]}}, [("creado", ASCENDING)]),
+]
+
+def aplicar_indices():
+    """
+    Crea los índices del registro que aún no existan. create_index no hace nada si el índice
+    ya existe con las mismas opciones; los conflictos (por ejemplo, duplicados que impiden
+    un índice único) se registran sin detener el arranque.
+
+    :return: Número de índices que no se pudieron aplicar.
+    """
+    fallidos = 0
+    for coleccion, indices in INDICES.items():
+        for nombre, claves, opciones in indices:
+            try:
+                db[coleccion].create_index(claves, name=nombre, **opciones)
+            except OperationFailure as e:
+                fallidos += 1
+                logger.error(f"[INDICES] No se pudo aplicar el índice {coleccion}.{nombre}: {e}")
+    if fallidos:
+        logger.warning(f"[INDICES] {fallidos} índices sin aplicar")
+    else:
+        logger.info(f"[INDICES] {sum(len(i) for i in INDICES.values())} índices verificados")
+    return fallidos
+
+def _etapas(plan):
+    """Recorre un plan de explain() y devuelve los nombres de todas sus etapas."""
+    if isinstance(plan, dict):
+        etapas = [plan["stage"]] if "stage" in plan else []
+        for valor in plan.values():
+            etapas.extend(_etapas(valor))
+        return etapas
+    if isinstance(plan, list):
+        return [etapa for elemento in plan for etapa in _etapas(elemento)]
+    return []
+
+def verificar_planes():
+    """
+    Ejecuta explain() sobre cada consulta frecuente e informa de las que recorren
+    la colección completa (COLLSCAN).
+
+    :return: Lista de descripciones de las consultas con COLLSCAN.
+    """
+    con_collscan = []
+    for descripcion, coleccion, filtro, orden in CONSULTAS_FRECUENTES:
+        cursor = db[coleccion].find(filtro)
+        if orden:
+            cursor = cursor.sort(orden)
+        plan = cursor.explain().get("queryPlanner", {}).get("winningPlan", {})
+        etapas = _etapas(plan)
+        if "COLLSCAN" in etapas:
+            con_collscan.append(descripcion)
+            logger.error(f"[INDICES] COLLSCAN en '{descripcion}' ({coleccion}): {' <- '.join(etapas)}")
+        else:
+            logger.info(f"[INDICES] OK '{descripcion}' ({coleccion}): {' <- '.join(etapas)}")
+    return con_collscan
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gestión de índices de MongoDB y verificación de planes de consulta.")
+    parser.add_argument("--aplicar", action="store_true", help="Crear los índices del registro antes de verificar")
+    args = parser.parse_args()
+
+    if args.aplicar and aplicar_indices():
+        sys.exit(1)
+    consultas = verificar_planes()
+    if consultas:
+        logger.error(f"[INDICES] {len(consultas)} consultas frecuentes sin índice: {', '.join(consultas)}")
+        sys.exit(1)
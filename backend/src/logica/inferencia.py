@@ -0,0 +1,39 @@
+import numpy as np
+from insightface.app.common import Face
+from insightface.utils import face_align
+
+# Número máximo de rostros por llamada al modelo de reconocimiento
+TAMANO_LOTE_RECONOCIMIENTO = 64
+
+def detectar_rostros(modelo, img):
+    """
+    Ejecuta solo el detector de un FaceAnalysis sobre una imagen.
+    Devuelve objetos Face con bbox, kps y det_score, sin embedding.
+    """
+    bboxes, kpss = modelo.det_model.detect(img, max_num=0, metric='default')
+    faces = []
+    for i in range(bboxes.shape[0]):
+        faces.append(Face(
+            bbox=bboxes[i, 0:4],
+            kps=kpss[i] if kpss is not None else None,
+            det_score=bboxes[i, 4]
+        ))
+    return faces
+
+def extraer_embeddings(modelo, pares):
+    """
+    Calcula en lote los embeddings ArcFace de una lista de pares (imagen, Face).
+    Los rostros pueden proceder de imágenes distintas; el embedding se asigna a cada Face.
+
+    :param modelo: Instancia de FaceAnalysis con modelo de reconocimiento.
+    :param pares: Lista de tuplas (imagen, Face) con los puntos clave ya detectados.
+    """
+    if not pares:
+        return
+    reconocimiento = modelo.models['recognition']
+    tamano_entrada = reconocimiento.input_size[0]
+    recortes = [face_align.norm_crop(img, landmark=face.kps, image_size=tamano_entrada) for img, face in pares]
+    for inicio in range(0, len(recortes), TAMANO_LOTE_RECONOCIMIENTO):
+        feats = reconocimiento.get_feat(recortes[inicio:inicio + TAMANO_LOTE_RECONOCIMIENTO])
+        for (_, face), feat in zip(pares[inicio:inicio + TAMANO_LOTE_RECONOCIMIENTO], feats):
+            face.embedding = np.asarray(feat, dtype=np.float32).flatten()
@@ -0,0 +1,92 @@
+import cv2
+from bson.objectid import ObjectId
+from src.config.settings import MINIATURA_LADO, MINIATURA_CALIDAD, IMAGENES_URL_VENTANA_S
+from src.logica.database import db, fs
+from src.logica.firmas import firmar
+from src.logica.trabajos_embeddings import decodificar_imagen
+from src.logica.logger import logger
+
+# Colección de metadatos de GridFS de las imágenes de estudiantes
+imagenes_files_collection = db["imagenes_estudiantes.files"]
+
+def url_imagen(file_id, miniatura=False):
+    """
+    Ruta firmada (relativa a la API) desde la que se sirve una imagen o su miniatura.
+    La firma da acceso solo a esta imagen y se puede usar directamente en <img src>.
+    """
+    expira, firma = firmar(f"imagen:{file_id}", IMAGENES_URL_VENTANA_S)
+    tamano = "tamano=miniatura&" if miniatura else ""
+    return f"/imagenes/{file_id}?{tamano}expira={expira}&firma={firma}"
+
+def generar_miniatura(img, lado=MINIATURA_LADO, calidad=MINIATURA_CALIDAD):
+    """
+    Reduce una imagen ya decodificada para que su lado mayor mida `lado` píxeles
+    y la codifica en JPEG.
+
+    :return: Bytes del JPEG, o None si no se pudo codificar.
+    """
+    alto, ancho = img.shape[:2]
+    escala = lado / max(alto, ancho)
+    if escala < 1:
+        img = cv2.resize(img, (max(1, round(ancho * escala)), max(1, round(alto * escala))), interpolation=cv2.INTER_AREA)
+    ok, jpeg = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, calidad])
+    return jpeg.tobytes() if ok else None
+
+def guardar_miniatura(file_id, id_estudiante, imagen):
+    """
+    Genera y guarda en GridFS la miniatura de una imagen, enlazada a la original
+    mediante metadata.original.
+
+    :param imagen: Bytes de la imagen original o la imagen ya decodificada.
+    :return: ObjectId de la miniatura, o None si la imagen no se pudo procesar.
+    """
+    img = decodificar_imagen(imagen) if isinstance(imagen, (bytes, bytearray)) else imagen
+    if img is None:
+        return None
+    miniatura = generar_miniatura(img)
+    if miniatura is None:
+        return None
+    return fs.put(
+        miniatura,
+        filename=f"miniatura_{file_id}.jpg",
+        contentType="image/jpeg",
+        metadata={"id_estudiante": id_estudiante, "original": str(file_id)}
+    )
+
+def obtener_miniatura(file_id):
+    """
+    Devuelve el GridOut de la miniatura de una imagen. Las imágenes subidas antes de
+    existir las miniaturas la generan la primera vez que se piden.
+    """
+    miniatura = fs.find_one({"metadata.original": file_id})
+    if miniatura is not None:
+        return miniatura
+    try:
+        original = fs.get(ObjectId(file_id))
+        id_miniatura = guardar_miniatura(file_id, (original.metadata or {}).get("id_estudiante"), original.read())
+    except Exception as e:
+        logger.error(f"Error al generar la miniatura de la imagen {file_id}: {e}")
+        return None
+    return fs.get(id_miniatura) if id_miniatura is not None else None
+
+def eliminar_miniaturas(file_id):
+    """Elimina de GridFS las miniaturas de una imagen."""
+    for miniatura in imagenes_files_collection.find({"metadata.original": file_id}, {"_id": 1}):
+        fs.delete(miniatura["_id"])
+
+def describir_imagenes(imagenes_ids):
+    """
+    Devuelve {file_id: {file_id, filename, url, url_miniatura}} para las imágenes indicadas
+    con una sola consulta a los metadatos de GridFS (sin leer el contenido de las imágenes).
+    """
+    object_ids = [ObjectId(file_id) for file_id in set(imagenes_ids) if ObjectId.is_valid(file_id)]
+    cursor = imagenes_files_collection.find({"_id": {"$in": object_ids}}, {"filename": 1})
+    return {
+        str(f["_id"]): {
+            "file_id": str(f["_id"]),
+            "filename": f.get("filename"),
+            "url": url_imagen(f["_id"]),
+            "url_miniatura": url_imagen(f["_id"], miniatura=True)
+        }
+        for f in cursor
+    }
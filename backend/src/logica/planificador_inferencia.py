@@ -0,0 +1,128 @@
+import queue
+import threading
+import time
+from src.config.settings import INFERENCIA_LOTE_MAX, INFERENCIA_LATENCIA_MAX_MS
+from src.logica.inferencia import detectar_rostros, extraer_embeddings
+from src.logica.logger import logger
+from src.logica.pool_modelos import obtener_pool
+
+class _Solicitud:
+    """Frame pendiente de análisis y el evento con el que se avisa al FaceTracker."""
+    def __init__(self, frame, faces=None, detectar=True, reconocer=True):
+        self.frame = frame
+        self.faces = faces
+        self.detectar = detectar
+        self.reconocer = reconocer
+        self.error = None
+        self.evento = threading.Event()
+
+class PlanificadorInferencia:
+    def __init__(self, pool, lote_max=INFERENCIA_LOTE_MAX, latencia_max_ms=INFERENCIA_LATENCIA_MAX_MS):
+        """
+        Planificador central de inferencia compartido por todas las aulas.
+        Agrupa los frames que llegan de los distintos FaceTracker en micro-lotes,
+        limitando la espera de cada frame a `latencia_max_ms`.
+
+        :param pool: Pool de modelos del que se toman las instancias de FaceAnalysis.
+        :param lote_max: Número máximo de frames por micro-lote.
+        :param latencia_max_ms: Tiempo máximo que un frame espera a completar un lote.
+        """
+        self.pool = pool
+        self.lote_max = max(1, int(lote_max))
+        self.latencia_max = max(0.0, latencia_max_ms / 1000.0)
+        self._cola = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self.lotes_procesados = 0
+        self.frames_procesados = 0
+        self.rostros_reconocidos = 0
+
+        # Un hilo por instancia del pool para que todas las instancias trabajen en paralelo
+        self._hilos = []
+        for i in range(self.pool.tamano):
+            hilo = threading.Thread(target=self._bucle, name=f"planificador-inferencia-{i}", daemon=True)
+            hilo.start()
+            self._hilos.append(hilo)
+        logger.info(f"[INFERENCIA] Planificador iniciado: {self.pool.tamano} hilos, lote máximo {self.lote_max}, latencia máxima {latencia_max_ms} ms")
+
+    def _esperar(self, solicitud):
+        """Encola una solicitud y bloquea hasta que su micro-lote haya sido procesado."""
+        self._cola.put(solicitud)
+        solicitud.evento.wait()
+        if solicitud.error is not None:
+            raise solicitud.error
+        return solicitud.faces
+
+    def analizar(self, frame):
+        """Detecta los rostros de un frame y calcula el embedding de todos ellos."""
+        return self._esperar(_Solicitud(frame))
+
+    def detectar(self, frame):
+        """Detecta los rostros de un frame sin calcular embeddings."""
+        return self._esperar(_Solicitud(frame, reconocer=False))
+
+    def reconocer(self, frame, faces):
+        """Calcula el embedding de los rostros indicados, ya detectados en `frame`."""
+        if not faces:
+            return faces
+        return self._esperar(_Solicitud(frame, faces=faces, detectar=False))
+
+    def _recoger_lote(self):
+        """Bloquea hasta el primer frame y completa el lote hasta agotar la latencia máxima."""
+        lote = [self._cola.get()]
+        limite = time.monotonic() + self.latencia_max
+        while len(lote) < self.lote_max:
+            restante = limite - time.monotonic()
+            try:
+                if restante <= 0:
+                    lote.append(self._cola.get_nowait())
+                else:
+                    lote.append(self._cola.get(timeout=restante))
+            except queue.Empty:
+                break
+        return lote
+
+    def _bucle(self):
+        while True:
+            lote = self._recoger_lote()
+            try:
+                with self.pool.prestar() as modelo:
+                    for solicitud in lote:
+                        if solicitud.detectar:
+                            solicitud.faces = detectar_rostros(modelo, solicitud.frame)
+                    # Reconocimiento de todos los rostros del lote en una sola pasada
+                    pares = [(s.frame, face) for s in lote if s.reconocer for face in s.faces]
+                    extraer_embeddings(modelo, pares)
+                with self._stats_lock:
+                    self.lotes_procesados += 1
+                    self.frames_procesados += len(lote)
+                    self.rostros_reconocidos += len(pares)
+            except Exception as e:
+                logger.error(f"[INFERENCIA] Error al procesar un lote de {len(lote)} frames: {e}")
+                for solicitud in lote:
+                    solicitud.error = e
+            finally:
+                for solicitud in lote:
+                    solicitud.evento.set()
+
+    def metricas(self):
+        """Devuelve contadores acumulados del planificador."""
+        with self._stats_lock:
+            media = self.frames_procesados / self.lotes_procesados if self.lotes_procesados else 0.0
+            return {
+                "lotes": self.lotes_procesados,
+                "frames": self.frames_procesados,
+                "rostros": self.rostros_reconocidos,
+                "frames_por_lote": round(media, 2),
+                "pendientes": self._cola.qsize()
+            }
+
+_planificador = None
+_planificador_lock = threading.Lock()
+
+def obtener_planificador():
+    """Devuelve el planificador de inferencia del proceso, creándolo la primera vez."""
+    global _planificador
+    with _planificador_lock:
+        if _planificador is None:
+            _planificador = PlanificadorInferencia(obtener_pool())
+        return _planificador
@@ -0,0 +1,109 @@
+import queue
+import threading
+from contextlib import contextmanager
+import numpy as np
+import torch
+from insightface.app import FaceAnalysis
+from src.config.settings import POOL_MODELOS_TAMANO
+from src.logica.logger import logger
+
+# Resolución de detección usada por defecto en el análisis de vídeo
+DET_SIZE_DEFAULT = (1024, 768)
+
+class PoolModelos:
+    def __init__(self, model_name="buffalo_sc", det_size=DET_SIZE_DEFAULT, tamano=POOL_MODELOS_TAMANO):
+        """
+        Pool de instancias de FaceAnalysis compartidas entre todos los FaceTracker.
+        Cada instancia se presta en exclusiva mientras dura una inferencia.
+
+        :param model_name: Nombre del modelo de InsightFace a utilizar.
+        :param det_size: Tamaño de detección con el que se preparan los modelos.
+        :param tamano: Número de instancias del modelo que se mantienen cargadas.
+        """
+        self.model_name = model_name
+        self.det_size = tuple(det_size)
+        self.tamano = max(1, int(tamano))
+        self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        self._disponibles = queue.Queue()
+        self._creados = 0
+        self._lock = threading.Lock()
+        self.calentado = False
+
+    def _crear_modelo(self):
+        """Carga y prepara una nueva instancia de FaceAnalysis."""
+        logger.info(f"[POOL] Cargando modelo {self.model_name} ({self._creados + 1}/{self.tamano}) en {self.device}...")
+        modelo = FaceAnalysis(
+            name=self.model_name,
+            providers=['CUDAExecutionProvider'] if self.device == 'cuda' else ['CPUExecutionProvider']
+        )
+        modelo.prepare(ctx_id=0, det_size=self.det_size)
+        return modelo
+
+    def _crear_si_hay_hueco(self):
+        """Crea una instancia nueva si el pool aún no ha alcanzado su tamaño."""
+        with self._lock:
+            if self._creados >= self.tamano:
+                return False
+            modelo = self._crear_modelo()
+            self._creados += 1
+        self._disponibles.put(modelo)
+        return True
+
+    def calentar(self):
+        """
+        Carga todas las instancias del pool y ejecuta una inferencia en vacío sobre cada una,
+        de forma que la primera transmisión no pague la inicialización de ONNX Runtime.
+        """
+        while self._crear_si_hay_hueco():
+            pass
+        frame_vacio = np.zeros((self.det_size[1], self.det_size[0], 3), dtype=np.uint8)
+        modelos = [self._disponibles.get() for _ in range(self.tamano)]
+        try:
+            for modelo in modelos:
+                modelo.get(frame_vacio)
+        finally:
+            for modelo in modelos:
+                self._disponibles.put(modelo)
+        self.calentado = True
+        logger.info(f"[POOL] {self.tamano} instancias de {self.model_name} listas en {self.device}")
+
+    @contextmanager
+    def prestar(self, timeout=None):
+        """
+        Presta una instancia del modelo durante el bloque `with` y la devuelve al pool al salir.
+        Las instancias se cargan bajo demanda hasta alcanzar el tamaño configurado.
+        """
+        try:
+            modelo = self._disponibles.get_nowait()
+        except queue.Empty:
+            if self._crear_si_hay_hueco():
+                modelo = self._disponibles.get()
+            else:
+                modelo = self._disponibles.get(timeout=timeout)
+        try:
+            yield modelo
+        finally:
+            self._disponibles.put(modelo)
+
+# Pools de modelos del proceso, uno por combinación de modelo y tamaño de detección
+_pools = {}
+_pools_lock = threading.Lock()
+
+def obtener_pool(model_name="buffalo_sc", det_size=DET_SIZE_DEFAULT, tamano=None):
+    """Devuelve el pool compartido del proceso para un modelo y tamaño de detección."""
+    clave = (model_name, tuple(det_size))
+    with _pools_lock:
+        if clave not in _pools:
+            _pools[clave] = PoolModelos(
+                model_name=model_name,
+                det_size=det_size,
+                tamano=tamano if tamano is not None else POOL_MODELOS_TAMANO
+            )
+        return _pools[clave]
+
+def calentar_pool_modelos():
+    """Carga y calienta el pool de análisis de vídeo al arrancar el servidor."""
+    try:
+        obtener_pool().calentar()
+    except Exception as e:
+        logger.error(f"[POOL] Error al calentar el pool de modelos: {e}")
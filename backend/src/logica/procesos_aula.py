@@ -0,0 +1,208 @@
+import atexit
+import multiprocessing as mp
+import threading
+import time
+from multiprocessing import shared_memory
+import numpy as np
+from src.logica.logger import logger
+
+# Número de huecos de frame en la memoria compartida de cada aula
+HUECOS_FRAME = 3
+# Las secuencias de cada hueco ocupan la cabecera del segmento compartido
+TAMANO_CABECERA = HUECOS_FRAME * np.dtype(np.int64).itemsize
+
+# Segundos que el puente espera el "fin" del hijo tras pedirle que se detenga antes de cerrarlo
+TIEMPO_MAXIMO_DETENCION = 5
+
+# Los procesos hijos se crean con "spawn" para no heredar hilos ni sesiones de ONNX del servidor
+_contexto = mp.get_context("spawn")
+
+def _vistas_memoria(buffer, width, height):
+    """Devuelve las vistas numpy (secuencias, frames) sobre el segmento de memoria compartida."""
+    secuencias = np.ndarray((HUECOS_FRAME,), dtype=np.int64, buffer=buffer)
+    frames = np.ndarray((HUECOS_FRAME, height, width, 3), dtype=np.uint8, buffer=buffer, offset=TAMANO_CABECERA)
+    return secuencias, frames
+
+def _vigilar_detencion(evento_detener, proceso_ffmpeg):
+    """
+    Termina FFmpeg en cuanto se pide detener el proceso del aula. Así la lectura bloqueada
+    en la tubería (por ejemplo, si la cámara deja de enviar) recibe EOF y el bucle termina.
+    """
+    evento_detener.wait()
+    if proceso_ffmpeg.poll() is None:
+        proceso_ffmpeg.terminate()
+
+def _proceso_aula(id_aula, galeria, width, height, detect_every_n, nombre_shm, conexion, evento_detener):
+    """
+    Punto de entrada del proceso hijo: FFmpeg → FaceTracker → memoria compartida.
+    Los frames procesados se escriben en la memoria compartida y las identificaciones
+    se envían al proceso principal por `conexion`.
+    """
+    from src.logica.deteccion import FaceTracker
+    from src.logica.fuentes_video import AnilloFrames, LectorUltimoFrame, iniciar_ffmpeg, leer_frames_ffmpeg
+    from src.logica.pool_modelos import obtener_pool
+
+    shm = shared_memory.SharedMemory(name=nombre_shm)
+    secuencias, frames = _vistas_memoria(shm.buf, width, height)
+    proceso_ffmpeg = None
+    try:
+        # Cada proceso de aula tiene su propio modelo; no se comparte con el servidor
+        tracker = FaceTracker(
+            galeria=galeria,
+            frame_rate=30,
+            detect_every_n=detect_every_n[0],
+            min_detect_every_n=detect_every_n[1],
+            max_detect_every_n=detect_every_n[2],
+            pool=obtener_pool(tamano=1)
+        )
+        proceso_ffmpeg = iniciar_ffmpeg(width, height)
+        threading.Thread(target=_vigilar_detencion, args=(evento_detener, proceso_ffmpeg), daemon=True).start()
+        anillo = AnilloFrames(width, height)
+        lector = LectorUltimoFrame(leer_frames_ffmpeg(proceso_ffmpeg, width, height, evento_detener, anillo=anillo), anillo=anillo)
+        numero = 0
+        for frame in lector:
+            if evento_detener.is_set():
+                break
+            t0 = time.perf_counter()
+            frame_procesado = tracker.process_frame(frame)
+            tracker.update_detect_interval(time.perf_counter() - t0)
+            if frame_procesado is None or not isinstance(frame_procesado, np.ndarray):
+                continue
+
+            # Escritura con secuencia tipo seqlock: -1 mientras el hueco se está escribiendo
+            numero += 1
+            hueco = numero % HUECOS_FRAME
+            secuencias[hueco] = -1
+            np.copyto(frames[hueco], frame_procesado)
+            secuencias[hueco] = numero
+
+            identificados = [(nombre, confianza) for nombre, confianza in tracker.identified_faces.values()]
+            conexion.send(("frame", hueco, numero, identificados, lector.descartados))
+    except Exception as e:
+        try:
+            conexion.send(("error", str(e)))
+        except OSError:
+            pass
+    finally:
+        if proceso_ffmpeg is not None:
+            proceso_ffmpeg.terminate()
+            proceso_ffmpeg.wait()
+        try:
+            conexion.send(("fin",))
+        except OSError:
+            pass
+        conexion.close()
+        del secuencias, frames
+        shm.close()
+
+class ProcesoAula:
+    def __init__(self, id_aula, galeria, width, height, detect_every_n=(3, 3, 3)):
+        """
+        Ejecuta la cadena de vídeo de un aula en un proceso independiente.
+        Los frames procesados se comparten por memoria compartida y las detecciones
+        y mensajes de control por un Pipe.
+
+        :param id_aula: Identificador del aula.
+        :param galeria: Galería compilada (embeddings, ids) de la clase activa.
+        :param width: Ancho de los frames recibidos.
+        :param height: Alto de los frames recibidos.
+        :param detect_every_n: Tupla (inicial, mínimo, máximo) del intervalo de detección.
+        """
+        self.id_aula = id_aula
+        self.width = width
+        self.height = height
+        tamano = TAMANO_CABECERA + HUECOS_FRAME * height * width * 3
+        self._shm = shared_memory.SharedMemory(create=True, size=tamano)
+        self._secuencias, self._frames = _vistas_memoria(self._shm.buf, width, height)
+        self._secuencias[:] = 0
+        self._conexion, conexion_hijo = _contexto.Pipe(duplex=False)
+        self._evento_detener = _contexto.Event()
+        self._cierre_lock = threading.Lock()
+        self._cerrado = False
+        self._proceso = _contexto.Process(
+            target=_proceso_aula,
+            args=(id_aula, galeria, width, height, detect_every_n, self._shm.name, conexion_hijo, self._evento_detener),
+            name=f"aula-{id_aula}",
+            daemon=True
+        )
+        self._proceso.start()
+        conexion_hijo.close()
+        logger.info(f"[PROCESOS] Proceso de aula {id_aula} iniciado, PID: {self._proceso.pid}")
+
+    def recibir(self, timeout=0.5):
+        """Devuelve el siguiente mensaje del proceso hijo o None si no llega ninguno a tiempo."""
+        try:
+            if self._conexion.poll(timeout):
+                return self._conexion.recv()
+        except EOFError:
+            return ("fin",)
+        return None
+
+    def copiar_frame(self, hueco, numero, destino):
+        """
+        Copia el frame `numero` del hueco indicado en `destino`.
+        Devuelve False si el hijo lo ha sobrescrito durante la copia.
+        """
+        if self._secuencias[hueco] != numero:
+            return False
+        np.copyto(destino, self._frames[hueco])
+        return self._secuencias[hueco] == numero
+
+    def detener(self):
+        """Pide al proceso hijo que termine."""
+        self._evento_detener.set()
+
+    def esta_vivo(self):
+        return self._proceso.is_alive()
+
+    def cerrar(self, timeout=5):
+        """Espera al proceso hijo (terminándolo si no responde) y libera la memoria compartida."""
+        with self._cierre_lock:
+            if self._cerrado:
+                return
+            self._cerrado = True
+        self._evento_detener.set()
+        self._proceso.join(timeout)
+        if self._proceso.is_alive():
+            logger.warning(f"[PROCESOS] El proceso del aula {self.id_aula} no terminó a tiempo; se fuerza su cierre")
+            self._proceso.terminate()
+            self._proceso.join()
+        self._conexion.close()
+        del self._secuencias, self._frames
+        self._shm.close()
+        self._shm.unlink()
+        logger.info(f"[PROCESOS] Proceso de aula {self.id_aula} finalizado")
+
+class SupervisorProcesos:
+    """Registro de los procesos de aula en ejecución, para poder detenerlos todos al salir."""
+    def __init__(self):
+        self._procesos = {}
+        self._lock = threading.Lock()
+
+    def iniciar(self, id_aula, galeria, width, height, detect_every_n=(3, 3, 3)):
+        """Lanza el proceso de un aula, deteniendo antes el anterior si seguía vivo."""
+        with self._lock:
+            anterior = self._procesos.pop(id_aula, None)
+        if anterior is not None:
+            anterior.cerrar()
+        proceso = ProcesoAula(id_aula, galeria, width, height, detect_every_n)
+        with self._lock:
+            self._procesos[id_aula] = proceso
+        return proceso
+
+    def finalizar(self, proceso):
+        """Cierra el proceso de un aula y lo elimina del registro si sigue siendo el vigente."""
+        with self._lock:
+            if self._procesos.get(proceso.id_aula) is proceso:
+                self._procesos.pop(proceso.id_aula)
+        proceso.cerrar()
+
+    def detener_todos(self):
+        with self._lock:
+            procesos = list(self._procesos.values())
+            self._procesos.clear()
+        for proceso in procesos:
+            proceso.cerrar()
+
+supervisor_procesos = SupervisorProcesos()
+atexit.register(supervisor_procesos.detener_todos)
@@ -1,15 +1,23 @@
 import cv2
-import subprocess
 import numpy as np
-import threading
 import time
 from datetime import datetime
 from src.logica import FaceTracker
 from src.logica.logger import logger
-from src.logica.utils import (
-    cargar_embeddings_por_clase,
-    registrar_asistencia_en_db
+from src.logica.planificador_inferencia import obtener_planificador
+from src.logica.fuentes_video import (
+    AnilloFrames,
+    LectorUltimoFrame,
+    MetricasIngesta,
+    iniciar_ffmpeg,
+    leer_frames_ffmpeg,
+    leer_frames_locales
 )
+from src.logica.procesos_aula import supervisor_procesos, TIEMPO_MAXIMO_DETENCION
+from src.logica.escritor_asistencias import escritor_asistencias
+from src.logica.eventos_asistencia import bus_eventos
+from src.config.settings import INFERENCIA_CENTRALIZADA, EJECUCION_EN_PROCESOS
+from src.logica.galerias_clase import cache_galerias
 
 # Constantes de configuración
 MODO_LOCAL = False  # Cambiar a True para pruebas locales
@@ -17,16 +25,10 @@ MODO_LOCAL_CAMARA = False   # Cambiar a True para usar la cámara local
 VIDEO_TEST_PATH = r"PATH/AL/VIDEO_TEST.mp4"  # Cambiar a la ruta del video de prueba
 INTERVALO_REGISTRO_ASISTENCIA = 10  # Intervalo para registrar asistencias (segundos)
 TIEMPO_MAXIMO_DETECCION_DEFAULT = 10 * 60  # 10 minutos
-
-def _log_ffmpeg_stderr(process):
-    """Registra los mensajes de error de FFmpeg en un hilo separado."""
-    while True:
-        stderr_line = process.stderr.readline().decode().strip()
-        if not stderr_line and process.poll() is not None:
-            break
-        # Logging desactivado por rendimiento; descomentar si es necesario para depuración
-        #if stderr_line:
-        #   logger.debug(f"[FFMPEG] {stderr_line}")
+INTERVALO_INFORME_INGESTA = 60  # Intervalo para informar de las métricas de ingesta (segundos)
+DETECT_EVERY_N_INICIAL = 3  # Frames entre detecciones al iniciar la transmisión
+DETECT_EVERY_N_MIN = 2      # Límites del intervalo de detección adaptativo
+DETECT_EVERY_N_MAX = 12
 
 def detener_transmision(transmision_or_id_aula):
     """Detiene la transmisión para un aula específica o un objeto de transmisión."""
@@ -46,27 +48,140 @@ def detener_transmision(transmision_or_id_aula):
 
     logger.info(f"Deteniendo transmisión para aula asociada a clase {transmision['id_clase']}")
     transmision["detener_evento"].set()
-    # Registrar las detecciones pendientes antes de detener
-    with transmision["detecciones_lock"]:
-        for id_estudiante, confianza in transmision["detecciones_temporales"].items():
-            registrar_asistencia_en_db(
-                transmision["id_clase"],
-                id_estudiante,
-                confianza,
-                transmision["tiempo_inicio"],
-                transmision["tiempo_maximo_deteccion"]
-            )
-        transmision["detecciones_temporales"].clear()
+    # Encolar las detecciones pendientes y pedir al escritor que las vuelque ya
+    _encolar_detecciones(transmision, transmision["id_clase"])
+    escritor_asistencias.vaciar()
     if transmision.get("proceso_ffmpeg"):
         transmision["proceso_ffmpeg"].terminate()
         transmision["proceso_ffmpeg"].wait()  
+    transmision["difusor"].cerrar()
+    bus_eventos.publicar(transmision["id_clase"], "transmision", {"transmitir": False})
     logger.info(f"Transmisión detenida para aula asociada a clase {transmision['id_clase']}")
     cv2.destroyAllWindows()
 
+def _finalizar_transmision(id_aula, transmisiones_activas, transmision):
+    """
+    Cierra una transmisión cuyo bucle terminó (FFmpeg o el proceso del aula acabaron, o se
+    detuvo desde fuera): vuelca las detecciones, avisa al panel y la quita de las activas.
+    """
+    detener_transmision(transmision)
+    entrada = transmisiones_activas.get(id_aula)
+    if entrada is not None and entrada["transmision"] is transmision:
+        transmisiones_activas.pop(id_aula, None)
+
 def hay_transmision_activa(transmision):
     """Verifica si una transmisión está activa."""
     return not transmision["detener_evento"].is_set()
 
+def _publicar_frame(transmision, frame, anillo=None):
+    """
+    Publica el frame procesado en el difusor MJPEG del aula sin copiarlo.
+    Si el frame es un hueco del anillo, queda retenido hasta que el difusor lo libere.
+    """
+    liberar = None
+    if anillo is not None:
+        anillo.retener(frame)
+        liberar = lambda: anillo.liberar(frame)
+    transmision["difusor"].publicar(frame, liberar)
+
+def _informar_metricas_ingesta(transmision, id_aula, tracker=None):
+    """Registra periódicamente en el log las copias por frame, los descartes y el intervalo de detección."""
+    metricas = transmision["metricas_ingesta"]
+    if metricas.toca_informar(INTERVALO_INFORME_INGESTA):
+        resumen = metricas.resumen()
+        mensaje = f"[INGESTA] Aula {id_aula}: {resumen['frames']} frames, {resumen['copias_por_frame']} copias/frame, {resumen['descartados']} descartados"
+        if tracker is not None and tracker.latency_ema is not None:
+            mensaje += f", detect_every_n={tracker.detect_interval}, latencia media {tracker.latency_ema * 1000:.1f} ms"
+        logger.info(mensaje)
+        escritor = escritor_asistencias.metricas()
+        logger.info(f"[ESCRITOR] Cola: {escritor['profundidad']} pendientes (máx. {escritor['max_profundidad']}), {escritor['rechazados']} rechazados, {escritor['escrituras']} escrituras en {escritor['volcados']} volcados, último volcado {escritor['ultima_duracion_ms']} ms")
+
+def _acumular_detecciones(transmision, identificados):
+    """Guarda en memoria la mejor confianza de cada estudiante identificado."""
+    with transmision["detecciones_lock"]:
+        for nombre, confianza in identificados:
+            if nombre != "Desconocido":
+                if nombre in transmision["detecciones_temporales"]:
+                    if confianza > transmision["detecciones_temporales"][nombre]:
+                        transmision["detecciones_temporales"][nombre] = confianza
+                else:
+                    transmision["detecciones_temporales"][nombre] = confianza
+
+def _encolar_detecciones(transmision, id_clase):
+    """
+    Pasa las detecciones acumuladas al escritor de asistencias.
+    El lock solo protege el intercambio del diccionario; encolar no toca MongoDB ni bloquea.
+    """
+    with transmision["detecciones_lock"]:
+        detecciones = transmision["detecciones_temporales"]
+        transmision["detecciones_temporales"] = {}
+    for id_estudiante, confianza in detecciones.items():
+        escritor_asistencias.encolar(
+            id_clase,
+            id_estudiante,
+            confianza,
+            transmision["tiempo_inicio"],
+            transmision["tiempo_maximo_deteccion"]
+        )
+
+def _registrar_detecciones_periodicamente(transmision, id_clase):
+    """Encola las detecciones acumuladas cada INTERVALO_REGISTRO_ASISTENCIA segundos."""
+    ahora = time.time()
+    if ahora - transmision["ultimo_registro"] >= INTERVALO_REGISTRO_ASISTENCIA:
+        _encolar_detecciones(transmision, id_clase)
+        transmision["ultimo_registro"] = ahora
+
+def _ejecutar_en_proceso(id_aula, id_clase, transmision, galeria, width, height):
+    """
+    Ejecuta la cadena de vídeo del aula en un proceso hijo y actúa como puente:
+    copia los frames de la memoria compartida y registra las detecciones recibidas.
+    """
+    proceso = supervisor_procesos.iniciar(
+        id_aula, galeria, width, height,
+        detect_every_n=(DETECT_EVERY_N_INICIAL, DETECT_EVERY_N_MIN, DETECT_EVERY_N_MAX)
+    )
+    # Anillo local donde se copian los frames de la memoria compartida antes de publicarlos
+    anillo = AnilloFrames(width, height)
+    detencion_pedida = None
+    try:
+        while True:
+            if transmision["detener_evento"].is_set():
+                if detencion_pedida is None:
+                    detencion_pedida = time.monotonic()
+                    proceso.detener()
+                elif time.monotonic() - detencion_pedida > TIEMPO_MAXIMO_DETENCION:
+                    # El hijo no respondió: finalizar() lo espera y, si sigue vivo, lo termina
+                    logger.warning(f"[PROCESOS] El proceso del aula {id_aula} no confirmó la detención a tiempo")
+                    break
+            mensaje = proceso.recibir(timeout=0.5)
+            if mensaje is None:
+                if not proceso.esta_vivo():
+                    break
+                continue
+
+            tipo = mensaje[0]
+            if tipo == "frame":
+                _, hueco, numero, identificados, descartados = mensaje
+                transmision["metricas_ingesta"].descartados = descartados
+                destino = anillo.reservar()
+                if destino is not None:
+                    if proceso.copiar_frame(hueco, numero, destino):
+                        _publicar_frame(transmision, destino, anillo)
+                    anillo.liberar(destino)
+                # Copias: anillo → memoria compartida en el hijo y memoria compartida → buffer local aquí
+                transmision["metricas_ingesta"].registrar_frame(copias=2)
+                _acumular_detecciones(transmision, identificados)
+                _registrar_detecciones_periodicamente(transmision, id_clase)
+                _informar_metricas_ingesta(transmision, id_aula)
+            elif tipo == "error":
+                logger.error(f"[PROCESOS] Error en el proceso del aula {id_aula}: {mensaje[1]}")
+            elif tipo == "fin":
+                break
+    finally:
+        supervisor_procesos.finalizar(proceso)
+    logger.info("Bucle de recepción terminado")
+    return transmision
+
 def iniciar_transmision_para_aula(id_aula, id_clase, transmisiones_activas, transmision):
     """
     Inicia la transmisión para un aula específica, procesando video desde una fuente local o remota.
@@ -81,188 +196,78 @@ def iniciar_transmision_para_aula(id_aula, id_clase, transmisiones_activas, tran
 
     # --- Ajusta aquí el ancho y alto según la resolución que envíe la RPI ---
     width, height =  960, 540
-    embeddings_dict = cargar_embeddings_por_clase(id_clase)
-    tracker = FaceTracker(embeddings_dict=embeddings_dict,frame_rate=30,detect_every_n = 3)
+    # Galería compilada de la clase, reutilizada entre sesiones mientras no cambie su versión
+    galeria = cache_galerias.obtener(id_clase)
+    transmision["metricas_ingesta"] = MetricasIngesta()
+
+    # En modo procesos la lectura de FFmpeg y el FaceTracker corren fuera del proceso de Flask
+    if EJECUCION_EN_PROCESOS and not MODO_LOCAL:
+        _ejecutar_en_proceso(id_aula, id_clase, transmision, galeria, width, height)
+        _finalizar_transmision(id_aula, transmisiones_activas, transmision)
+        return transmision
+
+    planificador = obtener_planificador() if INFERENCIA_CENTRALIZADA else None
+    tracker = FaceTracker(
+        galeria=galeria,
+        frame_rate=30,
+        detect_every_n=DETECT_EVERY_N_INICIAL,
+        min_detect_every_n=DETECT_EVERY_N_MIN,
+        max_detect_every_n=DETECT_EVERY_N_MAX,
+        planificador=planificador
+    )
 
+    anillo = None
     if MODO_LOCAL:
         logger.info("Modo local activo")
         cap = cv2.VideoCapture(0) if MODO_LOCAL_CAMARA else cv2.VideoCapture(VIDEO_TEST_PATH)
         if not cap.isOpened():
             logger.error("No se pudo abrir la fuente de video local")
-            detener_transmision(transmision)
+            _finalizar_transmision(id_aula, transmisiones_activas, transmision)
             return transmision
-        
-        # Obtener FPS real del vídeo y calcular el intervalo entre cuadros
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        if fps <= 0:
-            fps = 30  # fallback si no lo detecta bien
-        frame_interval = 1.0 / fps
-
-        while not transmision["detener_evento"].is_set():
-            t0 = time.time()
-            ret, frame = cap.read()
-            if not ret:
-                logger.error("No se pudo leer un frame de la cámara")
-                break
-            
-            # Procesar el frame
-            procesado = tracker.process_frame(frame)
-
-            with transmision["lock"]:
-                transmision["frame"] = procesado.copy()
-
-            # Almacenar detecciones en la memória
-            with transmision["detecciones_lock"]:
-                for track_id, (nombre, confianza) in tracker.identified_faces.items():
-                    if nombre != "Desconocido":
-                        if nombre in transmision["detecciones_temporales"]:
-                            if confianza > transmision["detecciones_temporales"][nombre]:
-                                transmision["detecciones_temporales"][nombre] = confianza
-                        else:
-                            transmision["detecciones_temporales"][nombre] = confianza
-
-            # Registrar asistencias periódicamente
-            ahora = time.time()
-            if ahora - transmision["ultimo_registro"] >= INTERVALO_REGISTRO_ASISTENCIA:
-                with transmision["detecciones_lock"]:
-                    if transmision["detecciones_temporales"]:
-                        for id_estudiante, confianza in transmision["detecciones_temporales"].items():
-                            registrar_asistencia_en_db(
-                                id_clase,
-                                id_estudiante,
-                                confianza,
-                                transmision["tiempo_inicio"],
-                                transmision["tiempo_maximo_deteccion"]
-                            )
-                        transmision["detecciones_temporales"].clear()
-                transmision["ultimo_registro"] = ahora
-            
-             # Esperar el resto del intervalo si el procesamiento fue rápido
-            elapsed = time.time() - t0
-            to_sleep = frame_interval - elapsed
-            if to_sleep > 0:
-                time.sleep(to_sleep)
-
-        logger.info("Bucle de recepción terminado")
-        cap.release()
-        return transmision
-
+        frames = leer_frames_locales(cap, transmision["detener_evento"])
     else:
         # -----------------------------------------------
         # MODO REMOTO: lectura de stream por FFmpeg
         # -----------------------------------------------
-        logger.info("Iniciando recepción de video desde FFmpeg...")
-
-        cmd = [
-            "ffmpeg",
-            "-thread_queue_size", "1024",
-            "-protocol_whitelist", "file,udp,rtp",
-            "-fflags", "+nobuffer+genpts+discardcorrupt",
-            "-flags", "+low_delay",
-            "-max_delay", "100000",
-            "-analyzeduration", "100000",
-            "-probesize", "100000",
-            "-i", "stream.sdp",
-            "-s", f"{width}x{height}",      
-            "-pix_fmt", "bgr24",            
-            "-f", "rawvideo",
-            "-vcodec", "rawvideo",
-            "-"
-        ]
         try:
-            transmision["proceso_ffmpeg"] = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                bufsize=0  # Desactivar el buffering
-            )
-            logger.info(f"FFmpeg iniciado, PID: {transmision['proceso_ffmpeg'].pid}")
-            stderr_thread = threading.Thread(
-                target=_log_ffmpeg_stderr,
-                args=(transmision["proceso_ffmpeg"],),
-                daemon=True
-            )
-            # Hilo para stderr
-            stderr_thread.start()
-
-            # Bucle para leer datos de FFmpeg
-            frame_size = width * height * 3  # bytes por frame: W×H×3 canales
-            chunk_size = 64 * 1024   
-            frame_buffer = bytearray()       # Buffer para acumular datos
-
-            while not transmision["detener_evento"].is_set():
-                try:
-                    chunk = transmision["proceso_ffmpeg"].stdout.read(chunk_size)
-                    if not chunk:
-                        continue
-                    frame_buffer.extend(chunk)
-
-                    # Procesar frames completos
-                    while len(frame_buffer) >= frame_size:
-                        raw = frame_buffer[:frame_size]
-                        del frame_buffer[:frame_size]
-                        
-                        # Reconstrucción en array H×W×3 BGR
-                        frame = np.frombuffer(raw, dtype=np.uint8).reshape((height, width, 3))
-                        frame_procesado =tracker.process_frame(frame)
+            transmision["proceso_ffmpeg"] = iniciar_ffmpeg(width, height)
+        except Exception as e:
+            logger.error(f"No se pudo iniciar FFmpeg: {e}")
+            _finalizar_transmision(id_aula, transmisiones_activas, transmision)
+            return transmision
+        # FFmpeg escribe cada frame directamente en un anillo de buffers preasignados
+        anillo = AnilloFrames(width, height)
+        frames = leer_frames_ffmpeg(
+            transmision["proceso_ffmpeg"], width, height, transmision["detener_evento"],
+            anillo=anillo, metricas=transmision["metricas_ingesta"]
+        )
 
-                        if frame_procesado is None or not isinstance(frame_procesado, np.ndarray):
-                            continue
-                            
-                        with transmision["lock"]:
-                            transmision["frame"] = frame_procesado.copy()
-                        
-                        # Almacenar detecciones en la caché
-                        with transmision["detecciones_lock"]:
-                            for track_id, (nombre, confianza) in tracker.identified_faces.items():
-                                if nombre != "Desconocido":
-                                    if nombre in transmision["detecciones_temporales"]:
-                                        if confianza > transmision["detecciones_temporales"][nombre]:
-                                            transmision["detecciones_temporales"][nombre] = confianza
-                                    else:
-                                        transmision["detecciones_temporales"][nombre] = confianza
+    # Un hilo lector conserva solo el frame más reciente; el análisis nunca se queda atrás
+    frames = LectorUltimoFrame(frames, anillo=anillo, metricas=transmision["metricas_ingesta"])
 
-                        # Registrar asistencias periódicamente
-                        ahora = time.time()
-                        if ahora - transmision["ultimo_registro"] >= INTERVALO_REGISTRO_ASISTENCIA:
-                            with transmision["detecciones_lock"]:
-                                if transmision["detecciones_temporales"]:
-                                    for id_estudiante, confianza in transmision["detecciones_temporales"].items():
-                                        registrar_asistencia_en_db(
-                                            id_clase,
-                                            id_estudiante,
-                                            confianza,
-                                            transmision["tiempo_inicio"],
-                                            transmision["tiempo_maximo_deteccion"]
-                                        )
-                                    transmision["detecciones_temporales"].clear()
-                            transmision["ultimo_registro"] = ahora
+    for frame in frames:
+        # Procesar el frame (se dibuja sobre el mismo buffer)
+        t0 = time.perf_counter()
+        frame_procesado = tracker.process_frame(frame)
+        tracker.update_detect_interval(time.perf_counter() - t0)
+        if frame_procesado is None or not isinstance(frame_procesado, np.ndarray):
+            continue
 
-                except Exception:
-                    logger.debug(f"Error al leer datos de FFmpeg: {e}")
-                    continue
+        transmision["metricas_ingesta"].registrar_frame(copias=0 if frame_procesado is frame else 1)
+        _publicar_frame(transmision, frame_procesado, anillo)
 
-        except Exception as e:
-            logger.error(f"No se pudo iniciar FFmpeg: {e}")
-            return transmision
-        finally:
-            pass
+        # Almacenar detecciones en la memoria y registrarlas periódicamente
+        _acumular_detecciones(transmision, tracker.identified_faces.values())
+        _registrar_detecciones_periodicamente(transmision, id_clase)
+        _informar_metricas_ingesta(transmision, id_aula, tracker)
 
-        return transmision
+    logger.info("Bucle de recepción terminado")
+    if MODO_LOCAL:
+        cap.release()
+    _finalizar_transmision(id_aula, transmisiones_activas, transmision)
+    return transmision
 
 def generar_frames(transmision):
-    """Genera un stream de frames para el frontend."""
+    """Genera un stream de frames para el frontend a partir del difusor MJPEG del aula."""
     logger.info(f"Cliente conectado, generando frames para clase {transmision['id_clase']}...")
-    while True:
-        with transmision["lock"]:
-            if transmision["frame"] is None:
-                time.sleep(0.04)
-                continue
-            ret, buffer = cv2.imencode('.jpg', transmision["frame"])
-            if not ret:
-                time.sleep(0.04)
-                continue
-            frame_bytes = buffer.tobytes()
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-        time.sleep(0.04)
+    return transmision["difusor"].suscribir()
\ No newline at end of file
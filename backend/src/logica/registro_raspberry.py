@@ -0,0 +1,96 @@
+import atexit
+import threading
+import time
+from datetime import datetime
+from pymongo import UpdateOne
+from src.config.settings import RASPBERRY_CACHE_TTL_S, RASPBERRY_LATIDO_MIN_S, RASPBERRY_LATIDO_INTERVALO_S
+from src.logica.cache import CacheTTL
+from src.logica.database import get_raspberry_by_id, raspberry_collection
+from src.logica.logger import logger
+
+class RegistroRaspberry:
+    def __init__(self, ttl_s=RASPBERRY_CACHE_TTL_S, latido_min_s=RASPBERRY_LATIDO_MIN_S, intervalo_s=RASPBERRY_LATIDO_INTERVALO_S):
+        """
+        Registro en memoria de las Raspberry Pi: aula asignada y si están revocadas.
+        Evita consultar MongoDB en cada petición de un dispositivo y agrupa las
+        actualizaciones de `ultima_conexion` en escrituras periódicas.
+        Las Raspberry se dan de alta, se reasignan y se revocan directamente en MongoDB
+        (la API no tiene rutas para ello), así que esos cambios, incluido el alta de un
+        dispositivo nuevo que ya se consultó, se aplican al caducar `ttl_s`.
+
+        :param ttl_s: Segundos que se conserva en caché la configuración de una Raspberry.
+        :param latido_min_s: Intervalo mínimo entre dos actualizaciones de ultima_conexion de una misma Raspberry.
+        :param intervalo_s: Cada cuántos segundos se vuelcan los latidos pendientes.
+        """
+        self.latido_min_s = latido_min_s
+        self.intervalo_s = intervalo_s
+        self._cache = CacheTTL(ttl_s=ttl_s)
+        self._latidos = {}             # id_raspberry_pi -> ultima_conexion pendiente de escribir
+        self._ultimo_latido = {}       # id_raspberry_pi -> instante del último latido aceptado
+        self._lock = threading.Lock()
+        self._detener = threading.Event()
+        self._hilo = threading.Thread(target=self._bucle, name="latidos-raspberry", daemon=True)
+        self._hilo.start()
+
+    @staticmethod
+    def _cargar(id_raspberry_pi):
+        raspberry = get_raspberry_by_id(id_raspberry_pi)
+        if not raspberry:
+            # También se guarda que no existe, para no repetir la consulta en cada petición
+            return {"registrada": False, "id_aula": None, "revocada": False}
+        return {
+            "registrada": True,
+            "id_aula": raspberry.get("id_aula"),
+            "revocada": bool(raspberry.get("revocada", False))
+        }
+
+    def obtener(self, id_raspberry_pi):
+        """Devuelve {registrada, id_aula, revocada} de una Raspberry, desde la caché si está vigente."""
+        return self._cache.obtener(id_raspberry_pi, self._cargar)
+
+    def autorizada(self, id_raspberry_pi):
+        """Indica si la Raspberry está registrada y no revocada."""
+        entrada = self.obtener(id_raspberry_pi)
+        return entrada["registrada"] and not entrada["revocada"]
+
+    def latido(self, id_raspberry_pi):
+        """
+        Anota una conexión de la Raspberry. Como mucho una cada `latido_min_s` segundos
+        llega a MongoDB, y siempre dentro del siguiente volcado periódico.
+        """
+        ahora = time.monotonic()
+        with self._lock:
+            if ahora - self._ultimo_latido.get(id_raspberry_pi, float("-inf")) < self.latido_min_s:
+                return
+            self._ultimo_latido[id_raspberry_pi] = ahora
+            self._latidos[id_raspberry_pi] = datetime.utcnow().isoformat()
+
+    def volcar(self):
+        """Escribe los latidos pendientes con un único bulk_write."""
+        with self._lock:
+            latidos, self._latidos = self._latidos, {}
+        if not latidos:
+            return
+        operaciones = [
+            UpdateOne(
+                {"id_raspberry_pi": id_raspberry_pi},
+                {"$set": {"ultima_conexion": ultima_conexion}},
+                upsert=True
+            )
+            for id_raspberry_pi, ultima_conexion in latidos.items()
+        ]
+        try:
+            raspberry_collection.bulk_write(operaciones, ordered=False)
+        except Exception as e:
+            logger.error(f"[RASPBERRY] Error al guardar {len(operaciones)} latidos: {e}")
+
+    def _bucle(self):
+        while not self._detener.wait(self.intervalo_s):
+            self.volcar()
+
+    def detener(self):
+        self._detener.set()
+        self.volcar()
+
+registro_raspberry = RegistroRaspberry()
+atexit.register(registro_raspberry.detener)
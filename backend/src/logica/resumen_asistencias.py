@@ -0,0 +1,95 @@
+"""
+Resúmenes de asistencia por (clase, estudiante) mantenidos de forma incremental.
+Cada documento guarda el estado de cada sesión (historial) y la última detección,
+para responder sin recorrer los documentos de asistencia.
+"""
+import argparse
+import time
+from pymongo import UpdateOne
+from src.logica.database import asistencias_collection, resumen_asistencias_collection
+from src.logica.logger import logger
+
+def _id_resumen(id_clase, id_estudiante):
+    return f"{id_clase}_{id_estudiante}"
+
+def operacion_resumen(id_clase, id_estudiante, fecha, estado_anterior, estado_nuevo, fecha_deteccion=None):
+    """
+    Construye la actualización del resumen para un cambio de estado en una sesión.
+
+    :param id_clase: ID de la clase.
+    :param id_estudiante: ID del estudiante.
+    :param fecha: Fecha de la sesión (YYYY-MM-DD).
+    :param estado_anterior: Estado previo del registro, o None si el registro es nuevo.
+    :param estado_nuevo: Estado actual del registro.
+    :param fecha_deteccion: Fecha ISO de la detección, si la hay.
+    :return: UpdateOne para bulk_write, o None si no hay nada que cambiar.
+    """
+    actualizacion = {}
+    if estado_anterior != estado_nuevo:
+        actualizacion["$set"] = {f"historial.{fecha}": estado_nuevo}
+    if fecha_deteccion:
+        actualizacion["$max"] = {"ultima_deteccion": fecha_deteccion}
+    if not actualizacion:
+        return None
+    actualizacion["$setOnInsert"] = {"id_clase": id_clase, "id_estudiante": id_estudiante}
+    return UpdateOne({"_id": _id_resumen(id_clase, id_estudiante)}, actualizacion, upsert=True)
+
+def aplicar_operaciones(operaciones):
+    """Aplica en un único bulk_write las actualizaciones de resumen no nulas."""
+    operaciones = [op for op in operaciones if op is not None]
+    if not operaciones:
+        return
+    try:
+        resumen_asistencias_collection.bulk_write(operaciones, ordered=False)
+    except Exception as e:
+        logger.error(f"[RESUMEN] Error al actualizar {len(operaciones)} resúmenes de asistencia: {e}")
+
+def obtener_resumen(id_clase, id_estudiante):
+    """Devuelve el resumen de asistencia de un estudiante en una clase, o None si no tiene registros."""
+    return resumen_asistencias_collection.find_one({"_id": _id_resumen(id_clase, id_estudiante)})
+
+def reconstruir_resumenes(id_clase=None):
+    """
+    Recalcula desde cero los resúmenes a partir de los documentos de asistencia.
+    Sirve para poblar la colección la primera vez o para corregir desviaciones.
+
+    :param id_clase: Limita la reconstrucción a una clase; None reconstruye todas.
+    :return: Número de resúmenes escritos.
+    """
+    inicio = time.perf_counter()
+    query = {"id_clase": id_clase} if id_clase else {}
+    resumenes = {}
+    for doc in asistencias_collection.find(query, {"id_clase": 1, "fecha": 1, "registros": 1}):
+        for r in doc.get("registros", []):
+            clave = (doc["id_clase"], r["id_estudiante"])
+            resumen = resumenes.setdefault(clave, {"historial": {}, "ultima_deteccion": None})
+            resumen["historial"][doc["fecha"]] = r.get("estado")
+            deteccion = r.get("fecha_deteccion_tardia") or r.get("fecha_deteccion")
+            if deteccion and (resumen["ultima_deteccion"] is None or deteccion > resumen["ultima_deteccion"]):
+                resumen["ultima_deteccion"] = deteccion
+
+    resumen_asistencias_collection.delete_many(query)
+    operaciones = [
+        UpdateOne(
+            {"_id": _id_resumen(id_clase_doc, id_estudiante)},
+            {"$set": {"id_clase": id_clase_doc, "id_estudiante": id_estudiante, **resumen}},
+            upsert=True
+        )
+        for (id_clase_doc, id_estudiante), resumen in resumenes.items()
+    ]
+    for i in range(0, len(operaciones), 1000):
+        resumen_asistencias_collection.bulk_write(operaciones[i:i + 1000], ordered=False)
+    logger.info(f"[RESUMEN] {len(operaciones)} resúmenes reconstruidos en {time.perf_counter() - inicio:.2f} s")
+    return len(operaciones)
+
+def reconstruir_si_vacio():
+    """Puebla la colección de resúmenes si está vacía y ya existen asistencias."""
+    if resumen_asistencias_collection.estimated_document_count() == 0 and asistencias_collection.estimated_document_count() > 0:
+        logger.info("[RESUMEN] Colección de resúmenes vacía; reconstruyendo desde las asistencias")
+        reconstruir_resumenes()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconstruye los resúmenes de asistencia por estudiante.")
+    parser.add_argument("--clase", help="ID de la clase a reconstruir (por defecto, todas)")
+    args = parser.parse_args()
+    reconstruir_resumenes(args.clase)
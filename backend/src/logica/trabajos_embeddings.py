@@ -0,0 +1,250 @@
+import queue
+import threading
+from datetime import datetime
+import cv2
+import numpy as np
+from bson.objectid import ObjectId
+from pymongo import UpdateOne
+from src.config.settings import EMBEDDINGS_LOTE, EMBEDDINGS_DET_SIZE, EMBEDDINGS_POOL_TAMANO
+from src.logica.codec_embeddings import codificar_embedding
+from src.logica.database import estudiantes_collection, trabajos_embeddings_collection, fs
+from src.logica.inferencia import detectar_rostros, extraer_embeddings
+from src.logica.pool_modelos import obtener_pool
+from src.logica.galerias_clase import incrementar_version_galeria_estudiantes
+from src.logica.logger import logger
+
+PENDIENTE = "pendiente"
+PROCESANDO = "procesando"
+COMPLETADO = "completado"
+ERROR = "error"
+
+def decodificar_imagen(imagen_data):
+    """Decodifica los bytes de una imagen con OpenCV; devuelve None si no es una imagen válida."""
+    return cv2.imdecode(np.frombuffer(imagen_data, np.uint8), cv2.IMREAD_COLOR)
+
+def calcular_embeddings(modelo, imagenes):
+    """
+    Detecta el rostro principal de cada imagen y calcula todos los embeddings en un único lote.
+
+    :param modelo: Instancia de FaceAnalysis prestada por el pool.
+    :param imagenes: Lista de imágenes BGR ya decodificadas.
+    :return: Lista paralela a `imagenes` con el embedding normalizado de cada una, o None si no hay rostro.
+    """
+    pares = []
+    posiciones = []
+    for i, img in enumerate(imagenes):
+        faces = detectar_rostros(modelo, img)
+        if faces:
+            # Si aparece más de una persona se usa el rostro con mayor confianza de detección
+            pares.append((img, max(faces, key=lambda face: face.det_score)))
+            posiciones.append(i)
+    extraer_embeddings(modelo, pares)
+    embeddings = [None] * len(imagenes)
+    for i, (_, face) in zip(posiciones, pares):
+        embeddings[i] = face.normed_embedding
+    return embeddings
+
+def operacion_agregar_embedding(id_estudiante, file_id, embedding):
+    """
+    UpdateOne que añade el embedding de una imagen al estudiante. `embeddings_imagenes`
+    guarda el file_id de cada embedding añadido, para poder borrarlo junto con su imagen.
+    Si la imagen se eliminó mientras se procesaba, no se añade nada.
+    """
+    return UpdateOne(
+        {"id_estudiante": id_estudiante, "imagenes_ids": file_id},
+        {"$push": {"embeddings": codificar_embedding(embedding), "embeddings_imagenes": file_id}}
+    )
+
+class TrabajadorEmbeddings:
+    def __init__(self, lote=EMBEDDINGS_LOTE, det_size=EMBEDDINGS_DET_SIZE, tamano_pool=EMBEDDINGS_POOL_TAMANO):
+        """
+        Servicio de generación de embeddings en segundo plano para las fotos subidas.
+        Los trabajos se guardan en la colección `trabajos_embeddings` y un único hilo los
+        procesa por lotes con un modelo que permanece cargado.
+
+        :param lote: Número máximo de imágenes por lote de inferencia.
+        :param det_size: Tamaño de detección con el que se prepara el modelo.
+        :param tamano_pool: Instancias del modelo reservadas para este servicio.
+        """
+        self.lote = lote
+        self.det_size = (det_size, det_size)
+        self.tamano_pool = tamano_pool
+        self._cola = queue.Queue()
+        self._en_cola = set()
+        self._lock = threading.Lock()
+        self._hilo = None
+        self.procesados = 0
+        self.fallidos = 0
+
+    def _arrancar(self):
+        with self._lock:
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._bucle, name="trabajador-embeddings", daemon=True)
+                self._hilo.start()
+
+    def _poner_en_cola(self, id_trabajo):
+        with self._lock:
+            if id_trabajo in self._en_cola:
+                return
+            self._en_cola.add(id_trabajo)
+        self._cola.put(id_trabajo)
+
+    def iniciar(self):
+        """Arranca el hilo y vuelve a encolar los trabajos que quedaron sin terminar en un arranque anterior."""
+        self._arrancar()
+        pendientes = trabajos_embeddings_collection.find(
+            {"estado": {"$in": [PENDIENTE, PROCESANDO]}}, {"_id": 0, "id_trabajo": 1}
+        ).sort("creado", 1)
+        recuperados = 0
+        for trabajo in pendientes:
+            self._poner_en_cola(trabajo["id_trabajo"])
+            recuperados += 1
+        if recuperados:
+            logger.info(f"[EMBEDDINGS] {recuperados} trabajos pendientes recuperados")
+
+    @staticmethod
+    def _documento(id_estudiante, file_id, estado=PENDIENTE, error=None, **extra):
+        ahora = datetime.utcnow().isoformat()
+        return {
+            "id_trabajo": str(ObjectId()),
+            "id_estudiante": id_estudiante,
+            "file_id": file_id,
+            "estado": estado,
+            "error": error,
+            "creado": ahora,
+            "actualizado": ahora,
+            **extra
+        }
+
+    def encolar(self, id_estudiante, file_id):
+        """
+        Registra un trabajo para calcular el embedding de una imagen ya guardada en GridFS.
+
+        :return: id_trabajo con el que consultar su estado.
+        """
+        trabajo = self._documento(id_estudiante, file_id)
+        trabajos_embeddings_collection.insert_one(trabajo)
+        self._arrancar()
+        self._poner_en_cola(trabajo["id_trabajo"])
+        return trabajo["id_trabajo"]
+
+    def encolar_importacion(self, id_importacion, imagenes, fallos=()):
+        """
+        Registra con un único insert_many los trabajos de una importación en bloque.
+
+        :param id_importacion: Identificador común de los trabajos de la importación.
+        :param imagenes: Lista de (id_estudiante, file_id, archivo) ya guardados en GridFS.
+        :param fallos: Lista de {"archivo", "error"} descartados antes de encolar; se guardan
+                       como trabajos en error para consultarlos junto con el resto.
+        """
+        trabajos = [
+            self._documento(id_estudiante, file_id, id_importacion=id_importacion, archivo=archivo)
+            for id_estudiante, file_id, archivo in imagenes
+        ]
+        errores = [
+            self._documento(None, None, ERROR, fallo["error"], id_importacion=id_importacion, archivo=fallo["archivo"])
+            for fallo in fallos
+        ]
+        if trabajos or errores:
+            trabajos_embeddings_collection.insert_many(trabajos + errores)
+        self._arrancar()
+        for trabajo in trabajos:
+            self._poner_en_cola(trabajo["id_trabajo"])
+
+    def pendientes(self):
+        return self._cola.qsize()
+
+    def _bucle(self):
+        while True:
+            ids = [self._cola.get()]
+            # Agrupar los trabajos ya encolados hasta completar el lote
+            while len(ids) < self.lote:
+                try:
+                    ids.append(self._cola.get_nowait())
+                except queue.Empty:
+                    break
+            with self._lock:
+                self._en_cola.difference_update(ids)
+            try:
+                self._procesar_lote(ids)
+            except Exception as e:
+                logger.error(f"[EMBEDDINGS] Error al procesar un lote de {len(ids)} trabajos: {e}")
+                self._finalizar({id_trabajo: (ERROR, str(e)) for id_trabajo in ids})
+
+    def _procesar_lote(self, ids):
+        trabajos = list(trabajos_embeddings_collection.find(
+            {"id_trabajo": {"$in": ids}, "estado": {"$in": [PENDIENTE, PROCESANDO]}}
+        ))
+        if not trabajos:
+            return
+        trabajos_embeddings_collection.update_many(
+            {"id_trabajo": {"$in": [t["id_trabajo"] for t in trabajos]}},
+            {"$set": {"estado": PROCESANDO, "actualizado": datetime.utcnow().isoformat()}}
+        )
+
+        resultados = {}
+        validos = []
+        imagenes = []
+        for trabajo in trabajos:
+            try:
+                img = decodificar_imagen(fs.get(ObjectId(trabajo["file_id"])).read())
+            except Exception:
+                resultados[trabajo["id_trabajo"]] = (ERROR, "Imagen no encontrada")
+                continue
+            if img is None:
+                resultados[trabajo["id_trabajo"]] = (ERROR, "No se pudo decodificar la imagen")
+                continue
+            validos.append(trabajo)
+            imagenes.append(img)
+
+        if imagenes:
+            with obtener_pool(det_size=self.det_size, tamano=self.tamano_pool).prestar() as modelo:
+                embeddings = calcular_embeddings(modelo, imagenes)
+        else:
+            embeddings = []
+
+        operaciones = []
+        for trabajo, embedding in zip(validos, embeddings):
+            if embedding is None:
+                resultados[trabajo["id_trabajo"]] = (ERROR, "No se detectó rostro en la imagen")
+                continue
+            operaciones.append(operacion_agregar_embedding(trabajo["id_estudiante"], trabajo["file_id"], embedding))
+            resultados[trabajo["id_trabajo"]] = (COMPLETADO, None)
+        if operaciones:
+            estudiantes_collection.bulk_write(operaciones, ordered=False)
+            incrementar_version_galeria_estudiantes({t["id_estudiante"] for t, e in zip(validos, embeddings) if e is not None})
+        self._finalizar(resultados)
+        logger.info(f"[EMBEDDINGS] Lote de {len(trabajos)} imágenes: {len(operaciones)} embeddings generados, {self.pendientes()} en cola")
+
+    def _finalizar(self, resultados):
+        """Guarda el estado final de los trabajos del lote con un único bulk_write."""
+        if not resultados:
+            return
+        ahora = datetime.utcnow().isoformat()
+        for estado, error in resultados.values():
+            if estado == COMPLETADO:
+                self.procesados += 1
+            else:
+                self.fallidos += 1
+        try:
+            trabajos_embeddings_collection.bulk_write([
+                UpdateOne({"id_trabajo": id_trabajo}, {"$set": {"estado": estado, "error": error, "actualizado": ahora}})
+                for id_trabajo, (estado, error) in resultados.items()
+            ], ordered=False)
+        except Exception as e:
+            logger.error(f"[EMBEDDINGS] Error al actualizar el estado de {len(resultados)} trabajos: {e}")
+
+    def resumen(self):
+        """Número de trabajos por estado y métricas del trabajador."""
+        por_estado = {
+            r["_id"]: r["total"]
+            for r in trabajos_embeddings_collection.aggregate([{"$group": {"_id": "$estado", "total": {"$sum": 1}}}])
+        }
+        return {
+            "por_estado": {estado: por_estado.get(estado, 0) for estado in (PENDIENTE, PROCESANDO, COMPLETADO, ERROR)},
+            "en_cola": self.pendientes(),
+            "procesados": self.procesados,
+            "fallidos": self.fallidos
+        }
+
+trabajador_embeddings = TrabajadorEmbeddings()
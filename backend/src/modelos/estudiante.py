@@ -5,6 +5,5 @@ estudiante_model = ns.model("Estudiante", {
     "id_estudiante": fields.String(required=True),
     "nombre": fields.String(required=True),
     "apellido": fields.String(required=True),
-    "urls_fotos": fields.List(fields.String),
-    "embeddings": fields.List(fields.Raw)  
+    "urls_fotos": fields.List(fields.String)
 })
\ No newline at end of file
@@ -4,6 +4,7 @@ from src.servidor.api import ns
 from src.modelos.usuario import usuario_model
 from src.logica.database import usuarios_collection
 from src.logica.logger import logger
+from src.servidor.api.identidad import usuario_actual, invalidar_usuario
 import bcrypt
 
 # Modelo de solicitud para el inicio de sesión
@@ -80,8 +81,7 @@ class PerfilResource(Resource):
         Devuelve el perfil del usuario autenticado.
         Requiere un token JWT válido.
         """        
-        id_usuario = get_jwt_identity()
-        usuario = usuarios_collection.find_one({"id_usuario": id_usuario})
+        usuario = usuario_actual()
         if not usuario:
             return {"mensaje": "Usuario no encontrado"}, 404
 
@@ -132,6 +132,7 @@ class CambiarContrasena(Resource):
             {"id_usuario": id_usuario},
             {"$set": {"contraseña": nueva_contrasena_hash}}
         )
+        invalidar_usuario(id_usuario)
 
         logger.info(f"Contraseña actualizada para usuario: {id_usuario}")
         return {"mensaje": "Contraseña actualizada con éxito"}, 200
\ No newline at end of file
@@ -3,7 +3,7 @@ import jwt
 from flask import request
 from functools import wraps
 from src.config.settings import JWT_SECRET_KEY
-from src.logica.database import get_raspberry_by_id
+from src.logica.registro_raspberry import registro_raspberry
 from flask_restx import Resource
 from src.servidor.api import ns
 
@@ -18,7 +18,8 @@ def generate_raspberry_token(raspberry_id):
 def raspberry_token_required(f):
     """
     Decorador para proteger endpoints que requieren autenticación de Raspberry Pi.
-    Verifica el token JWT y que la Raspberry esté registrada en la base de datos.
+    Verifica el token JWT y que la Raspberry esté registrada y no revocada
+    (consultando el registro en memoria, no la base de datos en cada petición).
     """
     @wraps(f)
     def decorated(*args, **kwargs):
@@ -30,9 +31,12 @@ def raspberry_token_required(f):
         try:
             data = jwt.decode(token, JWT_SECRET_KEY, algorithms=["HS256"])
             raspberry_id = data["id"]
-            # Verificar que la Raspberry existe en la base de datos
-            if not get_raspberry_by_id(raspberry_id):
+            # Verificar que la Raspberry está registrada y no ha sido revocada
+            entrada = registro_raspberry.obtener(raspberry_id)
+            if not entrada["registrada"]:
                 return {"error": "Raspberry no registrada"}, 403
+            if entrada["revocada"]:
+                return {"error": "Raspberry revocada"}, 403
             request.raspberry_id = raspberry_id
         except:
             return {"error": "Token inválido"}, 403
@@ -50,8 +54,11 @@ class RaspberryAuth(Resource):
         id_rpi = data.get("id_raspberry_pi")
         if not id_rpi:
             return {"error": "Falta id_raspberry_pi"}, 400
-        # Verificar que la Raspberry existe
-        if not get_raspberry_by_id(id_rpi):
+        # Verificar que la Raspberry existe y no está revocada
+        entrada = registro_raspberry.obtener(id_rpi)
+        if not entrada["registrada"]:
             return {"error": "Raspberry no registrada"}, 404
+        if entrada["revocada"]:
+            return {"error": "Raspberry revocada"}, 403
         token = generate_raspberry_token(id_rpi)
         return {"token": token}, 200
\ No newline at end of file
@@ -0,0 +1,27 @@
+from flask_jwt_extended import get_jwt, get_jwt_identity
+from src.config.settings import CACHE_USUARIOS_MAX, CACHE_USUARIOS_TTL_S
+from src.logica.cache import CacheTTL
+from src.logica.database import get_user_by_id
+
+# Documentos de usuario recientes, para las rutas que necesitan algo más que el rol
+cache_usuarios = CacheTTL(tamano_max=CACHE_USUARIOS_MAX, ttl_s=CACHE_USUARIOS_TTL_S)
+
+def usuario_actual():
+    """Devuelve el documento del usuario autenticado, usando la caché de usuarios."""
+    return cache_usuarios.obtener(get_jwt_identity(), get_user_by_id)
+
+def rol_actual():
+    """
+    Devuelve el rol del usuario autenticado a partir de los claims firmados del JWT,
+    sin consultar la base de datos. Solo si el token no lleva el claim se recurre
+    al documento del usuario en caché.
+    """
+    rol = get_jwt().get("rol")
+    if rol is not None:
+        return rol
+    usuario = usuario_actual()
+    return usuario["rol"] if usuario else None
+
+def invalidar_usuario(id_usuario):
+    """Descarta el usuario de la caché tras modificar su documento."""
+    cache_usuarios.invalidar(id_usuario)
@@ -1,9 +1,10 @@
 # src/servidor/api/routes/asignaturas.py
 from flask import jsonify
 from flask_restx import Resource, reqparse
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from src.servidor.api import ns
-from src.logica.database import get_user_by_id, asignaturas_collection, clases_collection, usuarios_collection
+from src.logica.database import asignaturas_collection, clases_collection, usuarios_collection
+from src.servidor.api.identidad import rol_actual
 from src.logica.logger import logger
 from src.modelos.asignatura import asignatura_model 
 from src.modelos.usuario import usuario_model
@@ -19,10 +20,9 @@ class AsignaturasResource(Resource):
         Solo accesible para administradores autenticados.
         Devuelve una lista de objetos asignatura.
         """
-        identity = get_jwt_identity()
-        user = get_user_by_id(identity)
+        rol = rol_actual()
 
-        if not user or user["rol"] != "admin":            
+        if rol != "admin":            
             return {"error": "Acceso denegado"}, 403
 
         asignaturas = list(asignaturas_collection.find())
@@ -41,10 +41,9 @@ class ProfesoresPorAsignaturaResource(Resource):
         Solo accesible para administradores autenticados.
         Devuelve una lista de objetos usuario con rol 'profesor'.
         """
-        identity = get_jwt_identity()
-        user = get_user_by_id(identity)
+        rol = rol_actual()
 
-        if not user or user["rol"] != "admin":            
+        if rol != "admin":            
             return {"error": "Acceso denegado"}, 403
 
         # Verificar que la asignatura exista
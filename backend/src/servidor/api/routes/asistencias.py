@@ -2,12 +2,17 @@ from flask_restx import Resource, reqparse, fields
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from src.servidor.api import ns
 from src.modelos.asistencia import asistencia_model
-from src.logica.database import get_asistencia, update_asistencia, get_clase_by_id, get_aula_by_id, create_asistencia,asistencias_collection,estudiantes_collection,get_user_by_id,clases_collection,asignaturas_collection
+from src.logica.database import get_asistencia, update_asistencia, get_clase_by_id, get_aula_by_id, create_asistencia, asistencias_collection, clases_collection, asignaturas_collection
+from src.servidor.api.identidad import rol_actual
+from src.logica.database import get_nombres_estudiantes, get_nombres_asignaturas, get_nombres_aulas
 from datetime import datetime
-import pandas as pd
-import io
-from flask import make_response, send_file
+import tempfile
+from flask import make_response, send_file, Response, stream_with_context
 from src.logica.logger import logger
+from src.logica.estado_asistencias import estado_asistencias
+from src.logica.eventos_asistencia import bus_eventos
+from src.logica.exportar_asistencias import hay_registros, generar_filas, generar_csv, escribir_xlsx
+from src.logica.resumen_asistencias import operacion_resumen, aplicar_operaciones, obtener_resumen
 
 @ns.route("/asistencias/actual")
 class AsistenciaActualResource(Resource):
@@ -51,17 +56,23 @@ class ActualizarAsistenciaResource(Resource):
         if not asistencia:
             return {"mensaje": "Asistencia no encontrada"}, 404
 
-        registros = asistencia.get("registros", [])
-        for registro in registros:
-            if registro["id_estudiante"] == id_estudiante:
-                registro["estado"] = data["estado"]
-                registro["modificado_por_usuario"] = profesor_id
-                registro["modificado_fecha"] = datetime.utcnow().isoformat()
-                break
-        else:
+        registro = next((r for r in asistencia.get("registros", []) if r["id_estudiante"] == id_estudiante), None)
+        if registro is None:
             return {"mensaje": "Estudiante no encontrado en la asistencia"}, 404
 
-        update_asistencia(data["id_clase"], data["fecha"], registros)
+        # Actualizar solo el registro del estudiante para no pisar las detecciones en curso
+        campos = {
+            "estado": data["estado"],
+            "modificado_por_usuario": profesor_id,
+            "modificado_fecha": datetime.utcnow().isoformat()
+        }
+        asistencias_collection.update_one(
+            {"_id": asistencia["_id"], "registros.id_estudiante": id_estudiante},
+            {"$set": {f"registros.$.{campo}": valor for campo, valor in campos.items()}}
+        )
+        estado_asistencias.aplicar_correccion(data["id_clase"], data["fecha"], id_estudiante, campos)
+        aplicar_operaciones([operacion_resumen(data["id_clase"], id_estudiante, data["fecha"], registro["estado"], data["estado"])])
+        bus_eventos.publicar(data["id_clase"], "asistencia", {**registro, **campos})
         return {"mensaje": "Estado actualizado"}, 200
 
 @ns.route("/asistencias/listado")
@@ -79,9 +90,9 @@ class ListadoAsistenciasResource(Resource):
         Permite filtrar por clase y rango de fechas.
         """
         identity = get_jwt_identity()
-        user = get_user_by_id(identity)
+        rol = rol_actual()
 
-        if not user or user["rol"] != "profesor":
+        if rol != "profesor":
             return {"error": "Acceso denegado"}, 403
 
         parser = reqparse.RequestParser()
@@ -150,6 +161,44 @@ class ListadoAsistenciasResource(Resource):
         
         return resultado, 200
 
+def expandir_detalle(doc, nombre_clase, nombres_aulas, nombres_estudiantes):
+    """
+    Construye el detalle de un documento de asistencia a partir de nombres ya resueltos.
+    No consulta la base de datos: los nombres se obtienen antes en bloque.
+    """
+    registros_expandidos = []
+    for r in doc.get("registros", []):
+        fila = {
+            "Estudiante": nombres_estudiantes.get(r["id_estudiante"], "Estudiante no registrado"),
+            "Estado": r.get("estado"),
+            "Fecha detección": r.get("fecha_deteccion"),
+            "Modificado por": r.get("modificado_por_usuario"),
+            "Fecha modificación": r.get("modificado_fecha")
+        }
+        registros_expandidos.append(fila)
+
+    return {
+        "id_clase": doc["id_clase"],
+        "fecha": doc["fecha"],
+        "id_aula": doc["id_aula"],
+        "nombre_clase": nombre_clase,
+        "nombre_aula": nombres_aulas.get(doc["id_aula"], "Aula desconocida"),
+        "registros": registros_expandidos
+    }
+
+def detalles_asistencias(clase_doc, docs):
+    """
+    Expande varios documentos de asistencia de una misma clase resolviendo todos los nombres
+    con una consulta por colección ($in con proyección), en lugar de una por estudiante.
+    """
+    id_asignatura = clase_doc.get("id_asignatura")
+    nombre_clase = get_nombres_asignaturas([id_asignatura]).get(id_asignatura, "Asignatura desconocida")
+    nombres_aulas = get_nombres_aulas([doc["id_aula"] for doc in docs])
+    nombres_estudiantes = get_nombres_estudiantes(
+        [r["id_estudiante"] for doc in docs for r in doc.get("registros", [])]
+    )
+    return [expandir_detalle(doc, nombre_clase, nombres_aulas, nombres_estudiantes) for doc in docs]
+
 @ns.route("/asistencias/detalle")
 class DetalleAsistenciaResource(Resource):
     @jwt_required()
@@ -176,41 +225,37 @@ class DetalleAsistenciaResource(Resource):
         if not clase_doc:
             return {"mensaje": "Clase no encontrada"}, 404
 
-        # Obtener el nombre de la asignatura
-        id_asignatura = clase_doc.get("id_asignatura")
-        asignatura_doc = asignaturas_collection.find_one({"id_asignatura": id_asignatura})
-        nombre_clase = asignatura_doc["nombre"] if asignatura_doc else "Asignatura desconocida"
+        return detalles_asistencias(clase_doc, [doc])[0], 200
 
-        aula_doc = get_aula_by_id(doc["id_aula"])
-        nombre_aula = aula_doc["nombre"] if aula_doc else "Aula desconocida"
+@ns.route("/asistencias/detalle/rango")
+class DetalleAsistenciaRangoResource(Resource):
+    @jwt_required()
+    @ns.doc(params={
+        "id_clase": "ID de la clase (requerido)",
+        "fecha_inicio": "Fecha mínima (YYYY-MM-DD, requerido)",
+        "fecha_fin": "Fecha máxima (YYYY-MM-DD, requerido)"
+    })
+    def get(self):
+        """
+        Devuelve el detalle de todas las sesiones de una clase en un rango de fechas
+        en una sola llamada, ordenadas de la más reciente a la más antigua.
+        """
+        parser = reqparse.RequestParser()
+        parser.add_argument("id_clase", type=str, required=True)
+        parser.add_argument("fecha_inicio", type=str, required=True)
+        parser.add_argument("fecha_fin", type=str, required=True)
+        args = parser.parse_args()
 
-        registros_expandidos = []
-        for r in doc.get("registros", []):
-            estudiante_doc = estudiantes_collection.find_one({"id_estudiante": r["id_estudiante"]})
-            if estudiante_doc:
-                nombre_estudiante = f"{estudiante_doc['nombre']} {estudiante_doc['apellido']}"
-            else:
-                nombre_estudiante = "Estudiante no registrado"
-
-            fila = {
-                "Estudiante": nombre_estudiante,
-                "Estado": r.get("estado"),
-                "Fecha detección": r.get("fecha_deteccion"),
-                "Modificado por": r.get("modificado_por_usuario"),
-                "Fecha modificación": r.get("modificado_fecha")
-            }
-            registros_expandidos.append(fila)
-
-        detalle = {
-            "id_clase": doc["id_clase"],
-            "fecha": doc["fecha"],
-            "id_aula": doc["id_aula"],
-            "nombre_clase": nombre_clase,
-            "nombre_aula": nombre_aula,
-            "registros": registros_expandidos
-        }
+        clase_doc = get_clase_by_id(args["id_clase"])
+        if not clase_doc:
+            return {"mensaje": "Clase no encontrada"}, 404
 
-        return detalle, 200
+        docs = list(asistencias_collection.find({
+            "id_clase": args["id_clase"],
+            "fecha": {"$gte": args["fecha_inicio"], "$lte": args["fecha_fin"]}
+        }).sort("fecha", -1))
+
+        return detalles_asistencias(clase_doc, docs), 200
 
 @ns.route("/asistencias/exportar")
 class ExportarAsistenciasResource(Resource):
@@ -227,9 +272,9 @@ class ExportarAsistenciasResource(Resource):
         Permite filtrar por clase y rango de fechas.
         """
         identity = get_jwt_identity()
-        user = get_user_by_id(identity)
+        rol = rol_actual()
 
-        if not user or user["rol"] != "profesor":
+        if rol != "profesor":
             logger.error(f"Usuario {identity} no tiene permisos de profesor")
             return {"error": "Acceso denegado"}, 403
 
@@ -265,70 +310,23 @@ class ExportarAsistenciasResource(Resource):
                 "$lte": fecha_fin
             }
 
-        asistencias = asistencias_collection.find(query_asistencias)
-
-        # Cache para clases, asignaturas y aulas
-        clases_dict = {clase["id_clase"]: clase for clase in clases}
-        asignaturas_cache = {}
-        aulas_dict = {}
-        registros_exportar = []
-
-        for doc in asistencias:
-            id_clase = doc["id_clase"]
-            clase = clases_dict.get(id_clase, {})
-            id_asignatura = clase.get("id_asignatura")
-
-            # Obtener el nombre de la asignatura
-            if id_asignatura and id_asignatura not in asignaturas_cache:
-                asignatura_doc = asignaturas_collection.find_one({"id_asignatura": id_asignatura})
-                asignaturas_cache[id_asignatura] = asignatura_doc["nombre"] if asignatura_doc else "Asignatura desconocida"
-            nombre_clase = asignaturas_cache.get(id_asignatura, "Asignatura desconocida")
-
-            id_aula = doc.get("id_aula")
-            if id_aula and id_aula not in aulas_dict:
-                aula_doc = get_aula_by_id(id_aula)
-                aulas_dict[id_aula] = aula_doc["nombre"] if aula_doc else "Aula desconocida"
-            nombre_aula = aulas_dict.get(id_aula, "Aula desconocida")
-
-            for r in doc.get("registros", []):
-                estudiante = estudiantes_collection.find_one({"id_estudiante": r["id_estudiante"]})
-                if estudiante:
-                    nombre_estudiante = f"{estudiante['nombre']} {estudiante['apellido']}"
-                else:
-                    nombre_estudiante = "Estudiante no registrado"
-
-                registros_exportar.append({
-                    "Fecha": doc["fecha"],
-                    "Clase": nombre_clase,
-                    "Aula": nombre_aula,
-                    "Estudiante": nombre_estudiante,
-                    "Estado": r.get("estado"),
-                    "Fecha detección": r.get("fecha_deteccion"),
-                    "Modificado por": r.get("modificado_por_usuario"),
-                    "Fecha modificación": r.get("modificado_fecha")
-                })
-
-        if not registros_exportar:
+        if not hay_registros(query_asistencias):
             return {"mensaje": "No se encontraron registros para exportar"}, 404
 
-        df = pd.DataFrame(registros_exportar)
+        clases_dict = {clase["id_clase"]: clase for clase in clases}
+        filas = generar_filas(query_asistencias, clases_dict)
 
         if formato == "csv":
-            # Exportar a CSV
-            output = io.StringIO()
-            df.to_csv(output, index=False, encoding='utf-8')
-            output.seek(0)
-            return send_file(
-                io.BytesIO(output.getvalue().encode('utf-8')),
-                as_attachment=True,
-                download_name="asistencias.csv",
-                mimetype="text/csv"
+            # Exportar a CSV enviando las filas a medida que se leen del cursor
+            return Response(
+                stream_with_context(generar_csv(filas)),
+                mimetype="text/csv",
+                headers={"Content-Disposition": "attachment; filename=asistencias.csv"}
             )
         else:
-            # Exportar a Excel (xlsx)
-            output = io.BytesIO()
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                df.to_excel(writer, index=False, sheet_name='Asistencias')
+            # Exportar a Excel (xlsx) en un fichero temporal, sin mantener la hoja en memoria
+            output = tempfile.TemporaryFile()
+            escribir_xlsx(filas, output)
             output.seek(0)
             return send_file(
                 output,
@@ -382,6 +380,11 @@ class RegistrarAsistenciaResource(Resource):
                     fecha,
                     asistencia["registros"] + nuevos_registros
                 )
+                estado_asistencias.descartar(id_clase, fecha)
+                aplicar_operaciones([
+                    operacion_resumen(id_clase, r["id_estudiante"], fecha, None, r["estado"], r["fecha_deteccion"])
+                    for r in nuevos_registros
+                ])
                 return {"mensaje": f"{len(nuevos_registros)} registros añadidos"}, 200
             else:
                 return {"mensaje": "No se añadieron registros nuevos"}, 200
@@ -397,6 +400,11 @@ class RegistrarAsistenciaResource(Resource):
                 } for r in registros_nuevos
             ]
             create_asistencia(id_clase, fecha, id_aula, registros)
+            estado_asistencias.descartar(id_clase, fecha)
+            aplicar_operaciones([
+                operacion_resumen(id_clase, r["id_estudiante"], fecha, None, r["estado"], r["fecha_deteccion"])
+                for r in registros
+            ])
             return {"mensaje": "Asistencia registrada"}, 201
 
 @ns.route("/asistencias/estudiante")
@@ -420,45 +428,36 @@ class AsistenciasEstudianteResource(Resource):
         parser.add_argument("fecha_fin", type=str, required=False)
         args = parser.parse_args()
 
-        # Construimos la query para filtrar
-        query = {
-            "id_clase": args["id_clase"],
-            "registros": {
-                "$elemMatch": {
-                    "id_estudiante": args["id_estudiante"]
-                }
-            }
-        }
-
-        if args["fecha_inicio"] and args["fecha_fin"]:
-            query["fecha"] = {
-                "$gte": args["fecha_inicio"],
-                "$lte": args["fecha_fin"]
-            }
+        # Consulta única sobre el resumen precalculado del estudiante en la clase
+        resumen = obtener_resumen(args["id_clase"], args["id_estudiante"]) or {}
+        historial = resumen.get("historial", {})
 
-        cursor = asistencias_collection.find(query).sort("fecha", -1)
         asistencias = []
         asistidas = 0
         ausentes = 0
-
-        for doc in cursor:
-            #logger.info(f"Documento encontrado: {doc}")  # Depuración
-            for registro in doc.get("registros", []):
-                if registro["id_estudiante"] == args["id_estudiante"]:
-                    asistencias.append({
-                        "fecha": doc["fecha"],
-                        "estado": registro["estado"]
-                    })
-                    if registro["estado"] == "confirmado":
-                        asistidas += 1
-                    elif registro["estado"] == "ausente":
-                        ausentes += 1
+        tardes = 0
+        for fecha in sorted(historial, reverse=True):
+            if args["fecha_inicio"] and args["fecha_fin"] and not (args["fecha_inicio"] <= fecha <= args["fecha_fin"]):
+                continue
+            estado = historial[fecha]
+            asistencias.append({
+                "fecha": fecha,
+                "estado": estado
+            })
+            if estado == "confirmado":
+                asistidas += 1
+            elif estado == "ausente":
+                ausentes += 1
+            elif estado == "tarde":
+                tardes += 1
 
         resultado = {
             "asistencias": asistencias,
             "resumen": {
                 "asistidas": asistidas,
-                "ausentes": ausentes
+                "ausentes": ausentes,
+                "tardes": tardes,
+                "ultima_deteccion": resumen.get("ultima_deteccion")
             }
         }
                 
@@ -1,7 +1,8 @@
 from flask_restx import Resource
 from src.servidor.api import ns
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from src.logica.database import aulas_collection, get_user_by_id
+from flask_jwt_extended import jwt_required
+from src.logica.database import aulas_collection
+from src.servidor.api.identidad import rol_actual
 from src.logica.logger import logger
 from src.modelos.aula import aula_model
 
@@ -15,10 +16,9 @@ class AulasResource(Resource):
         Devuelve la lista de aulas registradas en el sistema.
         Solo accesible para administradores autenticados.
         """
-        identity = get_jwt_identity()
-        user = get_user_by_id(identity)
+        rol = rol_actual()
 
-        if not user or user["rol"] != "admin":            
+        if rol != "admin":            
             return {"error": "Acceso denegado"}, 403
 
         aulas = list(aulas_collection.find())
@@ -2,7 +2,8 @@ from flask_restx import Resource, reqparse
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from src.servidor.api import ns
 from src.modelos.clase import clase_model,clase_model_clases
-from src.logica.database import get_user_by_id, get_asignatura_by_id, aulas_collection, clases_collection
+from src.logica.database import get_asignatura_by_id, aulas_collection, clases_collection
+from src.servidor.api.identidad import rol_actual
 from src.logica.logger import logger
 
 @ns.route("/clases")
@@ -22,9 +23,9 @@ class ClasesResource(Resource):
         Incluye los horarios y el nombre del aula para cada clase.
         """
         identity = get_jwt_identity()
-        user = get_user_by_id(identity)
+        rol = rol_actual()
 
-        if not user or (user["rol"] != "profesor" and user["rol"] != "admin"):
+        if rol != "profesor" and rol != "admin":
             return {"error": "Acceso denegado"}, 403
 
         parser = reqparse.RequestParser()
@@ -36,7 +37,7 @@ class ClasesResource(Resource):
         asignatura = args["asignatura"]
 
         # Validaciones para profesores
-        if user["rol"] == "profesor":
+        if rol == "profesor":
             if not id_usuario and not asignatura:
                 id_usuario = identity
             elif id_usuario and id_usuario != identity:
@@ -50,7 +51,7 @@ class ClasesResource(Resource):
             query["id_asignatura"] = asignatura
 
         # Si no se proporciona ningún parámetro y el usuario es admin, devolver todas las clases
-        if not query and user["rol"] != "admin":
+        if not query and rol != "admin":
             return {"error": "Debes especificar un id_usuario o asignatura"}, 400
 
         clases = list(clases_collection.find(query))
@@ -98,10 +99,9 @@ class ClaseResource(Resource):
         Devuelve los detalles de una clase específica.
         Solo accesible para administradores.
         """
-        identity = get_jwt_identity()
-        user = get_user_by_id(identity)
+        rol = rol_actual()
 
-        if not user or user["rol"] != "admin":
+        if rol != "admin":
             return {"error": "Acceso denegado"}, 403
 
         clase = clases_collection.find_one({"id_clase": id_clase})
@@ -131,10 +131,9 @@ class ClasesAdminResource(Resource):
         Solo accesible para administradores.
         Si se proporciona id_clase, se ignoran los otros filtros.
         """
-        identity = get_jwt_identity()
-        user = get_user_by_id(identity)
+        rol = rol_actual()
 
-        if not user or user["rol"] != "admin":
+        if rol != "admin":
             return {"error": "Acceso denegado"}, 403
 
         parser = reqparse.RequestParser()
@@ -1,17 +1,27 @@
-from flask import request, jsonify
+from flask import request, jsonify, send_file, Response
 from flask_restx import Resource, reqparse
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request
 from src.servidor.api import ns
-from src.logica.database import get_user_by_id, estudiantes_collection, fs, clases_collection
+from src.logica.database import estudiantes_collection, fs, clases_collection, trabajos_embeddings_collection, get_estudiante_by_id, get_estudiantes, existe_estudiante
+from src.servidor.api.identidad import rol_actual
 from src.logica.utils import obtener_clases_por_usuario
 from src.modelos.estudiante import estudiante_model
 from src.logica.logger import logger
-from src.logica.gridfs_embeddings_generator import GridFSEmbeddingsGenerator
+from src.logica.trabajos_embeddings import trabajador_embeddings
+from src.logica.importacion_estudiantes import encolar_importacion, estado_importacion
+from src.logica.galerias_clase import incrementar_version_galeria
+from src.logica.miniaturas import guardar_miniatura, obtener_miniatura, eliminar_miniaturas, describir_imagenes, url_imagen
+from src.logica.firmas import verificar
+from src.config.settings import IMAGENES_CACHE_MAX_AGE_S
+import time
 from bson.objectid import ObjectId
-import base64
-import mimetypes
+import io
+import zipfile
 
 
+# Reintentos de la eliminación de una imagen si el estudiante cambia a la vez
+INTENTOS_ELIMINAR_IMAGEN = 3
+
 @ns.route("/estudiantes")
 class EstudiantesResource(Resource):
     @jwt_required()
@@ -27,9 +37,9 @@ class EstudiantesResource(Resource):
         Solo accesible para profesores y administradores.
         """
         identity = get_jwt_identity()
-        user = get_user_by_id(identity)
+        rol = rol_actual()
 
-        if not user or user["rol"] not in ["profesor", "admin"]:
+        if rol not in ["profesor", "admin"]:
             return {"mensaje": "Acceso denegado"}, 403
 
         parser = reqparse.RequestParser()
@@ -39,8 +49,8 @@ class EstudiantesResource(Resource):
         class_id = args["class_id"]
         include_photos = args["incluir_foto"].lower() == "true"
 
-        if user["rol"] == "admin":
-            estudiantes = estudiantes_collection.find()
+        if rol == "admin":
+            estudiantes = get_estudiantes(proyeccion="resumen")
             estudiantes_unicos = list({est["id_estudiante"]: est for est in estudiantes}.values())
         else:
             clases = list(obtener_clases_por_usuario(identity))
@@ -54,41 +64,21 @@ class EstudiantesResource(Resource):
             else:
                 clases_ids = [clase["id_clase"] for clase in clases]
         
-            estudiantes = estudiantes_collection.find({"ids_clases": {"$in": clases_ids}})
+            estudiantes = get_estudiantes({"ids_clases": {"$in": clases_ids}}, "resumen")
             estudiantes_unicos = list({est["id_estudiante"]: est for est in estudiantes}.values())        
 
+        # Las fotos se devuelven como URLs (original y miniatura), no como datos en línea;
+        # los metadatos de todas las imágenes se obtienen en una sola consulta
+        imagenes = {}
+        if include_photos:
+            imagenes = describir_imagenes([file_id for est in estudiantes_unicos for file_id in est.get("imagenes_ids", [])])
+
         estudiantes_response = []
         for estudiante in estudiantes_unicos:
             estudiante_dict = dict(estudiante)
-
-            if "embeddings" in estudiante_dict:
-                del estudiante_dict["embeddings"]
-
-            if include_photos:
-                imagenes_ids = estudiante_dict.get("imagenes_ids", [])
-                imagenes_base64 = []            
-
-                for file_id in imagenes_ids:
-                    try:
-                        grid_out = fs.get(ObjectId(file_id))
-                        imagen_data = grid_out.read()
-                        imagen_base64 = base64.b64encode(imagen_data).decode('utf-8')
-                        mimetype, _ = mimetypes.guess_type(grid_out.filename)
-                        if not mimetype:
-                            mimetype = 'image/jpeg'
-                        imagenes_base64.append({
-                            "file_id": file_id,
-                            "filename": grid_out.filename,
-                            "data": imagen_base64,
-                            "mimetype": mimetype
-                        })
-                    except Exception as e:
-                        logger.error(f"Error al cargar la imagen {file_id} para el estudiante {estudiante['id_estudiante']}: {e}")
-                        continue
-
-                estudiante_dict["imagenes"] = imagenes_base64
-            else:
-                estudiante_dict["imagenes"] = []
+            estudiante_dict["imagenes"] = [
+                imagenes[file_id] for file_id in estudiante_dict.get("imagenes_ids", []) if file_id in imagenes
+            ]
 
             if "imagenes_ids" in estudiante_dict:
                 del estudiante_dict["imagenes_ids"]
@@ -107,10 +97,9 @@ class EstudianteNuevoResource(Resource):
         Crear un nuevo estudiante.
         Solo accesible para administradores.
         """
-        identity = get_jwt_identity()
-        user = get_user_by_id(identity)
+        rol = rol_actual()
 
-        if not user or user["rol"] != "admin":        
+        if rol != "admin":        
             return {"error": "Acceso denegado"}, 403
 
         data = request.get_json()
@@ -130,7 +119,7 @@ class EstudianteNuevoResource(Resource):
 
         contador = 1
         nuevo_id = "est_1"
-        while estudiantes_collection.find_one({"id_estudiante": nuevo_id}):
+        while existe_estudiante(nuevo_id):
             contador += 1
             nuevo_id = f"est_{contador}"
 
@@ -149,6 +138,7 @@ class EstudianteNuevoResource(Resource):
             return {"error": "Error al crear el estudiante en la base de datos"}, 500
 
         nuevo_estudiante["_id"] = str(nuevo_estudiante["_id"])
+        del nuevo_estudiante["embeddings"]
         return nuevo_estudiante, 201
 
 @ns.route("/estudiantes/<string:id_estudiante>")
@@ -160,43 +150,22 @@ class EstudianteResource(Resource):
         Obtener un estudiante específico.
         Solo accesible para administradores.
         """
-        identity = get_jwt_identity()
-        user = get_user_by_id(identity)
+        rol = rol_actual()
 
-        if not user or user["rol"] != "admin":
+        if rol != "admin":
 
             return {"error": "Acceso denegado"}, 403
 
-        estudiante = estudiantes_collection.find_one({"id_estudiante": id_estudiante})
+        estudiante = get_estudiante_by_id(id_estudiante, "resumen")
         if not estudiante:
             return {"error": "Estudiante no encontrado"}, 404
 
         estudiante_dict = dict(estudiante)
-        if "embeddings" in estudiante_dict:
-            del estudiante_dict["embeddings"]
 
-        # Cargar las imágenes del estudiante
+        # URLs de las imágenes del estudiante
         imagenes_ids = estudiante_dict.get("imagenes_ids", [])
-        imagenes_base64 = []
-
-        for file_id in imagenes_ids:
-            try:
-                grid_out = fs.get(ObjectId(file_id))
-                imagen_data = grid_out.read()
-                imagen_base64 = base64.b64encode(imagen_data).decode('utf-8')
-                mimetype, _ = mimetypes.guess_type(grid_out.filename)
-                if not mimetype:
-                    mimetype = 'image/jpeg'
-                imagenes_base64.append({
-                    "file_id": file_id,
-                    "filename": grid_out.filename,
-                    "data": imagen_base64,
-                    "mimetype": mimetype
-                })
-            except Exception as e:                
-                continue
-
-        estudiante_dict["imagenes"] = imagenes_base64
+        imagenes = describir_imagenes(imagenes_ids)
+        estudiante_dict["imagenes"] = [imagenes[file_id] for file_id in imagenes_ids if file_id in imagenes]
 
         if "imagenes_ids" in estudiante_dict:
             del estudiante_dict["imagenes_ids"]
@@ -211,13 +180,12 @@ class EstudianteResource(Resource):
         Actualizar un estudiante existente.
         Solo accesible para administradores.
         """
-        identity = get_jwt_identity()
-        user = get_user_by_id(identity)
+        rol = rol_actual()
 
-        if not user or user["rol"] != "admin":            
+        if rol != "admin":            
             return {"error": "Acceso denegado"}, 403
 
-        estudiante = estudiantes_collection.find_one({"id_estudiante": id_estudiante})
+        estudiante = get_estudiante_by_id(id_estudiante, "clases")
         if not estudiante:            
             return {"error": "Estudiante no encontrado"}, 404
 
@@ -237,8 +205,11 @@ class EstudianteResource(Resource):
             update_data["ids_clases"] = ids_clases
 
         estudiantes_collection.update_one({"id_estudiante": id_estudiante}, {"$set": update_data})        
+        if ids_clases is not None:
+            # Las clases que ganan o pierden al estudiante deben recompilar su galería
+            incrementar_version_galeria(set(ids_clases) ^ set(estudiante.get("ids_clases", [])))
 
-        updated_estudiante = estudiantes_collection.find_one({"id_estudiante": id_estudiante})
+        updated_estudiante = get_estudiante_by_id(id_estudiante, "resumen")
         updated_estudiante["_id"] = str(updated_estudiante["_id"])
         return updated_estudiante, 200
 
@@ -249,13 +220,12 @@ class EstudianteResource(Resource):
         Eliminar un estudiante existente.
         Solo accesible para administradores.
         """
-        identity = get_jwt_identity()
-        user = get_user_by_id(identity)
+        rol = rol_actual()
 
-        if not user or user["rol"] != "admin":            
+        if rol != "admin":            
             return {"error": "Acceso denegado"}, 403
 
-        estudiante = estudiantes_collection.find_one({"id_estudiante": id_estudiante})
+        estudiante = get_estudiante_by_id(id_estudiante, "fotos")
         if not estudiante:            
             return {"error": "Estudiante no encontrado"}, 404
 
@@ -263,10 +233,12 @@ class EstudianteResource(Resource):
         for file_id in imagenes_ids:
             try:
                 fs.delete(ObjectId(file_id))                
+                eliminar_miniaturas(file_id)
             except Exception as e:
                 logger.error(f"Error al eliminar la imagen {file_id}: {e}")
 
         estudiantes_collection.delete_one({"id_estudiante": id_estudiante})
+        incrementar_version_galeria(estudiante.get("ids_clases", []))
 
         return {"mensaje": "Estudiante eliminado correctamente"}, 200
 
@@ -276,15 +248,15 @@ class SubirImagenEstudiante(Resource):
     def post(self, id_estudiante):
         """
         Subir una imagen para un estudiante y guardarla en GridFS.
+        El embedding se genera en segundo plano: la respuesta (202) incluye el id_trabajo
+        con el que consultar su estado en /embeddings/trabajos/<id_trabajo>.
         Solo accesible para administradores.
         """
-        identity = get_jwt_identity()
-        user = get_user_by_id(identity)
-        if not user or user["rol"] != "admin":            
+        rol = rol_actual()
+        if rol != "admin":            
             return {"error": "Acceso denegado"}, 403
 
-        estudiante = estudiantes_collection.find_one({"id_estudiante": id_estudiante})
-        if not estudiante:            
+        if not existe_estudiante(id_estudiante):            
             return {"error": "Estudiante no encontrado"}, 404
 
         if 'imagen' not in request.files:            
@@ -305,29 +277,72 @@ class SubirImagenEstudiante(Resource):
                 metadata={"id_estudiante": id_estudiante}
             )            
 
-            # Generar embedding para la imagen recién subida
-            embedding_generator = GridFSEmbeddingsGenerator()
-            embedding = embedding_generator.process_image_data(imagen_data)
-
-            # Actualizar el estudiante con la nueva imagen y el embedding
-            imagenes_ids = estudiante.get("imagenes_ids", [])
-            embeddings = estudiante.get("embeddings", [])
-
-            imagenes_ids.append(str(file_id))
-            if embedding:
-                embeddings.append(embedding)                
-            else:
-                logger.warning(f"No se pudo generar embedding para la imagen {file_id} del estudiante {id_estudiante}")
+            # La miniatura se genera ahora para que los listados no descarguen originales
+            try:
+                guardar_miniatura(str(file_id), id_estudiante, imagen_data)
+            except Exception as e:
+                logger.warning(f"No se pudo generar la miniatura de la imagen {file_id}: {e}")
 
+            # Añadir la imagen al estudiante; el embedding lo añade el trabajador al terminar
             estudiantes_collection.update_one(
                 {"id_estudiante": id_estudiante},
-                {"$set": {"imagenes_ids": imagenes_ids, "embeddings": embeddings}}
-            )            
+                {"$push": {"imagenes_ids": str(file_id)}}
+            )
+            id_trabajo = trabajador_embeddings.encolar(id_estudiante, str(file_id))
 
-            return {"mensaje": "Imagen subida correctamente", "file_id": str(file_id)}, 200
+            return {"mensaje": "Imagen subida correctamente", "file_id": str(file_id), "id_trabajo": id_trabajo}, 202
         except Exception as e:            
+            logger.error(f"Error al guardar la imagen del estudiante {id_estudiante}: {e}")
             return {"error": "Error al guardar la imagen o generar el embedding"}, 500
 
+@ns.route("/estudiantes/importar-fotos")
+class ImportarFotosEstudiantes(Resource):
+    @jwt_required()
+    @ns.doc(description="Importar en bloque fotos de estudiantes desde un ZIP (solo para administradores)")
+    def post(self):
+        """
+        Importa un ZIP con ficheros `<id_estudiante>_*.jpg`: guarda cada imagen en GridFS y
+        encola su embedding en segundo plano. La respuesta (202) incluye el id_importacion con
+        el que consultar el progreso y los fallos por imagen en /estudiantes/importaciones/<id>.
+        Solo accesible para administradores.
+        """
+        rol = rol_actual()
+        if rol != "admin":
+            return {"error": "Acceso denegado"}, 403
+
+        if 'archivo' not in request.files:
+            return {"error": "No se envió ningún archivo"}, 400
+
+        archivo = request.files['archivo']
+        if not archivo.filename.lower().endswith(".zip"):
+            return {"error": "El archivo debe ser un ZIP"}, 400
+
+        try:
+            resumen = encolar_importacion(archivo.stream)
+        except zipfile.BadZipFile:
+            return {"error": "El archivo ZIP no es válido"}, 400
+        except Exception as e:
+            logger.error(f"Error en la importación de fotos {archivo.filename}: {e}")
+            return {"error": "Error al importar las fotos"}, 500
+
+        return resumen, 202
+
+@ns.route("/estudiantes/importaciones/<string:id_importacion>")
+class EstadoImportacionFotos(Resource):
+    @jwt_required()
+    @ns.doc(description="Progreso de una importación en bloque de fotos (solo para administradores)")
+    def get(self, id_importacion):
+        """
+        Totales por estado y fallos por archivo de una importación en bloque de fotos.
+        Solo accesible para administradores.
+        """
+        if rol_actual() != "admin":
+            return {"error": "Acceso denegado"}, 403
+        estado = estado_importacion(id_importacion)
+        if estado is None:
+            return {"error": "Importación no encontrada"}, 404
+        return estado, 200
+
 @ns.route("/estudiantes/<string:id_estudiante>/imagenes/<string:file_id>")
 class EliminarImagenEstudiante(Resource):
     @jwt_required()
@@ -337,69 +352,134 @@ class EliminarImagenEstudiante(Resource):
         Eliminar una imagen específica de un estudiante y su embedding asociado.
         Solo accesible para administradores.
         """
-        identity = get_jwt_identity()
-        user = get_user_by_id(identity)
-        if not user or user["rol"] != "admin":        
+        rol = rol_actual()
+        if rol != "admin":        
             return {"error": "Acceso denegado"}, 403
 
-        estudiante = estudiantes_collection.find_one({"id_estudiante": id_estudiante})
-        if not estudiante:            
-            return {"error": "Estudiante no encontrado"}, 404
-
-        imagenes_ids = estudiante.get("imagenes_ids", [])
-        if file_id not in imagenes_ids:            
-            return {"error": "Imagen no encontrada"}, 404
-
         try:
-            # Eliminar la imagen de GridFS
-            fs.delete(ObjectId(file_id))
-            logger.info(f"Imagen {file_id} eliminada para el estudiante {id_estudiante}")
-
-            # Encontrar la posición de la imagen en imagenes_ids
-            index = imagenes_ids.index(file_id)
-
-            # Eliminar el file_id de imagenes_ids
-            imagenes_ids.remove(file_id)
+            # Las listas se editan en Python y se escriben solo si nadie las cambió entretanto
+            # (por ejemplo, el trabajador añadiendo un embedding con $push); si no, se reintenta
+            for _ in range(INTENTOS_ELIMINAR_IMAGEN):
+                estudiante = get_estudiante_by_id(id_estudiante, "fotos_embeddings")
+                if not estudiante:            
+                    return {"error": "Estudiante no encontrado"}, 404
 
-            # Eliminar el embedding correspondiente (si existe)
-            embeddings = estudiante.get("embeddings", [])
-            if embeddings and index < len(embeddings):
-                embeddings.pop(index)
+                imagenes_ids = estudiante.get("imagenes_ids", [])
+                if file_id not in imagenes_ids:            
+                    return {"error": "Imagen no encontrada"}, 404
+
+                # Encontrar la posición de la imagen en imagenes_ids
+                index = imagenes_ids.index(file_id)
+
+                # Eliminar el file_id de imagenes_ids
+                imagenes_ids = imagenes_ids[:index] + imagenes_ids[index + 1:]
+
+                # Eliminar el embedding correspondiente (si existe). Los embeddings generados en
+                # segundo plano son los últimos de la lista y su file_id está en embeddings_imagenes;
+                # los anteriores siguen la posición de su imagen en imagenes_ids
+                embeddings = list(estudiante.get("embeddings", []))
+                embeddings_imagenes = list(estudiante.get("embeddings_imagenes", []))
+                desplazamiento = len(embeddings) - len(embeddings_imagenes)
+                if file_id in embeddings_imagenes:
+                    posicion = embeddings_imagenes.index(file_id)
+                    embeddings_imagenes.pop(posicion)
+                    embeddings.pop(desplazamiento + posicion)
+                elif index < desplazamiento:
+                    embeddings.pop(index)
+                else:
+                    logger.info(f"No se encontró un embedding para la imagen {file_id}")
+
+                # Actualizar el estudiante solo si las listas siguen teniendo el tamaño leído
+                filtro = {"id_estudiante": id_estudiante}
+                for campo in ("imagenes_ids", "embeddings", "embeddings_imagenes"):
+                    filtro[campo] = {"$size": len(estudiante[campo])} if campo in estudiante else {"$exists": False}
+                resultado = estudiantes_collection.update_one(
+                    filtro,
+                    {"$set": {"imagenes_ids": imagenes_ids, "embeddings": embeddings, "embeddings_imagenes": embeddings_imagenes}}
+                )
+                if resultado.matched_count:
+                    break
+                logger.info(f"El estudiante {id_estudiante} cambió mientras se eliminaba la imagen {file_id}; reintentando")
             else:
-                logger.info(f"No se encontró un embedding en la posición {index} para eliminar")
+                return {"error": "El estudiante se está modificando; inténtalo de nuevo"}, 409
 
-            # Actualizar el estudiante con las listas modificadas
-            estudiantes_collection.update_one(
-                {"id_estudiante": id_estudiante},
-                {"$set": {"imagenes_ids": imagenes_ids, "embeddings": embeddings}}
-            )            
+            # Eliminar la imagen de GridFS una vez desvinculada del estudiante
+            fs.delete(ObjectId(file_id))
+            eliminar_miniaturas(file_id)
+            logger.info(f"Imagen {file_id} eliminada para el estudiante {id_estudiante}")
+            incrementar_version_galeria(estudiante.get("ids_clases", []))
 
             return {"mensaje": "Imagen y embedding eliminados correctamente"}, 200
         except Exception as e:
             logger.error(f"Error al eliminar la imagen {file_id} o el embedding: {e}")
             return {"error": "Error al eliminar la imagen o el embedding"}, 500
 
-@ns.route("/imagenes/<string:file_id>")
-class ServirImagen(Resource):
+@ns.route("/embeddings/trabajos")
+class TrabajosEmbeddings(Resource):
     @jwt_required()
-    def get(self, file_id):
+    @ns.doc(description="Progreso de la generación de embeddings en segundo plano (solo para administradores)")
+    def get(self):
         """
-        Servir una imagen desde GridFS.
-        Solo accesible para profesores y administradores.
-        Los profesores solo pueden acceder a imágenes de sus propios estudiantes.
+        Número de trabajos de embeddings por estado y tamaño de la cola.
+        Solo accesible para administradores.
         """
-        identity = get_jwt_identity()
-        user = get_user_by_id(identity)
-        if not user or user["rol"] not in ["profesor", "admin"]:            
+        if rol_actual() != "admin":
+            return {"error": "Acceso denegado"}, 403
+        return trabajador_embeddings.resumen(), 200
+
+@ns.route("/embeddings/trabajos/<string:id_trabajo>")
+class TrabajoEmbeddings(Resource):
+    @jwt_required()
+    @ns.doc(description="Estado de un trabajo de generación de embeddings (solo para administradores)")
+    def get(self, id_trabajo):
+        """
+        Estado de un trabajo de embeddings: pendiente, procesando, completado o error.
+        Solo accesible para administradores.
+        """
+        if rol_actual() != "admin":
             return {"error": "Acceso denegado"}, 403
+        trabajo = trabajos_embeddings_collection.find_one({"id_trabajo": id_trabajo}, {"_id": 0})
+        if not trabajo:
+            return {"error": "Trabajo no encontrado"}, 404
+        return trabajo, 200
 
+@ns.route("/imagenes/<string:file_id>")
+class ServirImagen(Resource):
+    @ns.doc(params={
+        "tamano": "original (por defecto) o miniatura",
+        "expira": "Caducidad de la URL firmada",
+        "firma": "Firma de la URL devuelta en los listados de estudiantes"
+    })
+    def get(self, file_id):
+        """
+        Servir una imagen (o su miniatura) desde GridFS con ETag y Cache-Control.
+        Las imágenes no cambian una vez subidas, así que admite GET condicional (304).
+        Acepta la URL firmada que devuelven los listados (para <img src>) o el token JWT en la
+        cabecera; en ese caso solo es accesible para profesores y administradores, y los
+        profesores solo pueden acceder a imágenes de sus propios estudiantes.
+        """
+        firmada = "firma" in request.args
+        if firmada:
+            # La firma la emite un listado que ya comprobó el acceso a este estudiante
+            if not verificar(f"imagen:{file_id}", request.args.get("expira"), request.args.get("firma")):
+                return {"error": "URL de imagen inválida o caducada"}, 401
+            max_age = min(IMAGENES_CACHE_MAX_AGE_S, int(request.args["expira"]) - int(time.time()))
+        else:
+            verify_jwt_in_request()
+            identity = get_jwt_identity()
+            rol = rol_actual()
+            if rol not in ["profesor", "admin"]:            
+                return {"error": "Acceso denegado"}, 403
+            max_age = IMAGENES_CACHE_MAX_AGE_S
+
+        miniatura = request.args.get("tamano") == "miniatura"
         try:
+            # fs.get solo lee los metadatos; el contenido se lee después si hace falta
             grid_out = fs.get(ObjectId(file_id))
-            imagen_data = grid_out.read()
 
-            if user["rol"] == "profesor":
+            if not firmada and rol == "profesor":
                 id_estudiante = grid_out.metadata.get("id_estudiante")
-                estudiante = estudiantes_collection.find_one({"id_estudiante": id_estudiante})
+                estudiante = get_estudiante_by_id(id_estudiante, "clases")
                 if not estudiante:                    
                     return {"error": "Estudiante no encontrado"}, 404
 
@@ -408,12 +488,22 @@ class ServirImagen(Resource):
                 if not any(clase_id in clases_ids for clase_id in estudiante["ids_clases"]):                    
                     return {"error": "Acceso denegado"}, 403
 
-            return send_file(
-                io.BytesIO(imagen_data),
-                mimetype='image/jpeg',
+            if miniatura:
+                grid_out = obtener_miniatura(file_id) or grid_out
+
+            etag = f"{grid_out._id}"
+            cabeceras = {"ETag": f'"{etag}"', "Cache-Control": f"private, max-age={max_age}, immutable"}
+            if etag in request.if_none_match:
+                return Response(status=304, headers=cabeceras)
+
+            respuesta = send_file(
+                io.BytesIO(grid_out.read()),
+                mimetype=getattr(grid_out, "content_type", None) or 'image/jpeg',
                 as_attachment=False,
                 download_name=grid_out.filename
             )
+            respuesta.headers.update(cabeceras)
+            return respuesta
         except Exception as e:
             logger.error(f"Error al servir la imagen {file_id}: {e}")
             return {"error": "Imagen no encontrada"}, 404
@@ -434,10 +524,9 @@ class EstudiantesFiltrarResource(Resource):
         Solo accesible para administradores.
         Permite incluir fotos de los estudiantes si se solicita.
         """
-        identity = get_jwt_identity()
-        user = get_user_by_id(identity)
+        rol = rol_actual()
 
-        if not user or user["rol"] != "admin":            
+        if rol != "admin":            
             return {"error": "Acceso denegado"}, 403
 
         parser = reqparse.RequestParser()
@@ -469,7 +558,7 @@ class EstudiantesFiltrarResource(Resource):
         query_estudiantes = {
             "ids_clases": {"$in": ids_clases_filtradas}
         }
-        estudiantes = list(estudiantes_collection.find(query_estudiantes))
+        estudiantes = list(get_estudiantes(query_estudiantes, "resumen"))
 
         # Procesar los estudiantes
         for estudiante in estudiantes:
@@ -478,5 +567,7 @@ class EstudiantesFiltrarResource(Resource):
             estudiante["ids_clases"] = estudiante.get("ids_clases", [])
             if not incluir_foto:
                 estudiante.pop("imagenes", None)
+            else:
+                estudiante["urls_fotos"] = [url_imagen(file_id, miniatura=True) for file_id in estudiante.get("imagenes_ids", [])]
         
         return estudiantes, 200
\ No newline at end of file
@@ -1,8 +1,10 @@
 from flask_restx import Resource
 from src.servidor.api import ns
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from src.logica.database import get_user_by_id, clases_collection, usuarios_collection, aulas_collection
+from flask_jwt_extended import jwt_required
+from src.logica.database import clases_collection, usuarios_collection, aulas_collection
+from src.servidor.api.identidad import rol_actual
 from src.logica.logger import logger
+from src.logica.indice_horarios import indice_horarios
 from datetime import datetime
 from src.modelos.horarios import actualizar_horarios_model
 from src.modelos.clase import horario_model
@@ -27,10 +29,9 @@ class HorariosResource(Resource):
         Solo accesible para administradores.
         Realiza validaciones de formato, rango y superposición de horarios.
         """
-        identity = get_jwt_identity()
-        user = get_user_by_id(identity)
+        rol = rol_actual()
 
-        if not user or user["rol"] != "admin":            
+        if rol != "admin":            
             return {"error": "Acceso denegado"}, 403
 
         clase = clases_collection.find_one({"id_clase": id_clase})
@@ -66,6 +67,14 @@ class HorariosResource(Resource):
             if horario["hora_inicio"] >= horario["hora_fin"]:                
                 return {"error": "La hora de inicio debe ser anterior a la hora de fin."}, 400
 
+        # Validar superposición entre los horarios nuevos de la propia clase
+        for i, nuevo_horario in enumerate(nuevos_horarios):
+            for otro_horario in nuevos_horarios[i + 1:]:
+                if se_superponen(nuevo_horario, otro_horario):
+                    return {
+                        "error": f"Los horarios de la clase se superponen entre sí: {otro_horario['dia']} {otro_horario['hora_inicio']}-{otro_horario['hora_fin']}"
+                    }, 400
+
         # Validar superposición con el mismo profesor
         profesor_id = clase["id_usuario"]
         # Obtener el nombre del profesor
@@ -114,5 +123,6 @@ class HorariosResource(Resource):
         clases_collection.update_one(
             {"id_clase": id_clase},
             {"$set": {"horarios": nuevos_horarios}}
-        )        
+        )
+        indice_horarios.invalidar()
         return {"mensaje": "Horarios actualizados correctamente"}, 200
\ No newline at end of file
@@ -1,7 +1,8 @@
 from flask_restx import Resource
 from src.servidor.api import ns
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from src.logica.database import usuarios_collection, get_user_by_id
+from flask_jwt_extended import jwt_required
+from src.logica.database import usuarios_collection
+from src.servidor.api.identidad import rol_actual
 from src.logica.logger import logger
 from src.modelos.usuario import usuario_model
 
@@ -12,10 +13,9 @@ class ProfesoresResource(Resource):
     @ns.marshal_list_with(usuario_model)
     def get(self):
         """Obtener la lista de profesores"""
-        identity = get_jwt_identity()
-        user = get_user_by_id(identity)
+        rol = rol_actual()
 
-        if not user or user["rol"] != "admin":
+        if rol != "admin":
             return {"error": "Acceso denegado"}, 403
 
         profesores = usuarios_collection.find({"rol": "profesor"})
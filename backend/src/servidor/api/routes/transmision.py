@@ -1,11 +1,18 @@
-from flask import request, jsonify, Response
+from flask import request, jsonify, Response, stream_with_context
 from flask_restx import Resource, reqparse
 from datetime import datetime
 import threading
 import time
 from src.servidor.api import ns
-from flask_jwt_extended import jwt_required
+from flask_jwt_extended import jwt_required, get_jwt_identity
 from src.logica.receptor import iniciar_transmision_para_aula, detener_transmision, generar_frames
+from src.logica.difusor_mjpeg import DifusorMJPEG
+from src.logica.database import get_clase_by_id
+from src.servidor.api.identidad import rol_actual
+from src.logica.estado_asistencias import estado_asistencias
+from src.logica.eventos_asistencia import bus_eventos
+from src.logica.firmas import firmar, verificar
+from src.config.settings import EVENTOS_TOKEN_VENTANA_S
 from src.logica.utils import (
     obtener_clase_activa_para_aula,
     obtener_aula_por_raspberry,
@@ -86,7 +93,8 @@ class IniciarTransmision(Resource):
 
         if id_aula in transmisiones_activas:
             # Actualizar la clase activa si ya hay una transmisión para el aula
-            transmisiones_activas[id_aula]["id_clase"] = id_clase            
+            transmisiones_activas[id_aula]["id_clase"] = id_clase
+            bus_eventos.publicar(id_clase, "transmision", {"transmitir": True})
             return {
                 "permitido": True,
                 "id_clase": id_clase,
@@ -96,8 +104,7 @@ class IniciarTransmision(Resource):
         # Crear el objeto transmision con tiempo de inicio y tiempo máximo
         transmision = {
             "id_clase": id_clase,
-            "frame": None,
-            "lock": threading.Lock(),
+            "difusor": DifusorMJPEG(),
             "detener_evento": threading.Event(),
             "proceso_ffmpeg": None,
             "detecciones_temporales": {},
@@ -126,7 +133,8 @@ class IniciarTransmision(Resource):
             "id_clase": id_clase,
             "transmision": transmision
         }
-        
+        bus_eventos.publicar(id_clase, "transmision", {"transmitir": True})
+
         return {
             "permitido": True,
             "id_clase": id_clase,
@@ -215,6 +223,55 @@ class EstadoTransmisionWeb(Resource):
         transmitir = es_transmision_activa(id_aula)
         return {"transmitir": transmitir}, 200
 
+def fecha_actual_madrid():
+    """Fecha actual (YYYY-MM-DD) en la zona horaria de Madrid."""
+    now_utc = datetime.utcnow().replace(tzinfo=pytz.UTC)
+    return now_utc.astimezone(pytz.timezone("Europe/Madrid")).strftime("%Y-%m-%d")
+
+@ns.route("/transmision/eventos/<string:id_clase>/token")
+class TokenEventosTransmision(Resource):
+    @jwt_required()
+    def post(self, id_clase):
+        """
+        Emite un token de corta duración válido solo para el flujo de eventos de esta clase.
+        EventSource no puede enviar la cabecera Authorization, así que el flujo se abre con
+        este token en la URL en lugar del token de acceso del usuario.
+        Solo para administradores o el profesor de la clase.
+        """
+        clase = get_clase_by_id(id_clase)
+        if not clase:
+            return {"error": "Clase no encontrada"}, 404
+        if rol_actual() != "admin" and clase.get("id_usuario") != get_jwt_identity():
+            return {"error": "Acceso denegado"}, 403
+
+        expira, firma = firmar(f"eventos:{id_clase}", EVENTOS_TOKEN_VENTANA_S)
+        return {"expira": expira, "firma": firma}, 200
+
+@ns.route("/transmision/eventos/<string:id_clase>")
+class EventosTransmision(Resource):
+    @ns.doc(params={"expira": "Caducidad del token del flujo", "firma": "Firma obtenida en /transmision/eventos/<id_clase>/token"})
+    def get(self, id_clase):
+        """
+        Flujo Server-Sent Events con la asistencia en vivo de una clase.
+        Envía una instantánea inicial (estado de transmisión y registros del día) y después
+        los cambios de asistencia y de transmisión a medida que ocurren.
+        Requiere el token del flujo (`expira` y `firma`) emitido para esta clase.
+        """
+        if not verificar(f"eventos:{id_clase}", request.args.get("expira"), request.args.get("firma")):
+            return {"error": "Token de eventos inválido o caducado"}, 401
+
+        def instantanea():
+            id_aula = obtener_aula_por_clase(id_clase)
+            transmitir = bool(id_aula) and es_transmision_activa(id_aula)
+            registros = estado_asistencias.instantanea(id_clase, fecha_actual_madrid()) if transmitir else []
+            return {"transmitir": transmitir, "registros": registros}
+
+        return Response(
+            stream_with_context(bus_eventos.flujo(id_clase, instantanea)),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
 @ns.route("/transmision/video/<string:id_clase>")
 class VideoStreamRoute(Resource):
     #@jwt_required()
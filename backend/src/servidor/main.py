@@ -5,7 +5,25 @@ import os
 ruta_proyecto = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
 sys.path.append(ruta_proyecto)
 
-from src.servidor.api import app
-
+# Las importaciones del servidor quedan dentro del bloque principal para que los procesos
+# de aula (lanzados con "spawn") no vuelvan a crear la aplicación ni la conexión a MongoDB
 if __name__ == "__main__":
-    app.run(debug=True, host="0.0.0.0", threaded=True)  
\ No newline at end of file
+    from src.servidor.api import app
+    from src.config.settings import POOL_MODELOS_CALENTAR
+    from src.logica.pool_modelos import calentar_pool_modelos
+    from src.logica.resumen_asistencias import reconstruir_si_vacio
+    from src.logica.indices import aplicar_indices
+    from src.logica.trabajos_embeddings import trabajador_embeddings
+
+    # Con el recargador de Flask solo el proceso hijo atiende peticiones
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        # Crear los índices que falten antes de atender consultas
+        aplicar_indices()
+        # Poblar los resúmenes de asistencia la primera vez que se arranca con esta versión
+        reconstruir_si_vacio()
+        # Cargar los modelos de inferencia antes de aceptar transmisiones
+        if POOL_MODELOS_CALENTAR:
+            calentar_pool_modelos()
+        # Retomar la generación de embeddings de las fotos subidas antes del reinicio
+        trabajador_embeddings.iniciar()
+    app.run(debug=True, host="0.0.0.0", threaded=True)
\ No newline at end of file
@@ -1,6 +1,6 @@
 import { useState, useEffect } from 'react';
 import { Estudiante, ClaseAsignada, Imagen } from '../../types/estudiantes';
-import { obtenerAsignaturas, obtenerProfesoresPorAsignatura, subirImagenEstudiante, eliminarImagenEstudiante } from '../../state/api';
+import { obtenerAsignaturas, obtenerProfesoresPorAsignatura, subirImagenEstudiante, eliminarImagenEstudiante, obtenerTrabajoEmbeddings, urlImagen } from '../../state/api';
 
 interface Asignatura {
   id_asignatura: string;
@@ -61,6 +61,7 @@ const FormularioEditarEstudiante: React.FC<FormularioEditarEstudianteProps> = ({
   const [isProfesorDisabled, setIsProfesorDisabled] = useState(false);
   const [mensajeConfirmacion, setMensajeConfirmacion] = useState<string | null>(null);
   const [showConfirmModal, setShowConfirmModal] = useState(false); // Estado para el modal de confirmación
+  const [trabajosPendientes, setTrabajosPendientes] = useState<string[]>([]); // Embeddings de fotos subidas aún en proceso
 
   // Hacer que los mensajes de error desaparezcan después de 5 segundos
   useEffect(() => {
@@ -82,6 +83,31 @@ const FormularioEditarEstudiante: React.FC<FormularioEditarEstudianteProps> = ({
     }
   }, [mensajeConfirmacion]);
 
+  // Consultar cada 2 segundos el estado de los embeddings de las fotos subidas
+  useEffect(() => {
+    if (trabajosPendientes.length === 0) return;
+    const timer = setTimeout(async () => {
+      try {
+        const trabajos = await Promise.all(trabajosPendientes.map(obtenerTrabajoEmbeddings));
+        const fallidos = trabajos.filter(t => t.estado === 'error');
+        if (fallidos.length > 0) {
+          setError(`No se pudo procesar ${fallidos.length} foto(s): ${fallidos.map(t => t.error).join(', ')}`);
+        }
+        const pendientes = trabajos
+          .filter(t => t.estado === 'pendiente' || t.estado === 'procesando')
+          .map(t => t.id_trabajo);
+        if (pendientes.length === 0 && fallidos.length === 0) {
+          setMensajeConfirmacion('Fotos procesadas correctamente');
+        }
+        setTrabajosPendientes(pendientes);
+      } catch (err) {
+        console.error('Error al consultar el estado de las fotos:', err);
+        setTrabajosPendientes([]);
+      }
+    }, 2000);
+    return () => clearTimeout(timer);
+  }, [trabajosPendientes, setError]);
+
   // Cargar asignaturas al montar el componente
   useEffect(() => {
     const cargarAsignaturas = async () => {
@@ -287,10 +313,13 @@ const FormularioEditarEstudiante: React.FC<FormularioEditarEstudianteProps> = ({
       // Guardar información básica
       await onSubmitInfoBasica(editandoDatos.nombre, editandoDatos.apellido);
 
-      // Subir nuevas imágenes
+      // Subir nuevas imágenes; sus embeddings se generan en segundo plano
+      const trabajos: string[] = [];
       for (const imagen of editandoDatos.nuevasImagenes) {
-        await subirImagenEstudiante(estudiante.id_estudiante, imagen);
+        const respuesta = await subirImagenEstudiante(estudiante.id_estudiante, imagen);
+        trabajos.push((respuesta as unknown as { id_trabajo: string }).id_trabajo);
       }
+      setTrabajosPendientes(prev => [...prev, ...trabajos]);
 
       // Eliminar imágenes marcadas
       for (const fileId of editandoDatos.imagenesAEliminar) {
@@ -397,7 +426,7 @@ const FormularioEditarEstudiante: React.FC<FormularioEditarEstudianteProps> = ({
                   <div key={imagen.file_id} className="col-md-3">
                     <div className="card">
                       <img
-                        src={`data:${imagen.mimetype};base64,${imagen.data}`}
+                        src={urlImagen(imagen.url_miniatura)}
                         alt={imagen.filename}
                         className="card-img-top"
                         style={{ height: '150px', objectFit: 'cover' }}
@@ -592,6 +621,11 @@ const FormularioEditarEstudiante: React.FC<FormularioEditarEstudianteProps> = ({
 
       {error && <div className="alert alert-danger mt-3">{error}</div>}
       {mensajeConfirmacion && <div className="alert alert-success mt-3">{mensajeConfirmacion}</div>}
+      {trabajosPendientes.length > 0 && (
+        <div className="alert alert-info mt-3">
+          Procesando {trabajosPendientes.length} foto(s) para el reconocimiento facial...
+        </div>
+      )}
     </div>
   );
 };
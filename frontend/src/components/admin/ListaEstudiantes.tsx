@@ -2,6 +2,7 @@
 import { useNavigate } from 'react-router-dom';
 import { Estudiante } from '../../types/estudiantes';
 import noPhoto from '../../assets/no-photo.avif';
+import { urlImagen } from '../../state/api';
 
 interface ListaEstudiantesProps {
   estudiantes: Estudiante[];
@@ -27,7 +28,7 @@ const ListaEstudiantes: React.FC<ListaEstudiantesProps> = ({ estudiantes }) => {
         >
           {estudiante.imagenes && estudiante.imagenes.length > 0 ? (
             <img
-              src={`data:${estudiante.imagenes[0].mimetype};base64,${estudiante.imagenes[0].data}`}
+              src={urlImagen(estudiante.imagenes[0].url_miniatura)}
               alt={`${estudiante.nombre}`}
               className="rounded-circle me-3"
               style={{ width: '40px', height: '40px', objectFit: 'cover' }}
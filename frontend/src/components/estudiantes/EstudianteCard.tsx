@@ -1,10 +1,10 @@
 import noPhoto from '../../assets/no-photo.avif'; 
+import { urlImagen } from '../../state/api';
 
 interface Props {
   nombre: string;
   apellido: string;
-  fotoBase64?: string; 
-  fotoMimetype?: string; 
+  fotoUrl?: string; 
   idEstudiante?: string;
   onClick?: (buttonRef: HTMLButtonElement) => void;
 }
@@ -14,10 +14,10 @@ interface Props {
  * Muestra la foto (o una imagen por defecto), el nombre y apellido.
  * Si se proporciona la función onClick, muestra un botón para ver asistencias.
  */
-function EstudianteCard({ nombre, apellido, fotoBase64, fotoMimetype, idEstudiante, onClick }: Props) {
+function EstudianteCard({ nombre, apellido, fotoUrl, idEstudiante, onClick }: Props) {
   const getImagenSrc = (): string => {
-    if (fotoBase64 && fotoMimetype) {
-      return `data:${fotoMimetype};base64,${fotoBase64}`;
+    if (fotoUrl) {
+      return urlImagen(fotoUrl);
     }
     return noPhoto; 
   };
@@ -43,7 +43,7 @@ function EstudianteCard({ nombre, apellido, fotoBase64, fotoMimetype, idEstudian
       <div className="card-body p-3">
         <img
           src={getImagenSrc()}
-          alt={fotoBase64 ? `${nombre}` : 'Sin Foto'}
+          alt={fotoUrl ? `${nombre}` : 'Sin Foto'}
           className="rounded-circle mb-3"
           style={{ width: '80px', height: '80px', objectFit: 'cover', border: '2px solid #007bff' }}
           onError={(e) => {
@@ -97,8 +97,7 @@ const EstudiantesList: React.FC<EstudiantesListProps> = ({
                 <EstudianteCard
                   nombre={est.nombre}
                   apellido={est.apellido}
-                  fotoBase64={est.imagenes?.[0]?.data}
-                  fotoMimetype={est.imagenes?.[0]?.mimetype}
+                  fotoUrl={est.imagenes?.[0]?.url_miniatura}
                   onClick={(buttonRef) => onEstudianteClick(est, buttonRef)}
                 />
               </div>
@@ -3,10 +3,10 @@ import { useNavigate } from 'react-router-dom';
 import { obtenerUsuario } from '../../state/auth';
 import {
   obtenerClases,
-  obtenerAsistenciasActual,
   actualizarEstadoAsistencia,
   verificarEstadoTransmision,
-  obtenerEstudiantes
+  obtenerEstudiantes,
+  obtenerTokenEventos
 } from '../../state/api';
 import { formatInTimeZone } from 'date-fns-tz';
 import { Clase, Horario } from '../../types/clases';
@@ -144,71 +144,67 @@ const PaginaTransmision: React.FC = () => {
     cargarDatosIniciales();
   }, [navigate]);
 
-  // Carga el estado de transmisión y asistencias actuales de la clase seleccionada
-  const cargarDatosTransmision = async () => {
+  // Recibe el estado de transmisión y los cambios de asistencia en vivo (Server-Sent Events)
+  useEffect(() => {
     if (!idClase) return;
     setCargando(true);
     setError('');
-    try {
-      const estado = await verificarEstadoTransmision(idClase);
-      console.log('[Transmision] verificarEstadoTransmision result:', estado);
-      setHayTransmision(estado.transmitir);
-      setMostrarVideo(estado.transmitir);
-
-      if (estado.transmitir) {
-        const asistencia = await obtenerAsistenciasActual(idClase, fechaActual);
-        console.log('[Transmision] Asistencias actuales:', asistencia);
-  
-        setRegistros(asistencia.registros || []);
-      } else {
-        setRegistros([]);
-      }
-    } catch (err) {
-      console.error('Error al cargar datos de transmisión:', err);
-      setError('Error al cargar el estado de transmisión o asistencias');
-    } finally {
-      setCargando(false);
-    }
-  };
-
-  useEffect(() => {
-    if (idClase) cargarDatosTransmision();
-  }, [idClase]);
 
-  // Actualiza asistencias periódicamente solo si hay transmisión activa
-  useEffect(() => {
-    if (idClase && hayTransmision) {
-      const intervalo = setInterval(async () => {
-        try {
-          const asistencia = await obtenerAsistenciasActual(idClase, fechaActual);
-          setRegistros(asistencia.registros || []);
-        } catch (err) {
-          console.error('Error al actualizar asistencias:', err);
-        }
-      }, 5000);
-      return () => clearInterval(intervalo);
-    }
-  }, [idClase, hayTransmision]);
+    let fuente: EventSource | null = null;
+    let cancelado = false;
 
-  // Verifica el estado de transmisión cada 5 segundos y oculta el video si termina
-  useEffect(() => {
-    if (!idClase) return;
-    const intervalo = setInterval(async () => {
+    // El flujo se abre con un token de corta duración limitado a esta clase, no con el token de sesión
+    const conectar = async () => {
+      let token;
       try {
-        const estado = await verificarEstadoTransmision(idClase);
-        setHayTransmision(estado.transmitir);
-        if (!estado.transmitir) {
-          setRegistros([]);
-          setMostrarVideo(false);
-        }
+        token = await obtenerTokenEventos(idClase);
       } catch (err) {
-        console.error('Error al verificar estado de transmisión:', err);
-        setHayTransmision(false);
-        setRegistros([]);
-        setMostrarVideo(false);
+        console.error('Error al obtener el token del flujo de eventos:', err);
+        setError('No se pudo conectar con la transmisión.');
+        setCargando(false);
+        return;
       }
-    }, 5000);
-    return () => clearInterval(intervalo);
+      if (cancelado) return;
+      fuente = new EventSource(
+        `${API_BASE}/transmision/eventos/${idClase}?expira=${token.expira}&firma=${token.firma}`
+      );
+
+      // Estado completo: al conectar, al empezar o terminar la transmisión y al resincronizar
+      fuente.addEventListener('instantanea', (e) => {
+        const datos = JSON.parse((e as MessageEvent).data);
+        console.log('[Transmision] Instantánea recibida:', datos);
+        setHayTransmision(datos.transmitir);
+        setMostrarVideo(datos.transmitir);
+        setRegistros(datos.transmitir ? datos.registros || [] : []);
+        setError('');
+        setCargando(false);
+      });
+
+      // Cambio de un único estudiante
+      fuente.addEventListener('asistencia', (e) => {
+        const delta: RegistroAsistencia = JSON.parse((e as MessageEvent).data);
+        setRegistros((prev) =>
+          prev.map((r) => (r.id_estudiante === delta.id_estudiante ? { ...r, ...delta } : r))
+        );
+      });
+
+      // EventSource se reconecta solo; al reconectar se recibe una nueva instantánea.
+      // Si el token ya caducó la reconexión se rechaza y se pide uno nuevo.
+      fuente.onerror = (err) => {
+        console.error('Error en el flujo de eventos de transmisión:', err);
+        setCargando(false);
+        if (fuente?.readyState === EventSource.CLOSED && !cancelado) {
+          setTimeout(conectar, 2000);
+        }
+      };
+    };
+
+    conectar();
+
+    return () => {
+      cancelado = true;
+      fuente?.close();
+    };
   }, [idClase]);
 
  // Limpia registros y oculta video cuando termina la transmisión
@@ -223,9 +219,8 @@ const PaginaTransmision: React.FC = () => {
   const handleCorregirEstado = async (idEstudiante: string, nuevoEstado: string) => {
     if (!idClase) return;
     try {
+      // El cambio llega también por el flujo de eventos como una actualización de asistencia
       await actualizarEstadoAsistencia(idEstudiante, idClase, fechaActual, nuevoEstado);
-      const asistencia = await obtenerAsistenciasActual(idClase, fechaActual);
-      setRegistros(asistencia.registros || []);
     } catch {
       alert('Error al actualizar el estado del estudiante');
     }
@@ -2,7 +2,7 @@ import axios from 'axios';
 import { obtenerToken, obtenerUsuario, cerrarSesion } from './auth';
 import { API_BASE } from '../utils/constants';
 import { Horario, Clase, Profesor, Aula } from '../types/horarios';
-import { Estudiante } from '../types/estudiantes';
+import { Estudiante, TrabajoEmbeddings } from '../types/estudiantes';
 
 // Crear una instancia de axios
 const axiosInstance = axios.create({
@@ -212,6 +212,12 @@ export const subirImagenEstudiante = async (idEstudiante: string, imagen: File)
   return res;
 };
 
+// Consultar el estado de la generación del embedding de una imagen subida
+export const obtenerTrabajoEmbeddings = async (idTrabajo: string) => {
+  const res = await axiosInstance.get(`/embeddings/trabajos/${idTrabajo}`);
+  return res as unknown as TrabajoEmbeddings;
+};
+
 // Dar de alta un nuevo estudiante
 export const crearEstudiante = async (nombre: string, apellido: string, idsClases: string[]) => {
   const res = await axiosInstance.post('/estudiantes/nuevo', { nombre, apellido, ids_clases: idsClases });
@@ -318,6 +324,12 @@ export const obtenerClasesPorAsignatura = async (asignaturaId: string): Promise<
   return await obtenerClasesAdmin(asignaturaId, undefined, undefined);
 };
 
+// Token de corta duración para abrir el flujo de eventos de una clase (EventSource no envía cabeceras)
+export const obtenerTokenEventos = async (idClase: string) => {
+  const res = await axiosInstance.post(`/transmision/eventos/${idClase}/token`);
+  return res as unknown as { expira: number; firma: string };
+};
+
 // Permite ajustar el tiempo máximo para detecciones a tiempo.
 export const ajustarTiempoMaximo = async (idClase: string, tiempoMaximo: number) => {
   const response = await axiosInstance.post(`/transmision/tiempo_maximo/${idClase}`, {
@@ -333,4 +345,6 @@ export async function cambiarContrasena(contrasenaActual: string, nuevaContrasen
     nuevaContrasena
   });
   return res;
-}
\ No newline at end of file
+}
+// URL absoluta de una imagen servida por la API; la ruta ya viene firmada desde el servidor
+export const urlImagen = (url: string): string => `${API_BASE}${url}`;
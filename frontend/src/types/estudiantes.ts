@@ -2,8 +2,8 @@
   export interface Imagen {
     file_id: string;
     filename: string;
-    data: string;
-    mimetype: string;
+    url: string;
+    url_miniatura: string;
   }
   
   export interface Estudiante {
@@ -14,6 +14,14 @@
     imagenes: Imagen[];
   }
   
+  export interface TrabajoEmbeddings {
+    id_trabajo: string;
+    id_estudiante: string;
+    file_id: string;
+    estado: 'pendiente' | 'procesando' | 'completado' | 'error';
+    error: string | null;
+  }
+  
   export interface ClaseAsignada {
     idAsignatura: string;
     idProfesor: string | null;